@@ -153,7 +153,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Login and logout redirect setting
 LOGOUT_REDIRECT_URL = '/'
-LOGIN_REDIRECT_URL = '/reset/'
+LOGIN_REDIRECT_URL = 'tommy:home'
+
+# Review scheduling: 'sm2' spaces reviews by each phrase's ease, 'leitner' by its box
+REVIEW_SCHEDULER = 'sm2'
 
 
 REST_FRAMEWORK = {
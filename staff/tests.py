@@ -1,3 +1,33 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from tommy.grading import GradeResult, grading_cache
+from tommy.models import Module, Phrase, Profile, Translation
+
+
+User = get_user_model()
+
+class UpdateTranslationViewTestCase(TestCase):
+
+    def setUp(self):
+        admin = User.objects.create_superuser(username="bar", password="jd93*&2d", email="bar@cb-bc.gc.ca")
+        Profile.objects.create(user=admin, name="Bar")
+        module = Module.objects.create(name="Greetings")
+        self.phrase = Phrase.objects.create(language="French", phrase="Salut", module=module)
+        self.translation = Translation.objects.create(language="English", translation="Hi", phrase=self.phrase)
+        self.client.login(username="bar", password="jd93*&2d")
+
+    def tearDown(self):
+        grading_cache.clear()
+
+    def test_edit_invalidates_cached_grades(self):
+        key = (self.translation.id, "hi", ('edit_distance', 'folded'))
+        grading_cache.set(key, GradeResult(100, 0, None, None))
+        response = self.client.post(
+            reverse('staff:edit_translation', args=[self.translation.id]),
+            {'translation': "Hello", 'phrase': self.phrase.id, 'language': "English"}
+        )
+        self.assertRedirects(response, reverse('staff:manage_content'))
+        self.assertEqual(Translation.objects.get(id=self.translation.id).normalized, "hello")
+        self.assertIsNone(grading_cache.get(key))
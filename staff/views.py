@@ -9,6 +9,8 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 from django.views.generic import UpdateView, CreateView, ListView, View
 
+from tommy.distractors import rebuild_module_distractors_later
+from tommy.grading import grading_cache
 from tommy.models import Module, Phrase, Translation, Profile, UserPhraseStrength
 
 from .forms import ModuleForm, CreatePhraseForm, CreateTranslationForm, UpdatePhraseForm, UpdateTranslationForm, CsvTestForm, CsvSubmitForm
@@ -173,6 +175,8 @@ class CreateTranslationView(PermissionRequiredMixin, CreateView):
         translation = form.save(commit=False)
         translation.phrase = phrase
         translation.save()
+        # The new translation is a candidate wrong answer for the module's phrases
+        rebuild_module_distractors_later([phrase.module_id])
 
         success_url = reverse_lazy(
             'staff:add_translation', kwargs={'pk1': pk1, 'pk2': pk2}
@@ -244,7 +248,9 @@ class UpdatePhraseView(PermissionRequiredMixin, UpdateView):
             context = {'form': form, 'module': module, 'phrase': phrase}
             return render(request, self.template_name, context)
 
+        old_module_id = Phrase.objects.values_list('module_id', flat=True).get(id=pk)
         form.save()
+        rebuild_module_distractors_later([old_module_id, phrase.module_id])
         success_url = reverse_lazy('staff:manage_content')
         return redirect(success_url)
 
@@ -291,6 +297,10 @@ class UpdateTranslationView(PermissionRequiredMixin, UpdateView):
             return render(request, self.template_name, context)
 
         form.save()
+        # Cached grades for the old wording of the translation are no longer valid
+        grading_cache.invalidate_translation(translation.id)
+        if translation.phrase:
+            rebuild_module_distractors_later([translation.phrase.module_id])
         success_url = reverse_lazy('staff:manage_content')
         return redirect(success_url)
 
@@ -765,6 +775,7 @@ class CsvToDbUpdateView(PermissionRequiredMixin, ListView):
         module_names, added_modules = [module.name for module in modules], 0
         added_phrases, edited_phrases, added_strength_objs  = 0, 0, 0
         deleted_translations, added_translations, edited_translations = 0, 0, 0
+        changed_modules = set()
 
         # Compare new data to database and change data for all updates in CSV
         row = 1
@@ -795,10 +806,13 @@ class CsvToDbUpdateView(PermissionRequiredMixin, ListView):
                     phrase_changed = True
                 if phrase.module.name != dict_obj["module_name"]:
                     print(f"Changing module from '{phrase.module}' to '{dict_obj['module_name']}'", end=". ")
+                    # The phrase's old module loses a candidate wrong answer
+                    changed_modules.add(phrase.module_id)
                     phrase.module = module
                     module_changed = True
                 if language_changed or phrase_changed or module_changed:
                     print("Change made to phrase with ID", phrase_id)
+                    changed_modules.add(module.id)
                     phrase.save()
                     edited_phrases += 1
                 # Loop through translations to update them if there are changes
@@ -809,9 +823,11 @@ class CsvToDbUpdateView(PermissionRequiredMixin, ListView):
                 if old_translation_set != new_translation_set:
                     translation_language = "English" if str(dict_obj["phrase_lang"]) == "French" else "French"
                     print(f"Changing translations for the phrase '{phrase.phrase}' with id {phrase_id}.")
+                    changed_modules.add(phrase.module_id)
                     # Delete old translations if they are not in updated set
                     for old_translation in old_phrase_translations:
                         if old_translation.translation not in new_translation_set:
+                            grading_cache.invalidate_translation(old_translation.id)
                             old_translation.delete()
                             deleted_translations += 1
                     # Add translations that are not in the database
@@ -831,6 +847,7 @@ class CsvToDbUpdateView(PermissionRequiredMixin, ListView):
                     module = module
                 )
                 added_phrases += 1
+                changed_modules.add(module.id)
                 print(f"Creating new phrase, translation(s) and user strength objects for {dict_obj['phrase']} in {dict_obj['phrase_lang']} with ID {phrase.id}. ")
                 # Create translations for the new phrase
                 translation_language = "English" if str(dict_obj["phrase_lang"]) == "French" else "French"
@@ -862,6 +879,9 @@ class CsvToDbUpdateView(PermissionRequiredMixin, ListView):
         print(f"Translations edited: {edited_translations}")
         print(f"Translations added for newly addedd phrases: {added_translations}")
 
+        # Rebuild the multiple choice distractors of the modules that changed
+        rebuild_module_distractors_later(changed_modules)
+
                
         """The final loop writes a new copy of the database to CSV"""
         export_data = []
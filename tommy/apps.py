@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TommyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tommy'
+
+    def ready(self):
+        # Connect signal receivers
+        from . import signals
@@ -0,0 +1,294 @@
+from collections import namedtuple
+from random import Random
+from statistics import quantiles
+import string
+from time import perf_counter_ns
+
+from .grading import MatchIndex, accent_feedback, eval_tranlation, eval_word, feedback
+from .normalize import FRENCH_ACCENTS, normalizer
+
+
+# French phrases with their English translations used to build the benchmark corpus.
+# Short, everyday sentences like the catalog's, with accents, elisions and punctuation.
+PHRASE_PAIRS = [
+    ("Très bien", "Very good"),
+    ("Je ne sais pas", "I don't know"),
+    ("Où est la gare?", "Where is the train station?"),
+    ("Il fait beau aujourd'hui", "The weather is nice today"),
+    ("J'ai déjà mangé", "I have already eaten"),
+    ("Ça va, merci", "I'm fine, thank you"),
+    ("Nous allons à l'école", "We are going to school"),
+    ("Elle préfère le thé au café", "She prefers tea to coffee"),
+    ("Pouvez-vous répéter, s'il vous plaît?", "Can you repeat, please?"),
+    ("Le garçon lit un livre intéressant", "The boy is reading an interesting book"),
+    ("Qu'est-ce que tu fais ce week-end?", "What are you doing this weekend?"),
+    ("Mon frère habite à Montréal", "My brother lives in Montreal"),
+    ("Les élèves étudient le français", "The students study French"),
+    ("Je voudrais un verre d'eau", "I would like a glass of water"),
+    ("À quelle heure commence la réunion?", "What time does the meeting start?"),
+    ("Il a oublié son parapluie", "He forgot his umbrella"),
+    ("C'est une très bonne idée", "That is a very good idea"),
+    ("Nous sommes arrivés en retard", "We arrived late"),
+    ("Fermez la fenêtre, s'il vous plaît", "Close the window, please"),
+    ("Combien coûte ce manteau?", "How much does this coat cost?"),
+]
+
+# Words inserted by the extra word perturbation
+FILLER_WORDS = ["really", "the", "très", "vraiment", "so", "là", "just", "donc"]
+
+ANSWER_CLASSES = ["exact", "typo", "missing_word", "extra_word", "accent_drop", "wrong"]
+
+# One benchmark case. The answer is graded against the translation. Answer class is one
+# of ANSWER_CLASSES.
+BenchmarkCase = namedtuple('BenchmarkCase', ['answer_class', 'answer', 'translation'])
+
+# Timing summary of one function on one answer class. Latencies are in microseconds.
+BenchmarkResult = namedtuple('BenchmarkResult', ['ops_per_sec', 'p50_us', 'p99_us'])
+
+
+def add_typo(text, rng):
+    """Swaps, drops, doubles or replaces one letter of the text."""
+    letters = [i for i, char in enumerate(text) if char.isalpha()]
+    i = rng.choice(letters)
+    edit = rng.randrange(4)
+    if edit == 0 and i + 1 < len(text):
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    elif edit == 1:
+        return text[:i] + text[i + 1:]
+    elif edit == 2:
+        return text[:i] + text[i] + text[i:]
+    return text[:i] + rng.choice("aeioulnrst") + text[i + 1:]
+
+
+def perturb(text, answer_class, rng, other):
+    """Returns an answer of the given class for the text. Other is an unrelated text."""
+    words = text.split()
+    if answer_class == "typo":
+        return add_typo(text, rng)
+    elif answer_class == "missing_word" and len(words) > 1:
+        del words[rng.randrange(len(words))]
+        return " ".join(words)
+    elif answer_class == "extra_word":
+        words.insert(rng.randrange(len(words) + 1), rng.choice(FILLER_WORDS))
+        return " ".join(words)
+    elif answer_class == "accent_drop":
+        # Drops lowercase accents, the ones learners leave out most
+        return text.translate(normalizer.accent_table)
+    elif answer_class == "wrong":
+        return other
+    return text
+
+
+def build_corpus(size=600, seed=2023):
+    """
+    Generates benchmark cases from PHRASE_PAIRS, graded in both directions, with answers
+    perturbed into every answer class. The same seed always builds the same corpus.
+    """
+    rng = Random(seed)
+    texts = [text for pair in PHRASE_PAIRS for text in pair]
+    cases = []
+    for n in range(size):
+        french, english = rng.choice(PHRASE_PAIRS)
+        translation = english if n % 2 else french
+        answer_class = ANSWER_CLASSES[n % len(ANSWER_CLASSES)]
+        answer = perturb(translation, answer_class, rng, rng.choice(texts))
+        cases.append(BenchmarkCase(answer_class, answer, translation))
+    return cases
+
+
+def prepare(cases):
+    """Normalizes every case once so the benchmarks time grading and not normalizing."""
+    return [
+        (case.answer_class, normalizer(case.answer), normalizer(case.translation))
+        for case in cases
+    ]
+
+
+def word_calls(prepared):
+    # Grades each answer word against the translation word in the same position
+    for answer_class, answer, translation in prepared:
+        for answer_word, translation_word in zip(answer.tokens, translation.tokens):
+            yield answer_class, (eval_word, answer_word, translation_word)
+
+
+def translation_calls(prepared):
+    for answer_class, answer, translation in prepared:
+        yield answer_class, (eval_tranlation, answer, translation)
+
+
+def feedback_calls(prepared, render=feedback):
+    # Feedback is given the score and errors the view would pass it
+    for answer_class, answer, translation in prepared:
+        score, errors = eval_tranlation(answer, translation)
+        yield answer_class, (render, answer, translation, errors, score)
+
+
+def match_calls(prepared):
+    # Each answer is matched against its translation among four others
+    translations = [translation for _, _, translation in prepared]
+    for n, (answer_class, answer, translation) in enumerate(prepared):
+        entries = [translations[(n + k) % len(translations)] for k in range(1, 5)] + [translation]
+        index = MatchIndex(enumerate(entries))
+        yield answer_class, (index.best_match, answer)
+
+
+BENCHMARKS = {
+    'eval_word': word_calls,
+    'eval_tranlation': translation_calls,
+    'feedback': feedback_calls,
+    'accent_feedback': lambda prepared: feedback_calls(prepared, accent_feedback),
+    'MatchIndex.best_match': match_calls,
+}
+
+
+def time_calls(calls, rounds):
+    """Times every call once per round. Returns a list of latencies in nanoseconds per round."""
+    timings = []
+    for _ in range(rounds):
+        round_timings = []
+        for function, *args in calls:
+            start = perf_counter_ns()
+            function(*args)
+            round_timings.append(perf_counter_ns() - start)
+        timings.append(round_timings)
+    return timings
+
+
+def summarize(timings):
+    """
+    Returns the BenchmarkResult of latencies in nanoseconds per round. Ops/sec comes from
+    the fastest round, as timeit does, so a busy machine skews the numbers less.
+    """
+    latencies = [latency for round_timings in timings for latency in round_timings]
+    if len(latencies) > 1:
+        percentiles = quantiles(latencies, n=100, method='inclusive')
+        p50, p99 = percentiles[49], percentiles[98]
+    else:
+        p50 = p99 = latencies[0]
+    fastest = min(timings, key=sum)
+    return BenchmarkResult(
+        round(len(fastest) * 1e9 / max(sum(fastest), 1), 1), round(p50 / 1000, 3), round(p99 / 1000, 3)
+    )
+
+
+# Answers with a typo and their translations that the calibration grades, and the table
+# it normalizes them with. Built once with a fixed seed.
+CALIBRATION_PAIRS = [
+    (add_typo(text, Random(n)), text) for n, text in enumerate(text for pair in PHRASE_PAIRS for text in pair)
+]
+CALIBRATION_TABLE = str.maketrans({**FRENCH_ACCENTS, **{char: None for char in string.punctuation}})
+
+# Calibration workloads timed before and after the benchmarks, and the most the tolerance
+# of find_regressions grows when they differ
+CALIBRATION_CALLS, MAX_NOISE = 20, 0.25
+
+
+def calibration_distance(source, target):
+    # Frozen optimal string alignment distance, the same kind of loop eval_word runs
+    before, previous = None, list(range(len(target) + 1))
+    for i, char in enumerate(source, 1):
+        current = [i]
+        for j, other in enumerate(target, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other))
+            if before is not None and j > 1 and char == target[j - 2] and source[i - 2] == other:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        before, previous = previous, current
+    return previous[-1]
+
+
+def calibration_workload():
+    """
+    Grades fixed answers with a frozen copy of the work the grader does: lowercasing,
+    translate tables, splitting and an edit distance loop over words. It measures the
+    machine on code like the grader's, and no change to the grader can move it.
+    """
+    total = 0
+    for answer, translation in CALIBRATION_PAIRS:
+        answer_words = answer.lower().translate(CALIBRATION_TABLE).split()
+        translation_words = translation.lower().translate(CALIBRATION_TABLE).split()
+        for answer_word, translation_word in zip(answer_words, translation_words):
+            total += calibration_distance(answer_word, translation_word)
+    return total
+
+
+def calibrate(rounds):
+    return summarize(time_calls([(calibration_workload,)] * CALIBRATION_CALLS, rounds))
+
+
+def run_benchmarks(cases, rounds=5, names=None):
+    """
+    Times each benchmark on the cases. Returns a dict of benchmark name to a dict of answer
+    class, plus 'all' for every class together, to its BenchmarkResult. The 'calibration'
+    entry times a fixed workload so results from different machines can be compared. It is
+    timed before and after the benchmarks, and 'all' is the faster of the two.
+    """
+    prepared = prepare(cases)
+    results = {'calibration': {'start': calibrate(rounds)}}
+    for name, build_calls in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        calls_by_class = {}
+        for answer_class, call in build_calls(prepared):
+            calls_by_class.setdefault(answer_class, []).append(call)
+        # One warm up round so the first timings don't include cold caches
+        time_calls([call for calls in calls_by_class.values() for call in calls], 1)
+        all_timings, results[name] = [[] for _ in range(rounds)], {}
+        for answer_class in ANSWER_CLASSES:
+            if answer_class in calls_by_class:
+                timings = time_calls(calls_by_class[answer_class], rounds)
+                for round_timings, class_timings in zip(all_timings, timings):
+                    round_timings.extend(class_timings)
+                results[name][answer_class] = summarize(timings)
+        results[name]['all'] = summarize(all_timings)
+    calibration = results['calibration']
+    calibration['end'] = calibrate(rounds)
+    calibration['all'] = max(calibration['start'], calibration['end'], key=lambda result: result.ops_per_sec)
+    return results
+
+
+def to_json(results):
+    """Returns the results as plain dicts for saving as a baseline."""
+    return {
+        name: {answer_class: result._asdict() for answer_class, result in by_class.items()}
+        for name, by_class in results.items()
+    }
+
+
+def calibration_noise(results):
+    """Returns how much the calibration moved between the start and end of the run, 0 to 1."""
+    calibration = results.get('calibration', {})
+    if 'start' not in calibration or 'end' not in calibration:
+        return 0.0
+    speeds = calibration['start'].ops_per_sec, calibration['end'].ops_per_sec
+    return 1 - min(speeds) / max(max(speeds), 1)
+
+
+def find_regressions(results, baseline, tolerance=0.25, answer_classes=('all',)):
+    """
+    Compares results with a baseline loaded from JSON. Returns (name, answer class,
+    baseline ops/sec, ops/sec) for every result slower than the baseline by more than the
+    tolerance. Baseline ops/sec are scaled by the calibration entries first, so a baseline
+    saved on a faster machine doesn't fail every run, and the tolerance grows by the noise
+    the calibration saw during the run. Only the answer classes given are compared, None
+    compares every class. Benchmarks missing from the baseline are skipped.
+    """
+    scale = 1.0
+    if 'calibration' in results and 'calibration' in baseline:
+        scale = (results['calibration']['all'].ops_per_sec
+                 / baseline['calibration']['all']['ops_per_sec'])
+    tolerance += min(calibration_noise(results), MAX_NOISE)
+    regressions = []
+    for name, by_class in results.items():
+        if name == 'calibration':
+            continue
+        for answer_class, result in by_class.items():
+            if answer_classes is not None and answer_class not in answer_classes:
+                continue
+            expected = baseline.get(name, {}).get(answer_class)
+            if expected is None:
+                continue
+            expected_ops = round(expected['ops_per_sec'] * scale, 1)
+            if result.ops_per_sec < expected_ops * (1 - tolerance):
+                regressions.append((name, answer_class, expected_ops, result.ops_per_sec))
+    return regressions
@@ -0,0 +1,158 @@
+from hashlib import md5
+from time import time
+
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+from django.template.loader import render_to_string
+
+from .models import Phrase, Translation, UserPhraseStrength
+from .normalize import normalizer
+from .search import search_phrases
+
+
+# The catalog version changes whenever a phrase, translation or module is saved or deleted,
+# so cached glossary pages of an older version are never read again and expire. The default
+# cache is kept per process, so the version only moves in the worker that made the edit.
+# The version and the pages expire after CATALOG_CACHE_TIMEOUT seconds, which bounds how
+# long other workers show the catalog as it was before the edit.
+CATALOG_VERSION_KEY, CATALOG_CACHE_TIMEOUT = 'tommy:catalog-version', 5 * 60
+
+# Phrases listed on each page of the glossary
+GLOSSARY_PAGE_SIZE = 50
+
+# Glossary labels of learned phrases by strength, strongest first
+STRENGTH_LABELS = [(90, "Excellent"), (80, "Amazing"), (60, "Great"), (40, "Good"), (None, "Keep at it")]
+
+
+def catalog_version():
+    """
+    Returns the current catalog version. A missing or expired version starts from the
+    clock, so it is newer than any version counted up before it was dropped from the cache.
+    """
+    return cache.get_or_set(CATALOG_VERSION_KEY, int(time()), CATALOG_CACHE_TIMEOUT)
+
+
+def bump_catalog_version():
+    """Moves the catalog to a new version after its content changed."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Not in the cache, the version read next starts from the clock
+        pass
+
+
+def glossary_page_key(version, search, after):
+    # After is an id or None, so GET parameters can't make keys of their own
+    term = md5(search.encode()).hexdigest() if search else ''
+    return f"tommy:glossary:{version}:{term}:{'' if after is None else after}"
+
+
+def parse_after(after):
+    """Returns the phrase id a glossary page starts after from its GET parameter, or None."""
+    try:
+        return int(after)
+    except (TypeError, ValueError):
+        return None
+
+
+def ordered_glossary_page(phrases, search, after):
+    """
+    Returns the phrases of the page after a phrase in alphabetical order, and the id it
+    starts after, None for the first page. Without the search index, searches match the
+    normalized forms in the tables.
+    """
+    phrases = phrases.order_by('phrase', 'id')
+    if search:
+        term = normalizer(search).folded
+        phrases = phrases.filter(
+            Q(normalized__contains=term) | Exists(Translation.objects.filter(
+                phrase=OuterRef('pk'), normalized__contains=term
+            ))
+        )
+
+    # Keyset pagination: the next page starts after the last phrase of this one
+    if after is not None:
+        try:
+            after_phrase = Phrase.objects.values('phrase', 'id').get(id=after)
+            phrases = phrases.filter(
+                Q(phrase__gt=after_phrase['phrase'])
+                | Q(phrase=after_phrase['phrase'], id__gt=after_phrase['id'])
+            )
+        except (ValueError, Phrase.DoesNotExist):
+            after = None
+    return list(phrases[:GLOSSARY_PAGE_SIZE + 1]), after
+
+
+def ranked_glossary_page(phrases, ranked_ids, after):
+    """
+    Returns the phrases of the page after a phrase in a search ranking, and the id it
+    starts after, None for the first page.
+    """
+    try:
+        start = ranked_ids.index(int(after)) + 1
+    except (TypeError, ValueError):
+        start, after = 0, None
+    page_ids = ranked_ids[start:start + GLOSSARY_PAGE_SIZE + 1]
+    by_id = phrases.in_bulk(page_ids)
+    return [by_id[phrase_id] for phrase_id in page_ids if phrase_id in by_id], after
+
+
+def build_glossary_page(search, after):
+    """
+    Returns one page of the glossary as the same for every user: the phrases with their
+    translations and module, the first column of each row rendered, and the id to start
+    the next page after. Searches list the best matches first.
+    """
+    phrases = Phrase.objects.filter(language=Phrase.FRENCH).select_related('module').prefetch_related(
+        'phrase_translations'
+    )
+    ranked_ids = search_phrases(search) if search else None
+    if ranked_ids is None:
+        page, after = ordered_glossary_page(phrases, search, after)
+    else:
+        page, after = ranked_glossary_page(phrases, ranked_ids, after)
+
+    rows = []
+    for phrase in page[:GLOSSARY_PAGE_SIZE]:
+        row = {
+            "phrase": phrase.phrase,
+            "id": phrase.id,
+            "language": phrase.language,
+            "module": phrase.module.name if phrase.module else None,
+            "module_id": phrase.module_id,
+            "translations": [translation.translation for translation in phrase.phrase_translations.all()],
+        }
+        row["html"] = render_to_string('tommy/glossary_row.html', {'phrase': row})
+        rows.append(row)
+    return {
+        'rows': rows,
+        'is_first_page': after is None,
+        'next_after': page[GLOSSARY_PAGE_SIZE - 1].id if len(page) > GLOSSARY_PAGE_SIZE else None,
+    }
+
+
+def glossary_page(search, after):
+    """Returns build_glossary_page from the cache, shared by all users until the catalog changes."""
+    after = parse_after(after)
+    key = glossary_page_key(catalog_version(), search, after)
+    page = cache.get(key)
+    if page is None:
+        page = build_glossary_page(search, after)
+        cache.set(key, page, CATALOG_CACHE_TIMEOUT)
+    return page
+
+
+def strength_label(strength):
+    return next(label for floor, label in STRENGTH_LABELS if floor is None or strength > floor)
+
+
+def strength_overlay(user, phrase_ids, now=None):
+    """
+    Returns the glossary label of each learned phrase of the user among phrase_ids, by
+    phrase id. Phrases not learned are left out. One query for the whole page.
+    """
+    strengths = UserPhraseStrength.objects.filter(user=user, phrase_id__in=phrase_ids, learned=True)
+    return {
+        strength.phrase_id: strength_label(strength.current_strength(now))
+        for strength in strengths.only('phrase_id', 'strength', 'strength_updated_at', 'updated_at')
+    }
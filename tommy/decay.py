@@ -0,0 +1,65 @@
+from django.db.models import Case, DateTimeField, F, Func, IntegerField, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+
+# Strength above the threshold drops by one point for every whole day since it was last
+# set, down to the threshold. Weaker phrases keep their strength. Stopping at the threshold
+# means decaying in daily steps, as decay_strengths does, gives the same strength as
+# decaying once.
+DECAY_THRESHOLD, DECAY_PER_DAY, DAY_SECONDS = 25, 1, 24 * 60 * 60
+
+
+def days_since(timestamp, now=None):
+    """Returns the number of whole days from the timestamp to now, never less than 0."""
+    if timestamp is None:
+        return 0
+    now = now or timezone.now()
+    return max(0, (now - timestamp).days)
+
+
+def decayed_strength(strength, updated_at, now=None):
+    """
+    Returns the strength of a phrase as of now given its stored strength and the time it
+    was stored. Pure, so strength is decayed when read and rows are never rewritten.
+    """
+    if strength <= DECAY_THRESHOLD:
+        return strength
+    return max(DECAY_THRESHOLD, strength - days_since(updated_at, now) * DECAY_PER_DAY)
+
+
+class DaysSince(Func):
+    """Database expression for days_since of a datetime column."""
+    output_field = IntegerField()
+
+    def __init__(self, expression, now, **extra):
+        super().__init__(expression, Value(now, output_field=DateTimeField()), **extra)
+
+    def compile_arguments(self, compiler, connection):
+        timestamp_sql, timestamp_params = compiler.compile(self.source_expressions[0])
+        now_sql, now_params = compiler.compile(self.source_expressions[1])
+        return timestamp_sql, now_sql, (*now_params, *timestamp_params)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        timestamp_sql, now_sql, params = self.compile_arguments(compiler, connection)
+        sql = f"GREATEST(0, FLOOR(EXTRACT(EPOCH FROM ({now_sql} - {timestamp_sql})) / {DAY_SECONDS}))"
+        return sql, params
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        timestamp_sql, now_sql, params = self.compile_arguments(compiler, connection)
+        return f"MAX(0, CAST(julianday({now_sql}) - julianday({timestamp_sql}) AS INTEGER))", params
+
+
+def decayed_strength_expression(now=None):
+    """
+    Returns a database expression for decayed_strength of UserPhraseStrength rows, for
+    selecting and ordering phrases by their strength as of now.
+    """
+    now = now or timezone.now()
+    days = DaysSince(Coalesce('strength_updated_at', 'updated_at'), now)
+    return Case(
+        When(strength__gt=DECAY_THRESHOLD,
+            then=Greatest(Value(DECAY_THRESHOLD), F('strength') - days * DECAY_PER_DAY)),
+        default=F('strength'),
+        output_field=IntegerField(),
+    )
@@ -0,0 +1,94 @@
+from collections import namedtuple
+
+from .normalize import normalizer
+
+
+# Session keys of the current exercise deck
+DECK_KEY, POSITION_KEY = 'deck', 'deck_position'
+
+
+class Card(namedtuple('Card', ['strength_id', 'phrase_id', 'phrase', 'language', 'module_id',
+        'translations'])):
+    """
+    One question of an exercise deck. Translations are (id, text, normalized, tokens) lists
+    as stored on Translation. Renders as the phrase text in templates.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return self.phrase
+
+    def translation_forms(self):
+        """Returns (translation id, NormalizedAnswer) entries for a MatchIndex."""
+        return [
+            (translation_id, normalizer.from_stored(text, normalized, tokens))
+            for translation_id, text, normalized, tokens in self.translations
+        ]
+
+
+def build_deck(queryset, size):
+    """
+    Returns the Cards for the first size rows of a UserPhraseStrength queryset, in its
+    order, with their phrases and translations read in one query.
+    """
+    rows = queryset.filter(id__in=queryset.values('id')[:size]).values_list(
+        'id', 'phrase_id', 'phrase__phrase', 'phrase__language', 'phrase__module_id',
+        'phrase__phrase_translations__id', 'phrase__phrase_translations__translation',
+        'phrase__phrase_translations__normalized',
+        'phrase__phrase_translations__normalized_tokens',
+    )
+    cards = {}
+    for strength_id, phrase_id, phrase, language, module_id, *translation in rows:
+        card = cards.get(strength_id)
+        if card is None:
+            card = cards[strength_id] = Card(strength_id, phrase_id, phrase, language, module_id, [])
+        if translation[0] is not None:
+            card.translations.append(translation)
+    # Phrases without translations can't be graded
+    return [card for card in cards.values() if card.translations]
+
+
+def store_deck(session, view, cards):
+    session[DECK_KEY] = {'view': view, 'cards': cards}
+    session.pop(POSITION_KEY, None)
+
+
+def deal(session, view, queryset, size):
+    """Builds a deck for an exercise session and stores it in the session."""
+    store_deck(session, view, build_deck(queryset, size))
+
+
+def deal_ids(session, view, queryset, ids):
+    """Deals the rows of a queryset with the given ids, in the order of the ids."""
+    positions = {row_id: position for position, row_id in enumerate(ids)}
+    cards = build_deck(queryset.filter(id__in=ids), len(ids))
+    store_deck(session, view, sorted(cards, key=lambda card: positions[card.strength_id]))
+
+
+def has_deck(session, view):
+    """Returns True if the session holds a deck for the view with cards left to show."""
+    deck = session.get(DECK_KEY)
+    return bool(deck and deck['view'] == view and deck['cards'])
+
+
+def draw(session, position):
+    """
+    Returns the Card at a position of the deck, starting over when the deck is shorter
+    than the exercise session, and remembers it for grading. None if the deck is empty.
+    """
+    cards = session.get(DECK_KEY, {}).get('cards')
+    if not cards:
+        return None
+    session[POSITION_KEY] = position % len(cards)
+    return Card(*cards[session[POSITION_KEY]])
+
+
+def current_card(session, view):
+    """
+    Returns the Card last drawn from the view's deck, which is the one the user is
+    answering. None if nothing was drawn or another exercise has dealt a deck since.
+    """
+    deck, position = session.get(DECK_KEY), session.get(POSITION_KEY)
+    if not deck or deck['view'] != view or position is None or position >= len(deck['cards']):
+        return None
+    return Card(*deck['cards'][position])
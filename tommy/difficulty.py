@@ -0,0 +1,37 @@
+from math import exp, log
+
+
+# Item response model (1PL/Rasch). A user of ability a answers a phrase of difficulty d
+# correctly with probability 1 / (1 + exp(d - a)). Both are fitted over all answers by
+# the fit_difficulty command. Learn aims for phrases answered right TARGET_SUCCESS of
+# the time.
+TARGET_SUCCESS = 0.8
+
+
+def success_probability(ability, difficulty):
+    """Returns the chance that a user of the ability answers a phrase of the difficulty."""
+    return 1 / (1 + exp(difficulty - ability))
+
+
+def target_difficulty(ability, target=TARGET_SUCCESS):
+    """Returns the difficulty a user of the ability answers with the target probability."""
+    return ability - log(target / (1 - target))
+
+
+def closest_difficulty(strengths, difficulty):
+    """
+    Returns the UserPhraseStrength of a queryset whose phrase difficulty is closest to
+    the given one, or None. Looks at the nearest phrase on each side of the difficulty,
+    which are seeks on the (module, difficulty) index when the queryset is one module.
+    """
+    strengths = strengths.select_related('phrase')
+    candidates = [
+        strengths.filter(phrase__difficulty__gte=difficulty)
+            .order_by('phrase__difficulty', 'phrase_id').first(),
+        strengths.filter(phrase__difficulty__lt=difficulty)
+            .order_by('-phrase__difficulty', 'phrase_id').first(),
+    ]
+    candidates = [strength for strength in candidates if strength is not None]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda strength: abs(strength.phrase.difficulty - difficulty))
@@ -0,0 +1,105 @@
+from collections import defaultdict
+import heapq
+
+from django.db import transaction
+from django.db.models import Q
+
+from .grading import eval_word
+from .models import Distractor, Phrase, Translation
+from .signals import refresh_executor, run_in_background
+
+
+# Wrong answers stored for each phrase and offered with the right one in multiple choice.
+# Candidates from another module are only considered if their length is within the ratio.
+DISTRACTOR_COUNT, DISTRACTOR_LENGTH_RATIO = 3, 0.5
+
+
+def distractor_rank(correct_forms, candidate, same_module):
+    """
+    Returns the sort key of a candidate distractor for a phrase. Candidates that read most
+    like one of the phrase's translations by eval_word rank first, then those from the same
+    module, then those closest in length.
+    """
+    similarity = max(eval_word(candidate.compact, form.compact)[0] for form in correct_forms)
+    length_gap = min(abs(len(candidate.compact) - len(form.compact)) for form in correct_forms)
+    return similarity, same_module, -length_gap
+
+
+def build_distractors(phrases=None, count=DISTRACTOR_COUNT):
+    """
+    Rebuilds the stored distractors of a Phrase queryset, or of every phrase. Candidates are
+    the translations of other phrases in the same language as the phrase's own translations.
+    Run after the catalog changes. Returns the number of distractors stored.
+    """
+    if phrases is None:
+        phrases = Phrase.objects.all()
+    phrase_ids = set(phrases.values_list('id', flat=True))
+
+    # Normalized translations of the whole catalog, read once from their stored forms
+    candidates_by_language = defaultdict(list)
+    correct_forms = defaultdict(list)
+    translations = Translation.objects.filter(phrase__isnull=False).select_related('phrase')
+    for translation in translations.order_by('id'):
+        form = translation.normalized_form()
+        if not form.compact:
+            continue
+        candidates_by_language[translation.language].append(
+            (translation.id, translation.phrase_id, translation.phrase.module_id, form)
+        )
+        if translation.phrase_id in phrase_ids:
+            correct_forms[translation.phrase_id].append((translation.language, form))
+
+    modules = dict(Phrase.objects.filter(id__in=phrase_ids).values_list('id', 'module_id'))
+    distractors = []
+    for phrase_id, forms in correct_forms.items():
+        language = forms[0][0]
+        forms = [form for _, form in forms]
+        correct_compacts = {form.compact for form in forms}
+        shortest = min(len(form.compact) for form in forms)
+        longest = max(len(form.compact) for form in forms)
+
+        ranked, seen = [], set()
+        for translation_id, other_phrase_id, module_id, form in candidates_by_language[language]:
+            if (other_phrase_id == phrase_id or form.compact in correct_compacts
+                    or form.compact in seen):
+                continue
+            same_module = module_id is not None and module_id == modules[phrase_id]
+            length = len(form.compact)
+            if not same_module and not (
+                shortest * (1 - DISTRACTOR_LENGTH_RATIO) <= length
+                <= longest * (1 + DISTRACTOR_LENGTH_RATIO)):
+                continue
+            seen.add(form.compact)
+            ranked.append((distractor_rank(forms, form, same_module), -translation_id))
+        best = heapq.nlargest(count, ranked)
+        distractors.extend(
+            Distractor(phrase_id=phrase_id, translation_id=-negative_id, rank=rank,
+                similarity=key[0])
+            for rank, (key, negative_id) in enumerate(best)
+        )
+
+    with transaction.atomic():
+        Distractor.objects.filter(phrase_id__in=phrase_ids).delete()
+        Distractor.objects.bulk_create(distractors)
+    return len(distractors)
+
+
+def rebuild_module_distractors(module_ids):
+    """Rebuilds the distractors of the phrases in the modules, None for phrases without one."""
+    module_ids = set(module_ids)
+    modules = Q(module_id__in=module_ids - {None})
+    if None in module_ids:
+        modules |= Q(module__isnull=True)
+    return build_distractors(Phrase.objects.filter(modules))
+
+
+def rebuild_module_distractors_later(module_ids):
+    """
+    Rebuilds the distractors of the modules on the background executor once the current
+    transaction commits, so staff edits don't wait for a rebuild scoring every translation.
+    """
+    module_ids = set(module_ids)
+    if module_ids:
+        transaction.on_commit(lambda: refresh_executor.submit(
+            run_in_background, rebuild_module_distractors, module_ids
+        ))
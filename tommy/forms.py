@@ -32,4 +32,17 @@ class TestForm(forms.Form):
                 'autocomplete': 'off',
                 'placeholder': ' ...',
                 'style': 'height: 5vh; font-size: x-large;'
-        }))
\ No newline at end of file
+        }))
+
+
+class ChoiceForm(forms.Form):
+    answer = forms.TypedChoiceField(
+        required=True,
+        coerce=int,
+        label='',
+        widget=forms.RadioSelect(attrs={'style': 'font-size: x-large;'})
+    )
+
+    def __init__(self, *args, choices=(), **kwargs):
+        super(ChoiceForm, self).__init__(*args, **kwargs)
+        self.fields['answer'].choices = choices
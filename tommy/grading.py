@@ -0,0 +1,678 @@
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import html
+from threading import Lock
+from time import monotonic
+
+from .normalize import NormalizedAnswer, normalizer
+
+
+# Scores shared by the grading functions
+FULL_SCORE, FAIL = 100, 0
+
+
+def damerau_levenshtein(source, target, max_distance=None):
+    """
+    Returns the Damerau-Levenshtein (optimal string alignment) distance between two strings:
+    the count of inserted, deleted, substituted and transposed characters. Only a band of
+    max_distance cells either side of the diagonal is computed and the search stops as soon
+    as the distance must exceed max_distance, in which case max_distance + 1 is returned.
+    """
+    if source == target:
+        return 0
+    source_length, target_length = len(source), len(target)
+    if max_distance is None:
+        max_distance = max(source_length, target_length)
+    over_limit = max_distance + 1
+    if abs(source_length - target_length) > max_distance:
+        return over_limit
+    if not source_length or not target_length:
+        return max(source_length, target_length)
+
+    # Rows of the edit matrix. Cells outside the band are treated as over the limit.
+    two_rows_back = None
+    previous_row = [j if j <= max_distance else over_limit for j in range(target_length + 1)]
+    for i in range(1, source_length + 1):
+        current_row = [over_limit] * (target_length + 1)
+        if i <= max_distance:
+            current_row[0] = i
+        source_char = source[i - 1]
+        band_start, band_end = max(1, i - max_distance), min(target_length, i + max_distance)
+        row_minimum = current_row[0]
+        for j in range(band_start, band_end + 1):
+            target_char = target[j - 1]
+            distance = min(
+                previous_row[j] + 1,  # deletion
+                current_row[j - 1] + 1,  # insertion
+                previous_row[j - 1] + (source_char != target_char),  # substitution
+            )
+            # Transposition of two neighbouring characters counts as a single edit
+            if (i > 1 and j > 1 and source_char == target[j - 2]
+                    and source[i - 2] == target_char and source_char != target_char):
+                distance = min(distance, two_rows_back[j - 2] + 1)
+            current_row[j] = distance
+            if distance < row_minimum:
+                row_minimum = distance
+        # Early cutoff: every path through this row already costs more than allowed
+        if row_minimum > max_distance:
+            return over_limit
+        two_rows_back, previous_row = previous_row, current_row
+
+    distance = previous_row[target_length]
+    return distance if distance <= max_distance else over_limit
+
+
+def is_one_deletion(longer_word, shorter_word):
+    """Checks in one pass whether removing a single char from longer_word gives shorter_word."""
+    if len(longer_word) != len(shorter_word) + 1:
+        return False
+    for i, char in enumerate(shorter_word):
+        if char != longer_word[i]:
+            return longer_word[i + 1:] == shorter_word[i:]
+    return True
+
+
+def eval_word(user_answer_word, correct_word, compat=False):
+    """
+    Evaluates the test score for a word entered by the user in comparison to correct
+    answer. Supports eval_tranlation function to evaluate translation accuracy.
+    Returns the accuracy percentage and the error count. Errors are counted as edits with
+    damerau_levenshtein. Compat mode reproduces the original scoring, which only detects
+    one missing or extra char and otherwise compares chars position by position.
+    """
+    if compat:
+        return eval_word_compat(user_answer_word, correct_word)
+    answer_length, actual_length = len(user_answer_word), len(correct_word)
+
+    # Case: nothing to compare against
+    if not actual_length:
+        return (FULL_SCORE, 0) if not answer_length else (FAIL, answer_length)
+
+    # Edits beyond the length of the correct word already score zero, so counting stops
+    # there and the error count is reported as one over the length of the correct word
+    error_count = damerau_levenshtein(user_answer_word, correct_word, max_distance=actual_length)
+    if error_count > actual_length:
+        return FAIL, error_count
+    accuracy = ( ( actual_length - error_count ) / actual_length ) * 100
+    return accuracy, error_count
+
+
+def eval_word_compat(user_answer_word, correct_word):
+    """Original eval_word scoring. Kept so scores can be reproduced exactly."""
+    # Variables to help evaluate word score
+    correct_count, error_count = 0, 0
+    answer_length, actual_length = len(user_answer_word), len(correct_word)
+
+    # Case: user answer word is one char shorter or longer than correct word
+    if (is_one_deletion(correct_word, user_answer_word)
+            or is_one_deletion(user_answer_word, correct_word)):
+        accuracy = ( ( actual_length - 1 ) / actual_length ) * 100
+        return accuracy, 1
+
+    # Case: same length or more than one char longer or shorter
+    shorter_word_length = min(actual_length, answer_length)
+    for i in range(shorter_word_length):
+        if correct_word[i] == user_answer_word[i]:
+            correct_count += 1
+        else:
+            error_count += 1
+
+    # Calculate score based on length difference and accuracy
+    length_difference = abs(answer_length - actual_length)
+    error_count += length_difference
+    accuracy = ( correct_count / ( shorter_word_length + length_difference ) ) * 100
+    return accuracy, error_count
+
+
+def as_normalized(text):
+    """Normalizes plain text. Text already normalized is returned as is."""
+    return text if isinstance(text, NormalizedAnswer) else normalizer(text)
+
+
+def compat_words(answer):
+    """
+    Returns the words of a NormalizedAnswer as the original scoring compared them,
+    lowercased and punctuation free with their accents kept, and the words joined.
+    """
+    words = [token.lower() for token in answer.accent_tokens]
+    return words, "".join(words)
+
+
+def eval_tranlation(user_answer, correct_translation, compat=False):
+    """
+    Evaluates the test score for a translation entered by the user
+    in comparison to correct translation. Compat is passed on to eval_word and also
+    grades without accent folding, on the texts as entered where the original did.
+    Both answers are NormalizedAnswer tuples. Plain strings are normalized first.
+    """
+    # Set variables to help evaluate accuracty of translation
+    user_answer, correct_translation = as_normalized(user_answer), as_normalized(correct_translation)
+    if compat:
+        answer_words, answer_str = compat_words(user_answer)
+        correct_words, correct_str = compat_words(correct_translation)
+        # Single words were compared as entered, with their case and punctuation
+        answer_word, correct_word = user_answer.text, correct_translation.text
+    else:
+        answer_words, correct_words = user_answer.tokens, correct_translation.tokens
+        answer_str, correct_str = user_answer.compact, correct_translation.compact
+        answer_word, correct_word = answer_str, correct_str
+    actual_word_count, answer_word_count = len(correct_words), len(answer_words)
+    actual_str_len, answer_str_len = len(correct_str), len(answer_str)
+    error_count, total_score = 0, 0
+
+    # Case: Exact same string gets fullscore
+    if answer_str == correct_str:
+        return FULL_SCORE, error_count
+
+    # Case: answer has no words, for example only punctuation
+    elif not answer_word_count:
+        return FAIL, actual_str_len
+    
+    # One word translation is evaluated for spelling errors and superfluous words
+    elif actual_word_count == 1:
+        if answer_word_count == 1:
+            return eval_word(answer_word, correct_word, compat)
+        else:
+            factor = 1.7 / answer_word_count
+            for word in answer_words:
+                word_accuracy, word_errors = eval_word(word, correct_word, compat)
+                if word_accuracy == FULL_SCORE:
+                    error_count = word_errors + ( answer_str_len - ( actual_str_len - len(word) ) )
+                    return word_accuracy * factor, error_count
+            return FAIL, answer_str_len
+
+    # Multiple word translation evaluates accuracy of words separately
+    else:
+        # If the number of words is the same compare the words one by one
+        if answer_word_count == actual_word_count:
+            for i in range(actual_word_count):
+                if answer_words[i] == correct_words[i]:
+                    total_score += FULL_SCORE
+                else:
+                    word_score, word_errors = eval_word(answer_words[i], correct_words[i], compat)
+                    total_score += word_score
+                    error_count += word_errors
+            return (total_score / actual_word_count), error_count
+        # Otherwise search for the words in the full string
+        else:
+            if correct_str in answer_str or answer_str in correct_str:
+                accuracy = ( ( actual_str_len - abs( actual_str_len - answer_str_len ) )
+                            / actual_str_len * FULL_SCORE )
+                accuracy = accuracy if accuracy > FAIL else FAIL
+                error_count += abs(actual_str_len - answer_str_len)
+                return accuracy, error_count
+            else:
+                factor = ( ( actual_word_count - abs( answer_word_count - actual_word_count ) )
+                          / actual_word_count )
+                correct_word_count = 0
+                # TODO - This error count is not ideal and can be improved
+                for word in correct_words:
+                    if word in answer_words:
+                        correct_word_count += 1
+                    else:
+                        error_count += int(len(word) / 2)
+                for word in answer_words:
+                    if word not in correct_words:
+                        error_count += int(len(word) / 2)
+                accuracy = (correct_word_count / actual_word_count) * factor * FULL_SCORE
+                return accuracy, error_count
+
+
+# Best matching translation found by MatchIndex
+Match = namedtuple('Match', ['translation', 'form', 'score', 'errors', 'position'])
+
+
+def score_bound(user_answer, correct_translation, compat=False):
+    """
+    Returns the highest score eval_tranlation could give an answer that is not an exact
+    match, worked out from string lengths and word counts only. Compat lengths are taken
+    from the same strings the compat scoring compares.
+    """
+    if compat:
+        answer_str_len, actual_str_len = (
+            len(compat_words(user_answer)[1]), len(compat_words(correct_translation)[1]))
+    else:
+        answer_str_len, actual_str_len = len(user_answer.compact), len(correct_translation.compact)
+    answer_word_count, actual_word_count = len(user_answer.tokens), len(correct_translation.tokens)
+    length_difference = abs(answer_str_len - actual_str_len)
+    if not answer_word_count:
+        return FAIL
+    if not actual_str_len:
+        return FULL_SCORE
+
+    # One word translation
+    if actual_word_count == 1:
+        if answer_word_count > 1:
+            return FULL_SCORE * 1.7 / answer_word_count
+        if compat:
+            # Single words are scored on the texts as entered
+            answer_len, actual_len = len(user_answer.text), len(correct_translation.text)
+            shorter, longer = sorted([answer_len, actual_len])
+            return max((actual_len - 1) / actual_len, shorter / longer) * 100
+        # The strings differ so at least one edit is needed
+        return max(actual_str_len - max(length_difference, 1), 0) / actual_str_len * 100
+
+    # Multiple word translation with a different number of words
+    elif actual_word_count != answer_word_count:
+        word_count_difference = abs(answer_word_count - actual_word_count)
+        substring_bound = max(actual_str_len - length_difference, 0) / actual_str_len * FULL_SCORE
+        # Repeated words can let every correct word be found even in a shorter answer
+        factor = (actual_word_count - word_count_difference) / actual_word_count
+        return max(substring_bound, factor * FULL_SCORE)
+
+    # Same number of words are compared word by word and could score anything
+    return FULL_SCORE
+
+
+# Cached result of grading an answer against one translation. Spans are None until the
+# answer is graded with feedback.
+GradeResult = namedtuple('GradeResult', ['score', 'errors', 'spans', 'text'])
+
+# Size and time to live in seconds of the shared grading cache
+GRADING_CACHE_SIZE, GRADING_CACHE_TTL = 10_000, 60 * 60
+
+
+class GradingCache:
+    """
+    Bounded least recently used cache of grading results, keyed on the translation id, the
+    answer as entered and the grading mode. Entries older than ttl seconds are dropped so
+    processes that missed an invalidation can't serve stale scores for long.
+    """
+
+    def __init__(self, maxsize=GRADING_CACHE_SIZE, ttl=GRADING_CACHE_TTL, clock=monotonic):
+        self.maxsize, self.ttl, self.clock = maxsize, ttl, clock
+        self.entries = OrderedDict()
+        self.keys_by_translation = {}
+        self.hits, self.misses = 0, 0
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Returns the cached GradeResult for the key or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if self.ttl is None or expires > self.clock():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                self.remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, result):
+        with self.lock:
+            expires = self.clock() + self.ttl if self.ttl is not None else None
+            self.entries[key] = (expires, result)
+            self.entries.move_to_end(key)
+            self.keys_by_translation.setdefault(key[0], set()).add(key)
+            while len(self.entries) > self.maxsize:
+                self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        # Callers hold the lock
+        del self.entries[key]
+        keys = self.keys_by_translation.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_translation[key[0]]
+
+    def invalidate_translation(self, translation_id):
+        """Drops every cached result for a translation. Call when the translation changes."""
+        with self.lock:
+            for key in self.keys_by_translation.pop(translation_id, ()):
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_translation.clear()
+            self.hits, self.misses = 0, 0
+
+    def stats(self):
+        """Returns the hit and miss counts and the size of the cache."""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+            }
+
+
+grading_cache = GradingCache()
+
+
+class MatchIndex:
+    """
+    Index of the translations of a phrase used to find the one that best matches an answer.
+    Exact matches are found with a hash lookup of the compact form. Otherwise translations
+    are scored in order of their highest possible score from score_bound, and the search
+    stops once no remaining translation can beat the best score found. Ties go to the
+    translation that comes first, as when every translation is scored in turn.
+    In accents mode a translation written exactly as the answer, accents included, is
+    found first with a hash lookup of its accent tokens.
+    """
+
+    # Allowance for float rounding when comparing a bound with a score
+    TOLERANCE = 1e-9
+
+    def __init__(self, entries, compat=False, accents=False, cache=None):
+        # Entries are (translation, NormalizedAnswer) pairs in their original order
+        self.entries = list(entries)
+        self.compat, self.accents, self.cache = compat, accents, cache
+        self.mode = ('compat' if compat else 'edit_distance', 'accents' if accents else 'folded')
+        self.exact, self.exact_accents = {}, {}
+        for position, (_, form) in enumerate(self.entries):
+            self.exact.setdefault(self.exact_key(form), position)
+            if accents:
+                self.exact_accents.setdefault(tuple(form.accent_tokens), position)
+
+    def exact_key(self, form):
+        # Compat scoring keeps accents, so only answers with the same accents are exact
+        return compat_words(form)[1] if self.compat else form.compact
+
+    @classmethod
+    def for_translations(cls, translations, compat=False, accents=False, cache=None):
+        """Builds the index from Translation objects using their stored normalized forms."""
+        entries = ((translation, translation.normalized_form()) for translation in translations)
+        return cls(entries, compat, accents, cache)
+
+    def cache_key(self, position, user_answer):
+        # Translation objects are keyed on their id, other entries on themselves. Answers
+        # are keyed as entered since compat scores and the spans depend on case and accents.
+        translation = self.entries[position][0]
+        return (getattr(translation, 'id', translation), user_answer.text, self.mode)
+
+    def score(self, position, user_answer):
+        """Returns the GradeResult of the answer for one translation, from the cache if set."""
+        form, key = self.entries[position][1], None
+        if self.cache is not None:
+            key = self.cache_key(position, user_answer)
+            result = self.cache.get(key)
+            if result is not None:
+                return result
+        result = GradeResult(*eval_tranlation(user_answer, form, self.compat), None, user_answer.text)
+        if key is not None:
+            self.cache.set(key, result)
+        return result
+
+    def __len__(self):
+        return len(self.entries)
+
+    def best_match(self, user_answer):
+        """Returns the Match for the translation with the highest score, or None if empty."""
+        return self.find(as_normalized(user_answer))[0]
+
+    def find(self, user_answer):
+        """
+        Returns the best Match and its GradeResult, so grade reuses the entry score looked
+        up. The GradeResult is None for exact matches, which are found without the cache.
+        """
+        # Exact match fast path. In accents mode a match with the same accents comes first.
+        position = self.exact_accents.get(tuple(user_answer.accent_tokens)) if self.accents else None
+        if position is None:
+            position = self.exact.get(self.exact_key(user_answer))
+        if position is not None:
+            translation, form = self.entries[position]
+            return Match(translation, form, FULL_SCORE, 0, position), None
+
+        candidates = sorted(
+            (-score_bound(user_answer, form, self.compat), position)
+            for position, (_, form) in enumerate(self.entries)
+        )
+        best, best_result = None, None
+        for negative_bound, position in candidates:
+            if best is not None:
+                # Candidates are sorted by bound so none of the rest can win either
+                if -negative_bound + self.TOLERANCE < best.score:
+                    break
+            translation, form = self.entries[position]
+            result = self.score(position, user_answer)
+            if (best is None or result.score > best.score
+                    or (result.score == best.score and position < best.position)):
+                best, best_result = Match(translation, form, result.score, result.errors, position), result
+        return best, best_result
+
+    def grade(self, user_answer):
+        """
+        Returns the best Match for the answer and the feedback Spans for it, or None and
+        an empty list if there are no translations. Feedback is cached with the score.
+        """
+        user_answer = as_normalized(user_answer)
+        match, result = self.find(user_answer)
+        if match is None:
+            return None, []
+        if self.cache is None:
+            return match, feedback_spans(
+                user_answer, match.form, match.errors, match.score, self.accents
+            )
+
+        key = self.cache_key(match.position, user_answer)
+        if result is None:
+            # Exact matches skip scoring, so this is the only lookup of the grade
+            result = self.cache.get(key)
+        if result is not None and result.spans is not None:
+            return match, result.spans
+        spans = feedback_spans(user_answer, match.form, match.errors, match.score, self.accents)
+        self.cache.set(key, GradeResult(match.score, match.errors, spans, user_answer.text))
+        return match, spans
+
+    def grade_accents(self, user_answer):
+        """
+        Grades the answer for the accent exercise. Returns the best Match, whether the answer
+        is written exactly as that translation with its accents and the feedback Spans for it.
+        """
+        user_answer = as_normalized(user_answer)
+        match, spans = self.grade(user_answer)
+        exact = match is not None and match.form.accent_tokens == user_answer.accent_tokens
+        return match, exact, spans
+
+
+# Result of grading one (answer, phrase_id) pair with grade_batch. Translation id, score
+# and errors are None when the phrase has no translations.
+BatchGrade = namedtuple('BatchGrade', ['answer', 'phrase_id', 'translation_id', 'score', 'errors'])
+
+# Batches at least this large are split across the process pool when workers are given
+BATCH_POOL_MIN_SIZE, BATCH_CHUNK_SIZE = 5_000, 2_000
+
+
+def grade_chunk(pairs, entries_by_phrase, compat=False, accents=False):
+    """
+    Grades (answer, phrase_id) pairs against (translation_id, NormalizedAnswer) entries
+    grouped by phrase. Each distinct answer is normalized once and each phrase gets one
+    MatchIndex. Runs in pool workers so it must not touch the database.
+    """
+    indexes, answers, results = {}, {}, []
+    for answer_text, phrase_id in pairs:
+        index = indexes.get(phrase_id)
+        if index is None:
+            index = MatchIndex(entries_by_phrase.get(phrase_id, ()), compat, accents)
+            indexes[phrase_id] = index
+        user_answer = answers.get(answer_text)
+        if user_answer is None:
+            user_answer = answers[answer_text] = normalizer(answer_text)
+        match = index.best_match(user_answer)
+        if match is None:
+            results.append(BatchGrade(answer_text, phrase_id, None, None, None))
+        else:
+            results.append(
+                BatchGrade(answer_text, phrase_id, match.translation, match.score, match.errors)
+            )
+    return results
+
+
+def grade_batch(pairs, compat=False, accents=False, workers=None,
+                pool_min_size=BATCH_POOL_MIN_SIZE, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Grades many (answer, phrase_id) pairs in one call, for example to re-score answer logs or
+    grade uploaded answer sheets. Every needed translation is loaded in a single query.
+    With workers, batches of at least pool_min_size pairs are graded in chunks across a
+    process pool. Returns a list of BatchGrade tuples in the order of the pairs.
+    """
+    # Imported here so pool workers only need the grading functions, not Django models
+    from .models import Translation
+
+    pairs = [(answer_text, phrase_id) for answer_text, phrase_id in pairs]
+    entries_by_phrase = defaultdict(list)
+    translations = Translation.objects.filter(
+        phrase_id__in={phrase_id for _, phrase_id in pairs}
+    ).order_by('id').values_list('id', 'phrase_id', 'translation', 'normalized', 'normalized_tokens')
+    for translation_id, phrase_id, text, folded, tokens in translations:
+        entries_by_phrase[phrase_id].append(
+            (translation_id, normalizer.from_stored(text, folded, tokens))
+        )
+
+    if not workers or len(pairs) < pool_min_size:
+        return grade_chunk(pairs, entries_by_phrase, compat, accents)
+
+    # Send each worker only the translations its chunk needs
+    chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+    chunk_entries = [
+        {phrase_id: entries_by_phrase[phrase_id] for _, phrase_id in chunk} for chunk in chunks
+    ]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_results in executor.map(
+            grade_chunk, chunks, chunk_entries, [compat] * len(chunks), [accents] * len(chunks)
+        ):
+            results.extend(chunk_results)
+    return results
+
+
+# Part of the user's answer marked right or wrong in feedback
+Span = namedtuple('Span', ['text', 'correct'])
+
+# Feedback only marks single chars and words when an answer is this close to correct
+FEEDBACK_MIN_SCORE, FEEDBACK_ERROR_RATIO = 70, 1 / 8
+
+
+class SpanBuilder:
+    """Collects feedback text, merging neighbouring text with the same mark into one Span."""
+
+    def __init__(self):
+        self.spans, self.run, self.correct = [], [], None
+
+    def add(self, text, correct):
+        if correct != self.correct and self.run:
+            self.spans.append(Span("".join(self.run), self.correct))
+            self.run = []
+        self.run.append(text)
+        self.correct = correct
+
+    def build(self):
+        if self.run:
+            self.spans.append(Span("".join(self.run), self.correct))
+            self.run = []
+        return self.spans
+
+
+def char_spans(display_str, answer_str, actual_str):
+    """Marks each char of an answer that differs from a translation of the same length."""
+    builder = SpanBuilder()
+    for display_char, answer_char, actual_char in zip(display_str, answer_str, actual_str):
+        builder.add(display_char, answer_char == actual_char)
+    return builder.build()
+
+
+def word_spans(display_words, answer_words, actual_words):
+    """
+    Marks the words of an answer missing from a translation. When the answer has at least
+    as many words, each translation word can be matched once anywhere in the answer.
+    Shorter answers are compared word by word in order.
+    """
+    builder = SpanBuilder()
+    if len(answer_words) >= len(actual_words):
+        remaining = Counter(actual_words)
+        for i, word in enumerate(answer_words):
+            if i:
+                builder.add(" ", True)
+            if remaining[word]:
+                remaining[word] -= 1
+                builder.add(display_words[i], True)
+            else:
+                builder.add(display_words[i], False)
+    else:
+        for i, word in enumerate(answer_words):
+            if i:
+                builder.add(" ", True)
+            builder.add(display_words[i], word == actual_words[i])
+    return builder.build()
+
+
+def feedback_spans(user_answer, correct_translation, errors, score, accents=False):
+    """
+    Aligns the user's answer with the matched translation and returns a list of Spans
+    marking the parts that are right or wrong. Works in a single pass over the answer.
+    Accents mode checks accents as in the accent exercise view.
+    """
+    error_limit = len(correct_translation.folded) * FEEDBACK_ERROR_RATIO
+    perfect = not errors or score == FULL_SCORE
+    if accents:
+        perfect = perfect and user_answer.accent_tokens == correct_translation.accent_tokens
+
+    # Case: no errors
+    if perfect:
+        return [Span(user_answer.text, True)]
+
+    # Case: too many errors
+    elif errors > error_limit or score < FEEDBACK_MIN_SCORE:
+        return [Span(user_answer.text, False)]
+
+    # Accents mode compares words with accents and marks chars regardless of case
+    if accents:
+        answer_words, actual_words = user_answer.accent_tokens, correct_translation.accent_tokens
+        answer_str, actual_str = " ".join(answer_words), " ".join(actual_words)
+        display_str = answer_str
+        answer_str, actual_str = answer_str.lower(), actual_str.lower()
+        char_errors = errors <= 1
+    else:
+        answer_words, actual_words = user_answer.tokens, correct_translation.tokens
+        answer_str, actual_str = user_answer.folded, correct_translation.folded
+        # Show the user's own accents and case where they line up with the folded answer
+        display_str = " ".join(user_answer.accent_tokens)
+        if len(display_str) != len(answer_str):
+            display_str = answer_str
+        char_errors = errors == 1
+
+    # Case: one error and user answer same length as correct answer
+    if char_errors and len(answer_str) == len(actual_str):
+        return char_spans(display_str, answer_str, actual_str)
+    return word_spans(user_answer.words, answer_words, actual_words)
+
+
+def render_spans(spans):
+    """Renders feedback Spans as HTML in one join. Text is escaped."""
+    return "".join([
+        f'<span class="{"text-success" if correct else "text-danger"}">{html.escape(text)}</span>'
+        for text, correct in spans
+    ])
+
+
+def spans_to_json(spans):
+    """Returns feedback Spans as a list of dicts for JSON responses."""
+    return [{'text': text, 'correct': correct} for text, correct in spans]
+
+
+def feedback(user_answer, correct_translation, errors, score):
+    """
+    Generates HTML style tags to provide better feedback on translation accuracy.
+    Used for learn, practice and review exercise view classes. Takes the user's
+    answer and the matched translation as NormalizedAnswer tuples.
+    """
+    return render_spans(feedback_spans(user_answer, correct_translation, errors, score))
+
+
+def accent_feedback(user_answer, correct_translation, errors, score):
+    """
+    Generates HTML style tags to provide better feedback on translation
+    accuracy. Used in the accent testing extreme difficulty excercise view.
+    Takes the user's answer and the translation as NormalizedAnswer tuples.
+    """
+    return render_spans(
+        feedback_spans(user_answer, correct_translation, errors, score, accents=True)
+    )
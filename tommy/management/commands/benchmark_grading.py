@@ -0,0 +1,74 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tommy.benchmark import BENCHMARKS, build_corpus, find_regressions, run_benchmarks, to_json
+
+
+# Baseline of the grading benchmarks, checked in next to the benchmark module
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'benchmark_baseline.json'
+)
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the grading engine on a generated corpus of phrase pairs and perturbed
+    answers. Reports ops/sec and p50/p99 latency per function and answer class, and fails
+    when a function over all answers is slower than the stored baseline by more than the
+    tolerance. Single answer classes have too few answers to time reliably, so they are
+    only compared with --per-class.
+    """
+    help = "Benchmark grading functions and compare them with the stored baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=600, help="Number of corpus answers")
+        parser.add_argument('--rounds', type=int, default=5, help="Timed rounds per answer")
+        parser.add_argument('--seed', type=int, default=2023)
+        parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS),
+            help="Run only these benchmarks")
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument('--tolerance', type=float, default=0.25,
+            help="Fraction slower than the baseline allowed before failing")
+        parser.add_argument('--per-class', action='store_true',
+            help="Also fail on single answer classes, not only on each function as a whole")
+        parser.add_argument('--save-baseline', action='store_true',
+            help="Store these results as the new baseline instead of comparing")
+
+    def handle(self, *args, **options):
+        cases = build_corpus(options['size'], options['seed'])
+        results = run_benchmarks(cases, options['rounds'], options['only'])
+
+        self.stdout.write(f"{'benchmark':<24}{'answers':<14}{'ops/sec':>12}{'p50 us':>10}{'p99 us':>10}")
+        for name, by_class in results.items():
+            for answer_class, result in by_class.items():
+                self.stdout.write(
+                    f"{name:<24}{answer_class:<14}{result.ops_per_sec:>12.0f}"
+                    f"{result.p50_us:>10.2f}{result.p99_us:>10.2f}"
+                )
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as file:
+                json.dump(to_json(results), file, indent=2)
+                file.write("\n")
+            self.stdout.write(f"Saved baseline to {options['baseline']}")
+            return
+
+        try:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            self.stdout.write("No baseline found. Run with --save-baseline to create one.")
+            return
+
+        regressions = find_regressions(
+            results, baseline, options['tolerance'], None if options['per_class'] else ('all',)
+        )
+        for name, answer_class, expected, actual in regressions:
+            self.stderr.write(
+                f"{name} ({answer_class}): {actual:.0f} ops/sec, baseline {expected:.0f}"
+            )
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmarks are slower than the baseline")
+        self.stdout.write("No regressions against the baseline.")
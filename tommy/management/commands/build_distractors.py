@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from tommy.distractors import build_distractors
+from tommy.models import Phrase
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the distractor index used by multiple choice exercises. Run after loading
+    content that bypassed the staff pages, which rebuild the modules they change.
+    """
+    help = "Rebuild the wrong answers offered for each phrase in multiple choice"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', help="Only rebuild the phrases of this module")
+
+    def handle(self, *args, **options):
+        phrases = Phrase.objects.all()
+        if options['module']:
+            phrases = phrases.filter(module__name=options['module'])
+        count = build_distractors(phrases)
+        self.stdout.write(f"Stored {count} distractors for {phrases.count()} phrases.")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tommy.search import ensure_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the glossary search index. Saving phrases and translations keeps it up to
+    date, run this after loading content that bypassed model save.
+    """
+    help = "Rebuild the full-text index used by glossary search"
+
+    def handle(self, *args, **options):
+        if not ensure_search_index():
+            raise CommandError("This database has no SQLite FTS5 support")
+        count = rebuild_search_index()
+        self.stdout.write(f"Indexed {count} phrases.")
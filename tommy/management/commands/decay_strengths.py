@@ -0,0 +1,87 @@
+from datetime import datetime, time, timedelta
+from time import monotonic
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+import numpy as np
+
+from tommy.decay import DAY_SECONDS, DECAY_PER_DAY, DECAY_THRESHOLD
+from tommy.models import UserPhraseStrength
+
+
+def decay_chunk(strengths, ages, per_day=DECAY_PER_DAY, threshold=DECAY_THRESHOLD):
+    """
+    Applies decayed_strength to a chunk of rows at once. Takes arrays of stored strengths
+    and seconds since each was set. Returns the decayed strengths and whole days decayed.
+    """
+    days = np.maximum(0, np.floor_divide(ages, DAY_SECONDS)).astype(np.int64)
+    decayed = np.where(
+        strengths > threshold, np.maximum(threshold, strengths - days * per_day), strengths
+    )
+    return decayed, days
+
+
+class Command(BaseCommand):
+    """
+    Stores the decayed strength of every learned phrase, for databases that keep strength
+    materialized. Decay is measured up to the start of the day, and each row's timestamp
+    moves forward by the whole days applied, so running it again the same day changes
+    nothing. Rows are read in id order in chunks, one transaction per chunk, so an
+    interrupted run can resume with --after-id.
+    """
+    help = "Apply daily strength decay to all learned phrases in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--after-id', type=int, default=0,
+            help="Resume after this row id, as reported by an interrupted run")
+        parser.add_argument('--date', help="Decay up to the start of this day (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("Date must be in YYYY-MM-DD format")
+        else:
+            day = timezone.localdate()
+        now = timezone.make_aware(datetime.combine(day, time.min))
+        batch_size, last_id = options['batch_size'], options['after_id']
+        scanned = updated = 0
+        started = monotonic()
+
+        rows = UserPhraseStrength.objects.filter(learned=True, strength__gt=DECAY_THRESHOLD)
+        while True:
+            chunk = list(
+                rows.filter(id__gt=last_id).order_by('id').values_list(
+                    'id', 'strength', 'strength_updated_at', 'updated_at'
+                )[:batch_size]
+            )
+            if not chunk:
+                break
+            ids, strengths, set_at, updated_at = zip(*chunk)
+            timestamps = [stored or fallback for stored, fallback in zip(set_at, updated_at)]
+            ages = now.timestamp() - np.array([timestamp.timestamp() for timestamp in timestamps])
+            decayed, days = decay_chunk(np.array(strengths, dtype=np.int64), ages)
+
+            changed = [
+                UserPhraseStrength(
+                    id=ids[i], strength=int(decayed[i]),
+                    strength_updated_at=timestamps[i] + timedelta(days=int(days[i]))
+                )
+                for i in np.flatnonzero(days > 0)
+            ]
+            with transaction.atomic():
+                UserPhraseStrength.objects.bulk_update(changed, ['strength', 'strength_updated_at'])
+
+            scanned, updated, last_id = scanned + len(chunk), updated + len(changed), ids[-1]
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Processed rows up to id {last_id}")
+
+        elapsed = monotonic() - started
+        rate = scanned / elapsed if elapsed else 0
+        self.stdout.write(
+            f"Decayed {updated} of {scanned} rows up to {day} in {elapsed:.1f}s "
+            f"({rate:.0f} rows/s). Last id {last_id}."
+        )
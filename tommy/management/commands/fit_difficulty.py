@@ -0,0 +1,122 @@
+from time import monotonic
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+import numpy as np
+
+from tommy.models import Phrase, Profile, UserPhraseStrength
+
+
+# Precision of the normal prior on abilities and difficulties. Keeps the fit finite for
+# users and phrases with only right or only wrong answers, and centres both scales on 0.
+PRIOR_PRECISION = 1.0
+
+
+def fit_chunk(ability, difficulty, users, phrases, views, correct):
+    """
+    Returns the gradient and information of the log likelihood of one chunk of answers,
+    for every ability then every difficulty. Users and phrases are positions in the
+    ability and difficulty arrays. Each row counts correct successes in views tries.
+    """
+    probability = 1 / (1 + np.exp(difficulty[phrases] - ability[users]))
+    residual = correct - views * probability
+    information = views * probability * (1 - probability)
+    return (
+        np.bincount(users, residual, len(ability)),
+        np.bincount(users, information, len(ability)),
+        -np.bincount(phrases, residual, len(difficulty)),
+        np.bincount(phrases, information, len(difficulty)),
+    )
+
+
+def snapshot_positions(ids, values):
+    """
+    Returns the positions of values in the sorted ids array, and a mask of the values that
+    are in it. Rows of users or phrases created after the ids were read are masked out.
+    """
+    if not len(ids):
+        return np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(ids, values), len(ids) - 1)
+    return positions, ids[positions] == values
+
+
+def newton_step(values, gradient, information, prior=PRIOR_PRECISION):
+    """Returns the values after one Newton step on the log posterior of each value."""
+    return values + (gradient - prior * values) / (information + prior)
+
+
+class Command(BaseCommand):
+    """
+    Fits a difficulty for every phrase and an ability for every user from the views and
+    correct answers of all UserPhraseStrength rows, with a 1PL item response model. Rows
+    are read in id order in chunks on every iteration, so memory use grows with the number
+    of users and phrases and not with the number of rows. Run nightly.
+    """
+    help = "Fit phrase difficulty and user ability from all answers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def chunks(self, batch_size):
+        """Yields arrays of user ids, phrase ids, views and correct answers of the rows."""
+        rows = UserPhraseStrength.objects.filter(views__gt=0)
+        last_id = 0
+        while True:
+            chunk = list(
+                rows.filter(id__gt=last_id).order_by('id').values_list(
+                    'id', 'user_id', 'phrase_id', 'views', 'correct'
+                )[:batch_size]
+            )
+            if not chunk:
+                return
+            ids, users, phrases, views, correct = (np.array(column) for column in zip(*chunk))
+            last_id = int(ids[-1])
+            yield users, phrases, views, np.minimum(correct, views)
+
+    def handle(self, *args, **options):
+        started = monotonic()
+        user_ids = np.array(
+            get_user_model().objects.order_by('id').values_list('id', flat=True), dtype=np.int64
+        )
+        phrase_ids = np.array(Phrase.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+        ability, difficulty = np.zeros(len(user_ids)), np.zeros(len(phrase_ids))
+
+        rows = 0
+        for _ in range(options['iterations']):
+            ability_gradient, ability_information = np.zeros_like(ability), np.zeros_like(ability)
+            difficulty_gradient, difficulty_information = (
+                np.zeros_like(difficulty), np.zeros_like(difficulty))
+            rows = 0
+            for users, phrases, views, correct in self.chunks(options['batch_size']):
+                users, known_users = snapshot_positions(user_ids, users)
+                phrases, known_phrases = snapshot_positions(phrase_ids, phrases)
+                known = known_users & known_phrases
+                users, phrases, views, correct = users[known], phrases[known], views[known], correct[known]
+                gradients = fit_chunk(ability, difficulty, users, phrases, views, correct)
+                ability_gradient += gradients[0]
+                ability_information += gradients[1]
+                difficulty_gradient += gradients[2]
+                difficulty_information += gradients[3]
+                rows += len(users)
+            ability = newton_step(ability, ability_gradient, ability_information)
+            difficulty = newton_step(difficulty, difficulty_gradient, difficulty_information)
+
+        # Store the fit. Phrases and users without answers are left at 0, the prior mean.
+        abilities = dict(zip(user_ids.tolist(), ability.tolist()))
+        difficulties = dict(zip(phrase_ids.tolist(), difficulty.tolist()))
+        with transaction.atomic():
+            profiles = list(Profile.objects.only('id', 'user_id'))
+            for profile in profiles:
+                profile.ability = abilities.get(profile.user_id, 0)
+            Profile.objects.bulk_update(profiles, ['ability'], batch_size=options['batch_size'])
+            Phrase.objects.bulk_update(
+                [Phrase(id=phrase_id, difficulty=value) for phrase_id, value in difficulties.items()],
+                ['difficulty'], batch_size=options['batch_size']
+            )
+
+        self.stdout.write(
+            f"Fitted {len(phrase_ids)} phrases and {len(user_ids)} users from {rows} rows "
+            f"in {monotonic() - started:.1f}s."
+        )
@@ -0,0 +1,40 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tommy.grading import grade_batch
+
+
+class Command(BaseCommand):
+    """
+    Grades a CSV of answers against the catalog in one batch, for example to re-score answer
+    logs after a grading change. Each input row holds an answer and a phrase id.
+    """
+    help = "Grade a CSV of answer,phrase_id rows and write the scores as CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with answer,phrase_id rows")
+        parser.add_argument('--output', help="Write results to this file instead of stdout")
+        parser.add_argument('--workers', type=int, default=None,
+            help="Grade large batches across this many processes")
+        parser.add_argument('--compat', action='store_true',
+            help="Grade words with the legacy compatible scorer")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8') as file:
+                pairs = [(row[0], int(row[1])) for row in csv.reader(file) if row]
+        except (OSError, IndexError, ValueError) as error:
+            raise CommandError(f"Could not read answers: {error}")
+
+        results = grade_batch(pairs, compat=options['compat'], workers=options['workers'])
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') \
+            if options['output'] else self.stdout
+        try:
+            writer = csv.writer(output)
+            writer.writerow(['answer', 'phrase_id', 'translation_id', 'score', 'errors'])
+            writer.writerows(results)
+        finally:
+            if options['output']:
+                output.close()
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from tommy.catalog import bump_catalog_version
+from tommy.models import Phrase, Translation
+from tommy.normalize import normalize
+from tommy.search import ensure_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    """
+    Backfills the stored normalized forms of all phrases and translations. Run after
+    upgrading an existing database or after loading content that bypassed model save.
+    """
+    help = "Backfill normalized phrase and translation columns used for grading"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        phrase_count = self.backfill(Phrase, 'phrase', batch_size)
+        translation_count = self.backfill(Translation, 'translation', batch_size)
+        if phrase_count or translation_count:
+            # Glossary search reads the normalized forms, bulk updates don't send signals
+            bump_catalog_version()
+            if ensure_search_index():
+                rebuild_search_index()
+        self.stdout.write(
+            f"Normalized {phrase_count} phrases and {translation_count} translations."
+        )
+
+    def backfill(self, model, text_field, batch_size):
+        """Updates rows whose stored normalized form is out of date. Returns the update count."""
+        fields = ['normalized', 'normalized_tokens']
+        changed, updated = [], 0
+        rows = model.objects.only('id', text_field, *fields).iterator(chunk_size=batch_size)
+        for row in rows:
+            normalized, tokens = normalize(getattr(row, text_field))
+            if row.normalized != normalized or row.normalized_tokens != tokens:
+                row.normalized, row.normalized_tokens = normalized, tokens
+                changed.append(row)
+            if len(changed) >= batch_size:
+                updated += model.objects.bulk_update(changed, fields)
+                changed = []
+        if changed:
+            updated += model.objects.bulk_update(changed, fields)
+        return updated
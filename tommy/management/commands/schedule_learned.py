@@ -0,0 +1,33 @@
+from time import monotonic
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tommy.models import UserPhraseStrength
+
+
+class Command(BaseCommand):
+    """
+    Makes every phrase learned before review scheduling existed due now, for all users, so
+    Review and the box counts include them without waiting for each user to log in again.
+    Rows are updated in id order in chunks, so running it again only touches rows that are
+    still unscheduled. Run once after deploying review scheduling.
+    """
+    help = "Schedule learned phrases that have no review due date"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        now, batch_size, last_id, updated = timezone.now(), options['batch_size'], 0, 0
+        started = monotonic()
+
+        rows = UserPhraseStrength.objects.filter(learned=True, due_at__isnull=True)
+        while True:
+            ids = list(rows.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            updated += UserPhraseStrength.objects.filter(id__in=ids).update(due_at=now)
+            last_id = ids[-1]
+
+        self.stdout.write(f"Scheduled {updated} learned phrases in {monotonic() - started:.1f}s.")
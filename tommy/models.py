@@ -3,6 +3,9 @@ from django.contrib.auth import get_user_model
 from django.core.validators import MinLengthValidator
 from django.db import models
 
+from .decay import decayed_strength
+from .normalize import normalize, normalizer
+
 
 class Profile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -12,6 +15,9 @@ class Profile(models.Model):
     )
     xp = models.IntegerField(default=0)
 
+    # Ability of the user on the logit scale, fitted by the fit_difficulty command
+    ability = models.FloatField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -54,6 +60,15 @@ class Phrase(models.Model):
         through='UserPhraseStrength')
     module = models.ForeignKey(Module, null=True, on_delete=models.SET_NULL,
         related_name='phrases_in_module')
+
+    # Accent folded, lowercased and punctuation free forms of the phrase. Set on save.
+    normalized = models.CharField(max_length=512, blank=True, default="", db_index=True,
+        editable=False)
+    normalized_tokens = models.JSONField(default=list, blank=True, editable=False)
+
+    # Difficulty of the phrase across all users on the logit scale, fitted with user
+    # ability by the fit_difficulty command. See tommy.difficulty.
+    difficulty = models.FloatField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -62,6 +77,20 @@ class Phrase(models.Model):
         constraints = [ # models.functions.Lower('name'),
             models.UniqueConstraint(fields=['phrase', 'language'], name='unique_phrase_language')
         ]
+        indexes = [
+            # Learn picks the phrase of a module closest to a target difficulty
+            models.Index(fields=['module', 'difficulty'], name='module_difficulty_idx'),
+            # Glossary pages through the phrases of a language in alphabetical order
+            models.Index(fields=['language', 'phrase', 'id'], name='phrase_language_sort_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Store the normalized forms so grading and search never recompute them
+        self.normalized, self.normalized_tokens = normalize(self.phrase)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phrase' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized', 'normalized_tokens'}
+        super().save(*args, **kwargs)
 
     def is_valid_phrase(self):
         language_test = self.language in ["French", "English"]
@@ -88,8 +117,25 @@ class Translation(models.Model):
     )
     phrase = models.ForeignKey(Phrase, null=True, on_delete=models.SET_NULL,
         related_name='phrase_translations')
+
+    # Accent folded, lowercased and punctuation free forms of the translation. Set on save.
+    normalized = models.CharField(max_length=512, blank=True, default="", db_index=True,
+        editable=False)
+    normalized_tokens = models.JSONField(default=list, blank=True, editable=False)
     
     # For creation and update times, rely to phrase datetime data
+
+    def save(self, *args, **kwargs):
+        # Store the normalized forms so grading and search never recompute them
+        self.normalized, self.normalized_tokens = normalize(self.translation)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'translation' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized', 'normalized_tokens'}
+        super().save(*args, **kwargs)
+
+    def normalized_form(self):
+        """Returns the stored normalized forms as the NormalizedAnswer used for grading."""
+        return normalizer.from_stored(self.translation, self.normalized, self.normalized_tokens)
     
     def is_valid_translation(self):
         valid_languages = ["French", "English"]
@@ -108,6 +154,26 @@ class Translation(models.Model):
         return f'{self.translation} ({self.phrase})'
 
 
+class Distractor(models.Model):
+    """
+    Wrong answer offered for a phrase in multiple choice exercises. Built offline from the
+    translations of other phrases by tommy.distractors and rebuilt when the catalog changes.
+    """
+    phrase = models.ForeignKey(Phrase, on_delete=models.CASCADE, related_name='distractors')
+    translation = models.ForeignKey(Translation, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    similarity = models.FloatField()
+
+    class Meta:
+        ordering = ['rank']
+        constraints = [
+            models.UniqueConstraint(fields=['phrase', 'rank'], name='unique_phrase_distractor_rank')
+        ]
+
+    def __str__(self):
+        return f'{self.translation.translation} (not {self.phrase})'
+
+
 class UserPhraseStrength(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
         related_name='user_phrase_strength')
@@ -118,11 +184,40 @@ class UserPhraseStrength(models.Model):
     strength = models.IntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # When strength was last set. Strength decays from here when read, see tommy.decay.
+    strength_updated_at = models.DateTimeField(null=True, blank=True)
+
+    # SM-2 review schedule, set by tommy.scheduling when the phrase is learned and after
+    # every answer. Unlearned phrases have no due date. Interval is in days.
+    due_at = models.DateTimeField(null=True, blank=True)
+    interval = models.FloatField(default=0)
+    ease = models.FloatField(default=2.5)
+    repetitions = models.PositiveIntegerField(default=0)
+
+    # Leitner box, from 1 up, moved by tommy.scheduling after every answer
+    box = models.PositiveSmallIntegerField(default=1)
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'phrase'], name='unique_user_phrase_strength')
         ]
+        indexes = [
+            # Next phrase due for review is one seek
+            models.Index(fields=['user', 'due_at'], name='user_phrase_due_idx'),
+            # First due phrase of a Leitner box is one seek, and box counts read the index
+            models.Index(fields=['user', 'box', 'due_at'], name='user_box_due_idx'),
+            # Exercises select among a user's learned phrases, weakest first. Partial index
+            # because SQLite can't seek on a bare boolean column.
+            models.Index(fields=['user', 'strength'], name='user_learned_strength_idx',
+                condition=models.Q(learned=True)),
+        ]
     
+    def current_strength(self, now=None):
+        """Returns the strength of the phrase as of now, after decay since it was set."""
+        return decayed_strength(
+            self.strength, self.strength_updated_at or self.updated_at, now
+        )
+
     def is_valid_user_phrase_strength(self):
         User = get_user_model()
         user_test = User.objects.filter(username=self.user.username).exists()
@@ -0,0 +1,95 @@
+from collections import namedtuple
+import string
+
+from unidecode import unidecode
+
+
+# Built once and shared. Removes all ASCII punctuation from a string with str.translate.
+PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+
+# Accented letters used in French with their plain forms. Covers nearly every answer so
+# unidecode is only needed for text outside this set.
+FRENCH_ACCENTS = {
+    "à": "a", "â": "a", "ä": "a", "á": "a", "ç": "c", "é": "e", "è": "e", "ê": "e",
+    "ë": "e", "î": "i", "ï": "i", "í": "i", "ô": "o", "ö": "o", "ó": "o", "ù": "u",
+    "û": "u", "ü": "u", "ú": "u", "ÿ": "y", "ñ": "n", "œ": "oe", "æ": "ae",
+}
+
+# Normalized forms of a phrase, translation or user answer. The tuples words, tokens and
+# accent_tokens line up, one entry for every word of the text that isn't only punctuation.
+#   text          - the text as entered
+#   words         - words of the text as entered, for display in feedback
+#   folded        - accent folded, lowercased, punctuation free words joined by single spaces
+#   compact       - folded without spaces
+#   tokens        - words of folded
+#   accent_tokens - punctuation free words with their accents and case kept
+NormalizedAnswer = namedtuple(
+    'NormalizedAnswer', ['text', 'words', 'folded', 'compact', 'tokens', 'accent_tokens']
+)
+
+
+class Normalizer:
+    """
+    Normalizes text for grading in a single pass with translate tables built once.
+    Calling the normalizer returns a NormalizedAnswer that all grading functions share.
+    """
+
+    def __init__(self, accents=FRENCH_ACCENTS):
+        self.punctuation_table = PUNCTUATION_TABLE
+        # Lowercase letters are mapped, text is lowercased before folding
+        self.accent_table = str.maketrans(accents)
+
+    def fold(self, word):
+        """Returns a lowercased word with accents removed and no punctuation."""
+        folded = word.lower().translate(self.accent_table)
+        if not folded.isascii():
+            # Rare text outside the French accent set. unidecode can add punctuation and spaces.
+            folded = unidecode(folded).lower().translate(self.punctuation_table).replace(" ", "")
+        return folded
+
+    def has_letters(self, token):
+        """Returns False for a punctuation free token that folds to nothing, like « or —."""
+        return token.isascii() or bool(self.fold(token))
+
+    def split(self, text):
+        """Returns the words of the text as entered and its punctuation free accent tokens."""
+        accent_tokens = text.translate(self.punctuation_table).split()
+        if not text.isascii():
+            # Punctuation outside ASCII, like guillemets, dashes and ellipses, folds to nothing
+            accent_tokens = [token for token in accent_tokens if self.has_letters(token)]
+        words = text.split()
+        if len(words) != len(accent_tokens):
+            # Drop words made only of punctuation so every word lines up with a token
+            words = [
+                word for word in words
+                if word.translate(self.punctuation_table)
+                and self.has_letters(word.translate(self.punctuation_table))
+            ]
+        return words, accent_tokens
+
+    def __call__(self, text):
+        words, accent_tokens = self.split(text)
+        folded = " ".join(accent_tokens).lower().translate(self.accent_table)
+        if folded.isascii():
+            tokens = folded.split()
+        else:
+            tokens = [self.fold(token) for token in accent_tokens]
+            folded = " ".join(tokens)
+        return NormalizedAnswer(text, words, folded, "".join(tokens), tokens, accent_tokens)
+
+    def from_stored(self, text, folded, tokens):
+        """Builds a NormalizedAnswer from forms stored on a model without folding again."""
+        words, accent_tokens = self.split(text)
+        return NormalizedAnswer(text, words, folded, "".join(tokens), tokens, accent_tokens)
+
+
+normalizer = Normalizer()
+
+
+def normalize(text):
+    """
+    Returns the comparable form of a phrase, translation or user answer and its word tokens.
+    Text is accent folded, lowercased, stripped of punctuation and has its whitespace collapsed.
+    """
+    answer = normalizer(text)
+    return answer.folded, answer.tokens
@@ -0,0 +1,82 @@
+import heapq
+
+from django.core.cache import cache
+
+from .decay import decayed_strength_expression
+from .models import UserPhraseStrength
+
+
+# Seconds a user's practice queue is kept in the cache before it is read again from the
+# database. Strength only decays once a day so an hour old queue is close enough.
+PRACTICE_QUEUE_TIMEOUT = 60 * 60
+
+# Strength points added to a phrase's priority when it is answered, so a phrase that was
+# just practiced waits behind others of about the same strength until the queue expires.
+RECENCY_PENALTY = 10
+
+
+def practice_queue_key(user_id):
+    return f"tommy:practice-queue:{user_id}"
+
+
+def build_queue(user_id):
+    """
+    Returns a practice queue of the user's learned phrases. The queue is a dict with a heap
+    of (priority, UserPhraseStrength id) entries, weakest first, and the current priority
+    of each id. Entries whose priority has changed since they were pushed are stale.
+    """
+    priorities = dict(
+        UserPhraseStrength.objects.filter(user_id=user_id, learned=True).annotate(
+            current_strength=decayed_strength_expression()
+        ).values_list('id', 'current_strength')
+    )
+    heap = [(priority, row_id) for row_id, priority in priorities.items()]
+    heapq.heapify(heap)
+    return {'heap': heap, 'priorities': priorities}
+
+
+def load_queue(user_id):
+    """Returns the user's practice queue from the cache, building it on a miss."""
+    queue = cache.get(practice_queue_key(user_id))
+    if queue is None:
+        queue = build_queue(user_id)
+        cache.set(practice_queue_key(user_id), queue, PRACTICE_QUEUE_TIMEOUT)
+    return queue
+
+
+def weakest(user_id, count):
+    """
+    Returns the ids of the user's count weakest learned phrases, weakest first. Pops
+    them off the heap, dropping stale entries on the way, then pushes them back.
+    """
+    queue = load_queue(user_id)
+    heap, priorities = queue['heap'], queue['priorities']
+    taken = []
+    while heap and len(taken) < count:
+        priority, row_id = heapq.heappop(heap)
+        # Skip entries replaced by a later grade and duplicates of a taken entry
+        if priorities.get(row_id) != priority or (priority, row_id) in taken:
+            continue
+        taken.append((priority, row_id))
+    for entry in taken:
+        heapq.heappush(heap, entry)
+    cache.set(practice_queue_key(user_id), queue, PRACTICE_QUEUE_TIMEOUT)
+    return [row_id for _, row_id in taken]
+
+
+def update_queue(strength):
+    """
+    Moves a graded UserPhraseStrength to its new place in its user's cached queue, with
+    the recency penalty. Does nothing if the queue isn't cached, the next read builds it.
+    """
+    queue = cache.get(practice_queue_key(strength.user_id))
+    if queue is None:
+        return
+    heap, priorities = queue['heap'], queue['priorities']
+    priorities[strength.id] = strength.strength + RECENCY_PENALTY
+    heapq.heappush(heap, (priorities[strength.id], strength.id))
+    # Drop stale entries once they outnumber the live ones
+    if len(heap) > 2 * len(priorities):
+        queue['heap'] = [(priority, row_id) for row_id, priority in priorities.items()]
+        heapq.heapify(queue['heap'])
+    cache.set(practice_queue_key(strength.user_id), queue, PRACTICE_QUEUE_TIMEOUT)
@@ -0,0 +1,47 @@
+from random import randrange, sample as random_sample
+
+
+# Number of recently tested phrases kept in the session to avoid asking them again
+RECENT_LIMIT = 5
+
+
+def sample(queryset, exclude_ids=(), randrange=randrange):
+    """
+    Returns a random row of the queryset, or None if it is empty, without loading the
+    other rows. Counts the rows and reads the one at a random offset. Rows with ids in
+    exclude_ids are skipped unless nothing else is left.
+    """
+    if exclude_ids:
+        row = sample(queryset.exclude(id__in=exclude_ids), randrange=randrange)
+        if row is not None:
+            return row
+    count = queryset.count()
+    if not count:
+        return None
+    return queryset.order_by('id')[randrange(count)]
+
+
+def sample_ids(queryset, size, exclude_ids=(), choose=random_sample):
+    """
+    Returns the ids of up to size different random rows of the queryset, in the order
+    drawn. Reads only the ids, in one unsorted query. Rows with ids in exclude_ids are
+    only drawn once no other rows are left.
+    """
+    ids, excluded = list(queryset.order_by().values_list('id', flat=True)), set(exclude_ids)
+    fresh = [row_id for row_id in ids if row_id not in excluded]
+    drawn = choose(fresh, min(size, len(fresh)))
+    if len(drawn) < size:
+        recent = [row_id for row_id in ids if row_id in excluded]
+        drawn += choose(recent, min(size - len(drawn), len(recent)))
+    return drawn
+
+
+def recent_ids(session, key='recent_phrase_strength_ids'):
+    """Returns the ids recently tested in this session."""
+    return session.get(key, [])
+
+
+def remember(session, row_id, key='recent_phrase_strength_ids', limit=RECENT_LIMIT):
+    """Adds an id to the recently tested ids in the session, dropping the oldest."""
+    ids = [id for id in session.get(key, []) if id != row_id]
+    session[key] = (ids + [row_id])[-limit:]
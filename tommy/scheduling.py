@@ -0,0 +1,130 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import UserPhraseStrength
+
+
+# SM-2 spaced repetition settings. Intervals are in days. Ease grows with easy answers
+# and shrinks with hard ones, but never below MIN_EASE.
+MIN_EASE, FIRST_INTERVAL, SECOND_INTERVAL = 1.3, 1, 6
+
+# Answer quality on the SM-2 scale of 0 to 5. Answers of quality PASSING_QUALITY or better
+# count as remembered.
+PERFECT_QUALITY, PASSING_QUALITY = 5, 3
+
+# Leitner boxes. A remembered phrase moves up a box and a forgotten one goes back to the
+# first. With the Leitner scheduler a phrase in box n is due LEITNER_INTERVALS[n - 1] days
+# after it was answered.
+LEITNER_INTERVALS = (1, 2, 4, 8, 16)
+LEITNER_BOXES = range(1, len(LEITNER_INTERVALS) + 1)
+
+
+def answer_quality(correct, score=None):
+    """
+    Returns the SM-2 quality of an answer from whether it passed and its score out of 100.
+    Exercises without a score, like multiple choice, give full marks to correct answers.
+    """
+    if score is None:
+        return PERFECT_QUALITY if correct else 0
+    if correct:
+        # Passing scores of 90 and up, or 85 for short answers, map to 3 to 5
+        return PERFECT_QUALITY if score >= 100 else max(PASSING_QUALITY, round(score / 20))
+    # A near miss is remembered better than an answer that is completely wrong
+    return min(PASSING_QUALITY - 1, round(score / 40))
+
+
+def move_box(strength, quality):
+    """Moves a UserPhraseStrength to its Leitner box after an answer, without saving it."""
+    if quality < PASSING_QUALITY:
+        strength.box = LEITNER_BOXES[0]
+    else:
+        strength.box = min(LEITNER_BOXES[-1], strength.box + 1)
+
+
+def schedule(strength, quality, now=None):
+    """
+    Updates the review schedule of a UserPhraseStrength after an answer of the given quality
+    without saving it, so the schedule is written with the rest of the grade. The Leitner
+    box is always kept up to date. The due date comes from the REVIEW_SCHEDULER setting.
+    """
+    now = now or timezone.now()
+    # The strength graded with this answer is current as of now. Decay counts from here.
+    strength.strength_updated_at = now
+    move_box(strength, quality)
+    if settings.REVIEW_SCHEDULER == 'leitner':
+        strength.due_at = now + timedelta(days=LEITNER_INTERVALS[strength.box - 1])
+        return
+    if quality < PASSING_QUALITY:
+        # Forgotten phrases start over and come back the next day
+        strength.repetitions = 0
+        strength.interval = FIRST_INTERVAL
+    else:
+        if strength.repetitions == 0:
+            strength.interval = FIRST_INTERVAL
+        elif strength.repetitions == 1:
+            strength.interval = SECOND_INTERVAL
+        else:
+            strength.interval = round(strength.interval * strength.ease, 2)
+        strength.repetitions += 1
+    strength.ease = max(
+        MIN_EASE,
+        round(strength.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02), 2)
+    )
+    strength.due_at = now + timedelta(days=strength.interval)
+
+
+def due_phrases(user):
+    """
+    Returns the learned UserPhraseStrengths of the user in the order they are due for
+    review. Only learned phrases have a due date so this reads the (user, due_at) index.
+    """
+    return UserPhraseStrength.objects.filter(
+        user=user, due_at__isnull=False
+    ).order_by('due_at', 'id')
+
+
+def next_due(user):
+    """Returns the learned UserPhraseStrength of the user due for review first, or None."""
+    return due_phrases(user).first()
+
+
+def leitner_due(user, count, now=None):
+    """
+    Returns the ids of up to count learned phrases of the user to review, from the first
+    box with phrases due onwards, earliest due first within a box. Each box is one seek on
+    the (user, box, due_at) index, so the cost doesn't grow with the number of phrases.
+    When fewer than count are due, the phrases due next make up the rest.
+    """
+    now = now or timezone.now()
+    ids = []
+    for box in LEITNER_BOXES:
+        ids += UserPhraseStrength.objects.filter(
+            user=user, box=box, due_at__lte=now
+        ).order_by('due_at', 'id').values_list('id', flat=True)[:count - len(ids)]
+        if len(ids) == count:
+            return ids
+    return ids + list(
+        due_phrases(user).filter(due_at__gt=now).values_list('id', flat=True)[:count - len(ids)]
+    )
+
+
+def box_counts(user):
+    """Returns (box, number of learned phrases) for each Leitner box of the user."""
+    counts = dict(
+        UserPhraseStrength.objects.filter(user=user, due_at__isnull=False)
+        .values_list('box').annotate(count=Count('id')).order_by('box')
+    )
+    return [(box, counts.get(box, 0)) for box in LEITNER_BOXES]
+
+
+def schedule_unscheduled(user, now=None):
+    """
+    Makes phrases learned before scheduling existed due now. Returns the number updated.
+    The schedule_learned command does the same for every user at once.
+    """
+    return UserPhraseStrength.objects.filter(
+        user=user, learned=True, due_at__isnull=True
+    ).update(due_at=now or timezone.now())
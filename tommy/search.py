@@ -0,0 +1,112 @@
+from django.db import DatabaseError, connection
+
+from .models import Phrase, Translation
+from .normalize import normalizer
+
+
+# SQLite FTS5 index of the catalog, one row per phrase with the phrase id as its rowid.
+# The stored normalized forms are indexed and the tokenizer folds any accents left, so
+# searches match whatever the accents and case. The table lives outside the migrations
+# and is created and filled on first use.
+SEARCH_TABLE = 'tommy_phrase_search'
+
+# bm25 weight of a match in the phrase, then in its translations
+PHRASE_WEIGHT, TRANSLATION_WEIGHT = 2.0, 1.0
+
+
+def search_index_supported():
+    return connection.vendor == 'sqlite'
+
+
+def ensure_search_index():
+    """
+    Creates and fills the search index if it doesn't exist yet. Returns False if the
+    database has no FTS5, so callers fall back to searching the tables.
+    """
+    if not search_index_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE]
+        )
+        if cursor.fetchone():
+            return True
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                "phrase, translations, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except DatabaseError:
+            return False
+    rebuild_search_index()
+    return True
+
+
+def search_rows(phrases):
+    """Returns the (rowid, phrase, translations) index rows of a Phrase queryset."""
+    translations = {}
+    for phrase_id, normalized in Translation.objects.filter(phrase__in=phrases).values_list(
+            'phrase_id', 'normalized'):
+        translations.setdefault(phrase_id, []).append(normalized)
+    return [
+        (phrase_id, normalized, " ".join(translations.get(phrase_id, [])))
+        for phrase_id, normalized in phrases.values_list('id', 'normalized')
+    ]
+
+
+def index_phrases(phrase_ids):
+    """Replaces the index rows of the phrases, dropping those of deleted phrases."""
+    if not ensure_search_index():
+        return
+    phrase_ids = list(phrase_ids)
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [[id] for id in phrase_ids])
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, phrase, translations) VALUES (%s, %s, %s)",
+            search_rows(Phrase.objects.filter(id__in=phrase_ids)),
+        )
+
+
+def rebuild_search_index():
+    """Indexes the whole catalog again. Returns the number of phrases indexed."""
+    rows = search_rows(Phrase.objects.all())
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, phrase, translations) VALUES (%s, %s, %s)", rows
+        )
+    return len(rows)
+
+
+def match_expression(search):
+    """
+    Returns the FTS5 query for a user's search: every word must match the start of a word
+    of the phrase or its translations. None if the search has no words.
+    """
+    tokens = normalizer(search).tokens
+    if not tokens:
+        return None
+    return " ".join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+
+def search_phrases(search, language=Phrase.FRENCH):
+    """
+    Returns the ids of the phrases of the language matching the search, best match first,
+    or None if the search index isn't available. The index lookup costs in proportion to
+    the matches, not the catalog.
+    """
+    if not ensure_search_index():
+        return None
+    expression = match_expression(search)
+    if expression is None:
+        return []
+    phrase_table = Phrase._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {SEARCH_TABLE}.rowid FROM {SEARCH_TABLE} "
+            f"JOIN {phrase_table} ON {phrase_table}.id = {SEARCH_TABLE}.rowid "
+            f"WHERE {SEARCH_TABLE} MATCH %s AND {phrase_table}.language = %s "
+            f"ORDER BY bm25({SEARCH_TABLE}, {PHRASE_WEIGHT}, {TRANSLATION_WEIGHT}), {SEARCH_TABLE}.rowid",
+            [expression, language],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import Module, Phrase, Translation, UserPhraseStrength
+from .practice_queue import update_queue
+from .scheduling import schedule_unscheduled
+from .search import index_phrases
+
+
+# Login work and distractor rebuilds after staff edits run here, off the request that
+# started them. One worker keeps their writes from competing for the database.
+refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='strength-refresh')
+
+# Seconds the once a day guard is kept, a little over a day
+REFRESH_GUARD_TIMEOUT = 25 * 60 * 60
+
+
+def refresh_guard_key(user_id, day=None):
+    return f"tommy:strength-refresh:{user_id}:{day or timezone.localdate()}"
+
+
+def claim_daily_refresh(user_id, day=None):
+    """
+    Returns True the first time it is called for a user on a day and False after that.
+    The claim is kept in the cache, so it holds across processes with a shared cache.
+    """
+    return cache.add(refresh_guard_key(user_id, day), True, REFRESH_GUARD_TIMEOUT)
+
+
+def run_in_background(function, *args):
+    """Runs a function on a refresh_executor thread and closes the thread's connection."""
+    try:
+        return function(*args)
+    finally:
+        # Worker threads open their own connection, don't leave it open between logins
+        connection.close()
+
+
+@receiver(user_logged_in)
+def refresh_strength_on_login(sender, request, user, **kwargs):
+    """
+    Refreshes the user's phrases at most once a day, in the background after the login
+    is committed, so the login redirect doesn't wait for it. Strength decays when read so
+    this only schedules phrases learned before review scheduling.
+    """
+    if claim_daily_refresh(user.pk):
+        transaction.on_commit(
+            lambda: refresh_executor.submit(run_in_background, schedule_unscheduled, user.pk)
+        )
+
+
+@receiver(post_save, sender=UserPhraseStrength)
+def update_practice_queue(sender, instance, **kwargs):
+    """Keeps the user's cached practice queue in step with each grade that is written."""
+    if instance.learned:
+        update_queue(instance)
+
+
+@receiver([post_save, post_delete], sender=Module)
+@receiver([post_save, post_delete], sender=Phrase)
+@receiver([post_save, post_delete], sender=Translation)
+def catalog_changed(sender, **kwargs):
+    """Retires the cached glossary pages when the content they show changes."""
+    bump_catalog_version()
+
+
+@receiver([post_save, post_delete], sender=Phrase)
+def index_phrase(sender, instance, **kwargs):
+    """Keeps the glossary search index in step with each phrase."""
+    index_phrases([instance.id])
+
+
+@receiver([post_save, post_delete], sender=Translation)
+def index_translation(sender, instance, **kwargs):
+    """Indexes the phrase of a translation again with its translations as they are now."""
+    if instance.phrase_id is not None:
+        index_phrases([instance.phrase_id])
@@ -0,0 +1,593 @@
+from random import Random
+import string
+
+from django.test import SimpleTestCase
+
+from .benchmark import ANSWER_CLASSES, BenchmarkResult, build_corpus, find_regressions, run_benchmarks, to_json
+from .grading import (
+    GradeResult, GradingCache, MatchIndex, Span, damerau_levenshtein, eval_tranlation, eval_word, feedback, feedback_spans,
+    render_spans, score_bound, spans_to_json,
+)
+from .normalize import normalizer
+
+
+# Copy of eval_word as it was before the edit distance engine. The parity tests check the
+# new engine and its compat mode against it.
+def legacy_eval_word(user_answer_word, correct_word):
+    """
+    Evaluates the test score for a word entered by the user in comparison to correct
+    answer. Supports eval_tranlation function to evaluate translation accuracy.
+    """
+    # Variables to help evaluate word score
+    correct_count, error_count = 0, 0
+    answer_length, actual_length = len(user_answer_word), len(correct_word)
+
+    # Case: user answer word is one char shorter than correct word
+    if answer_length == actual_length - 1:
+        words = []
+        for i in range(actual_length):
+            word = ""
+            for j in range(actual_length):
+                if i == j:
+                    continue
+                else:
+                    word += correct_word[j]
+            words.append(word)
+        if user_answer_word in words:
+            accuracy = ( ( actual_length - 1 ) / actual_length ) * 100
+            return accuracy, 1
+        
+    # Case: user answer word is one char longer than correct word
+    elif answer_length - 1 == actual_length:
+        words = []
+        for i in range(answer_length):
+            word = ""
+            for j in range(answer_length):
+                if i == j:
+                    continue
+                else:
+                    word += user_answer_word[j]
+            words.append(word)
+        if correct_word in words:
+            accuracy = ( ( actual_length - 1 ) / actual_length ) * 100
+            return accuracy, 1
+    
+    # Case: same length or more than one char longer or shorter
+    shorter_word_length = min(actual_length, answer_length)
+    for i in range(shorter_word_length):
+        if correct_word[i] == user_answer_word[i]:
+            correct_count += 1
+        else:
+            error_count += 1
+
+    # Calculate score based on length difference and accuracy
+    length_difference = abs(answer_length - actual_length)
+    error_count += length_difference
+    accuracy = ( correct_count / ( shorter_word_length + length_difference ) ) * 100
+    return accuracy, error_count
+
+
+# Copy of eval_tranlation as it was before answers were normalized once, grading with
+# legacy_eval_word. The compat parity test checks eval_tranlation against it.
+def legacy_eval_tranlation(user_answer, correct_translation):
+    """
+    Evaluates the test score for a translation entered by the user
+    in comparison to correct translation.
+    """
+    # Set variables to help evaluate accuracty of translation
+    answer_str = user_answer.lower().translate(str.maketrans("", "", string.punctuation))
+    correct_str = correct_translation.lower().translate(str.maketrans("", "", string.punctuation))
+    answer_words, correct_words = answer_str.split(), correct_str.split()
+    answer_str, correct_str = answer_str.replace(" ", ""), correct_str.replace(" ", "")
+    actual_word_count, answer_word_count = len(correct_words), len(answer_words)
+    actual_str_len, answer_str_len = len(correct_str), len(answer_str)
+    error_count, total_score, FULL_SCORE, FAIL = 0, 0, 100, 0
+
+    # Case: Exact same string gets fullscore
+    if answer_str == correct_str:
+        return FULL_SCORE, error_count
+
+    # One word translation is evaluated for spelling errors and superfluous words
+    elif actual_word_count == 1:
+        if answer_word_count == 1:
+            return legacy_eval_word(user_answer, correct_translation)
+        else:
+            factor = 1.7 / answer_word_count
+            for word in answer_words:
+                word_accuracy, word_errors = legacy_eval_word(word, correct_translation)
+                if word_accuracy == FULL_SCORE:
+                    error_count = word_errors + ( answer_str_len - ( actual_str_len - len(word) ) )
+                    return word_accuracy * factor, error_count
+            return FAIL, answer_str_len
+
+    # Multiple word translation evaluates accuracy of words separately
+    else:
+        # If the number of words is the same compare the words one by one
+        if answer_word_count == actual_word_count:
+            for i in range(actual_word_count):
+                if answer_words[i] == correct_words[i]:
+                    total_score += FULL_SCORE
+                else:
+                    word_score, word_errors = legacy_eval_word(answer_words[i], correct_words[i])
+                    total_score += word_score
+                    error_count += word_errors
+            return (total_score / actual_word_count), error_count
+        # Otherwise search for the words in the full string
+        else:
+            if correct_str in answer_str or answer_str in correct_str:
+                accuracy = ( ( actual_str_len - abs( actual_str_len - answer_str_len ) )
+                            / actual_str_len * FULL_SCORE )
+                accuracy = accuracy if accuracy > FAIL else FAIL
+                error_count += abs(actual_str_len - answer_str_len)
+                return accuracy, error_count
+            else:
+                factor = ( ( actual_word_count - abs( answer_word_count - actual_word_count ) )
+                          / actual_word_count )
+                correct_word_count = 0
+                for word in correct_words:
+                    if word in answer_words:
+                        correct_word_count += 1
+                    else:
+                        error_count += int(len(word) / 2)
+                for word in answer_words:
+                    if word not in correct_words:
+                        error_count += int(len(word) / 2)
+                accuracy = (correct_word_count / actual_word_count) * factor * FULL_SCORE
+                return accuracy, error_count
+
+
+def reference_distance(source, target):
+    """Unbounded optimal string alignment distance computed over the full matrix."""
+    rows = [[0] * (len(target) + 1) for _ in range(len(source) + 1)]
+    for i in range(len(source) + 1):
+        rows[i][0] = i
+    for j in range(len(target) + 1):
+        rows[0][j] = j
+    for i in range(1, len(source) + 1):
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            rows[i][j] = min(rows[i - 1][j] + 1, rows[i][j - 1] + 1, rows[i - 1][j - 1] + cost)
+            if (i > 1 and j > 1 and source[i - 1] == target[j - 2]
+                    and source[i - 2] == target[j - 1]):
+                rows[i][j] = min(rows[i][j], rows[i - 2][j - 2] + 1)
+    return rows[-1][-1]
+
+
+def word_pairs(count=2000, seed=7):
+    """Random word pairs built from typical learner mistakes on French and English words."""
+    words = [
+        "bonjour", "salut", "merci", "fromage", "chat", "chien", "maison", "voiture",
+        "ecole", "bibliotheque", "hello", "goodbye", "house", "library", "a", "au", "le",
+        "tres", "bien", "aujourdhui", "beaucoup", "pomme", "oiseau", "grenouille",
+    ]
+    rng, letters, pairs = Random(seed), "abcdefghijklmnopqrstuvwxyz", []
+    for _ in range(count):
+        word = rng.choice(words)
+        answer = list(word)
+        for _ in range(rng.randint(0, 3)):
+            edit = rng.choice(["insert", "delete", "substitute", "transpose"])
+            position = rng.randint(0, max(len(answer) - 1, 0))
+            if edit == "insert":
+                answer.insert(position, rng.choice(letters))
+            elif edit == "delete" and len(answer) > 1:
+                del answer[position]
+            elif edit == "substitute" and answer:
+                answer[position] = rng.choice(letters)
+            elif edit == "transpose" and position + 1 < len(answer):
+                answer[position], answer[position + 1] = answer[position + 1], answer[position]
+        pairs.append(("".join(answer), word))
+    return pairs
+
+
+class DamerauLevenshteinTestCase(SimpleTestCase):
+
+    def test_known_distances(self):
+        self.assertEqual(damerau_levenshtein("chat", "chat"), 0)
+        self.assertEqual(damerau_levenshtein("chat", "chats"), 1)
+        self.assertEqual(damerau_levenshtein("chta", "chat"), 1)
+        self.assertEqual(damerau_levenshtein("", "chat"), 4)
+        self.assertEqual(damerau_levenshtein("fromage", "formage"), 1)
+        self.assertEqual(damerau_levenshtein("kitten", "sitting"), 3)
+
+    def test_matches_reference_on_random_pairs(self):
+        for answer, word in word_pairs():
+            self.assertEqual(
+                damerau_levenshtein(answer, word), reference_distance(answer, word), (answer, word)
+            )
+
+    def test_cutoff_returns_one_over_the_limit(self):
+        for answer, word in word_pairs(500):
+            distance = reference_distance(answer, word)
+            for limit in range(4):
+                expected = distance if distance <= limit else limit + 1
+                self.assertEqual(damerau_levenshtein(answer, word, limit), expected, (answer, word))
+
+
+class EvalWordParityTestCase(SimpleTestCase):
+
+    def test_compat_mode_reproduces_original_scores(self):
+        for answer, word in word_pairs():
+            self.assertEqual(
+                eval_word(answer, word, compat=True), legacy_eval_word(answer, word), (answer, word)
+            )
+
+    def test_compat_translation_reproduces_original_scores(self):
+        # The original divided by zero on answers made only of punctuation, they are left out
+        cases = [(case.answer, case.translation) for case in build_corpus()]
+        cases += [(answer, word) for answer, word in word_pairs(count=300)]
+        cases += [("bonjur!", "bonjour"), ("Bonjour", "bonjour"), ("très", "tres"), ("le chat", "chat")]
+        for answer, translation in cases:
+            if not normalizer(answer).tokens:
+                continue
+            self.assertEqual(
+                eval_tranlation(answer, translation, compat=True),
+                legacy_eval_tranlation(answer, translation), (answer, translation)
+            )
+        self.assertEqual(eval_tranlation("bonjur!", "bonjour", compat=True), legacy_eval_word("bonjur!", "bonjour"))
+
+    def test_engine_matches_original_for_single_edits(self):
+        # One missing, extra or substituted char scored the same before and after the switch
+        for answer, word in [("bonjou", "bonjour"), ("bonjourr", "bonjour"), ("bonjoor", "bonjour"),
+                             ("chat", "chat"), ("sallut", "salut"), ("merc", "merci")]:
+            self.assertEqual(eval_word(answer, word), legacy_eval_word(answer, word), (answer, word))
+
+    def test_engine_never_scores_below_original_error_count(self):
+        # Edit distance is a lower bound on the original positional error count
+        for answer, word in word_pairs():
+            _, errors = eval_word(answer, word)
+            _, legacy_errors = legacy_eval_word(answer, word)
+            self.assertLessEqual(errors, legacy_errors, (answer, word))
+
+    def test_engine_scores_leading_insertion_as_one_error(self):
+        self.assertEqual(legacy_eval_word("xxbonjour", "bonjour"), (0, 9))
+        accuracy, errors = eval_word("xxbonjour", "bonjour")
+        self.assertEqual(errors, 2)
+        self.assertAlmostEqual(accuracy, 5 / 7 * 100)
+
+    def test_engine_scores_transposition_as_one_error(self):
+        accuracy, errors = eval_word("formage", "fromage")
+        self.assertEqual(errors, 1)
+        self.assertAlmostEqual(accuracy, 6 / 7 * 100)
+
+    def test_completely_wrong_word_scores_zero(self):
+        self.assertEqual(eval_word("xyz", "au"), (0, 3))
+
+    def test_translation_compat_mode(self):
+        self.assertEqual(eval_tranlation("le formage", "le fromage", compat=True), (100 * (1 + 5 / 7) / 2, 2))
+        self.assertEqual(eval_tranlation("le formage", "le fromage"), (100 * (1 + 6 / 7) / 2, 1))
+
+
+class NormalizerTestCase(SimpleTestCase):
+
+    def test_french_answer(self):
+        answer = normalizer("  L'élève   a DÉJÀ mangé! ")
+        self.assertEqual(answer.folded, "leleve a deja mange")
+        self.assertEqual(answer.compact, "leleveadejamange")
+        self.assertEqual(answer.tokens, ["leleve", "a", "deja", "mange"])
+        self.assertEqual(answer.accent_tokens, ["Lélève", "a", "DÉJÀ", "mangé"])
+        self.assertEqual(answer.words, ["L'élève", "a", "DÉJÀ", "mangé!"])
+
+    def test_ligatures_and_other_scripts(self):
+        self.assertEqual(normalizer("Œuf").folded, "oeuf")
+        self.assertEqual(normalizer("Straße").folded, "strasse")
+
+    def test_punctuation_only_words_are_dropped(self):
+        answer = normalizer("Oui - non ?")
+        self.assertEqual(answer.tokens, ["oui", "non"])
+        self.assertEqual(answer.words, ["Oui", "non"])
+
+    def test_punctuation_outside_ascii_is_dropped(self):
+        answer = normalizer("« Bonjour » — ça va…")
+        self.assertEqual(answer.tokens, ["bonjour", "ca", "va"])
+        self.assertEqual(answer.folded, "bonjour ca va")
+        self.assertEqual(answer.words, ["Bonjour", "ça", "va…"])
+        self.assertEqual(answer.accent_tokens, ["Bonjour", "ça", "va…"])
+        self.assertEqual(normalizer("Oui — non").tokens, ["oui", "non"])
+
+    def test_guillemets_are_graded_like_plain_text(self):
+        self.assertEqual(eval_tranlation("Bonjur", "« Bonjour »"), eval_tranlation("Bonjur", "Bonjour"))
+        self.assertEqual(eval_tranlation("« Bonjour »", "Bonjour"), (100, 0))
+
+    def test_from_stored_matches_full_normalization(self):
+        text = "Ça va, Élodie?"
+        answer = normalizer(text)
+        self.assertEqual(normalizer.from_stored(text, answer.folded, answer.tokens), answer)
+
+    def test_apostrophes_are_graded_unescaped(self):
+        self.assertEqual(eval_tranlation("J'ai faim", "j'ai faim"), (100, 0))
+
+
+class FeedbackTestCase(SimpleTestCase):
+
+    def spans(self, answer, translation, errors, score, accents=False):
+        return feedback_spans(normalizer(answer), normalizer(translation), errors, score, accents)
+
+    def test_correct_answer(self):
+        self.assertEqual(self.spans("Bonjour!", "bonjour", 0, 100), [Span("Bonjour!", True)])
+
+    def test_too_many_errors(self):
+        self.assertEqual(self.spans("le chien", "le chat", 3, 50), [Span("le chien", False)])
+
+    def test_marks_wrong_char(self):
+        self.assertEqual(
+            self.spans("Le chat noit", "le chat noir", 1, 91),
+            [Span("Le chat noi", True), Span("t", False)],
+        )
+
+    def test_marks_extra_word(self):
+        self.assertEqual(
+            self.spans("le petit chat noir", "le chat noir", 1, 80),
+            [Span("le ", True), Span("petit", False), Span(" chat noir", True)],
+        )
+
+    def test_each_translation_word_matches_once(self):
+        self.assertEqual(
+            self.spans("le le chat est noir", "le chat est noir", 1, 80),
+            [Span("le ", True), Span("le", False), Span(" chat est noir", True)],
+        )
+
+    def test_marks_word_in_shorter_answer(self):
+        self.assertEqual(
+            self.spans("the cat is", "the cat is very good", 1, 75),
+            [Span("the cat is", True)],
+        )
+
+    def test_accents_mode_marks_missing_accent(self):
+        answer, translation = normalizer("Tres bien!"), normalizer("très bien")
+        score, errors = eval_tranlation(answer, translation)
+        self.assertEqual(
+            feedback_spans(answer, translation, errors, score, accents=True),
+            [Span("Tr", True), Span("e", False), Span("s bien", True)],
+        )
+
+    def test_render_escapes_text(self):
+        html = render_spans([Span("<b>", False), Span(" chat", True)])
+        self.assertEqual(
+            html, '<span class="text-danger">&lt;b&gt;</span><span class="text-success"> chat</span>'
+        )
+        self.assertEqual(
+            feedback(normalizer("<b>chat</b>"), normalizer("chien"), 5, 0),
+            '<span class="text-danger">&lt;b&gt;chat&lt;/b&gt;</span>',
+        )
+
+    def test_spans_to_json(self):
+        self.assertEqual(spans_to_json([Span("chat", True)]), [{'text': "chat", 'correct': True}])
+
+
+def translation_sets(count=300, seed=11):
+    """Random answers with sets of accepted translations that share words with them."""
+    words = ["the", "a", "cat", "cats", "is", "are", "very", "good", "well", "fine", "le",
+             "chat", "est", "tres", "bien", "hello", "hi", "there", "my", "friend"]
+    rng, sets = Random(seed), []
+    for _ in range(count):
+        translations = [
+            " ".join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+            for _ in range(rng.randint(1, 8))
+        ]
+        base = rng.choice(translations).split()
+        if rng.random() < 0.5 and len(base) > 1:
+            del base[rng.randrange(len(base))]
+        if rng.random() < 0.5:
+            base.insert(rng.randint(0, len(base)), rng.choice(words))
+        if rng.random() < 0.5:
+            word = rng.randrange(len(base))
+            base[word] = base[word][:-1] or "x"
+        sets.append((" ".join(base), translations))
+    return sets
+
+
+def decorated_translation_sets(count=300, seed=13):
+    """translation_sets with punctuation, capitals and accents added, which compat scores."""
+    rng = Random(seed)
+
+    def decorate(text):
+        if rng.random() < 0.3:
+            text = text.replace("tres", "très")
+        if rng.random() < 0.3:
+            text = text.capitalize()
+        if rng.random() < 0.5:
+            text += rng.choice(["!", "!!!", "?", ".", "...", "!!!x"])
+        return text
+
+    return [
+        (decorate(answer), [decorate(translation) for translation in translations])
+        for answer, translations in translation_sets(count, seed)
+    ]
+
+
+def linear_best_match(answer, translations, compat=False):
+    """The original selection loop: score every translation and keep the first highest."""
+    best = (-1, None, None)
+    for position, translation in enumerate(translations):
+        score, errors = eval_tranlation(answer, translation, compat)
+        if score > best[0]:
+            best = (score, errors, position)
+    return best
+
+
+class MatchIndexTestCase(SimpleTestCase):
+
+    def build(self, translations, compat=False):
+        return MatchIndex(((i, normalizer(t)) for i, t in enumerate(translations)), compat)
+
+    def test_exact_match_uses_first_translation(self):
+        index = self.build(["Very good", "very good!", "Very well"])
+        match = index.best_match(normalizer("VERY GOOD"))
+        self.assertEqual((match.translation, match.score, match.errors), (0, 100, 0))
+
+    def test_empty_index(self):
+        self.assertIsNone(self.build([]).best_match(normalizer("hello")))
+
+    def test_bound_is_never_below_score(self):
+        for compat in [False, True]:
+            for answer, translations in translation_sets() + decorated_translation_sets():
+                answer = normalizer(answer)
+                for translation in map(normalizer, translations):
+                    exact_key = self.build([], compat).exact_key
+                    if exact_key(answer) == exact_key(translation):
+                        continue
+                    score, _ = eval_tranlation(answer, translation, compat)
+                    self.assertGreaterEqual(
+                        score_bound(answer, translation, compat) + 1e-9, score, (answer, translation)
+                    )
+
+    def test_matches_linear_search(self):
+        for compat in [False, True]:
+            for answer, translations in translation_sets() + decorated_translation_sets():
+                match = self.build(translations, compat).best_match(normalizer(answer))
+                self.assertEqual(
+                    (match.score, match.errors, match.translation),
+                    linear_best_match(answer, translations, compat),
+                    (answer, translations),
+                )
+
+    def test_compat_bound_uses_the_text_as_entered(self):
+        answer, translation = normalizer("chat!!!x"), normalizer("chat!!!")
+        score, _ = eval_tranlation(answer, translation, compat=True)
+        self.assertAlmostEqual(score, 6 / 7 * 100)
+        self.assertGreaterEqual(score_bound(answer, translation, compat=True), score)
+
+    def test_punctuation_only_answer_fails(self):
+        self.assertEqual(eval_tranlation("?", "chat"), (0, 4))
+
+    def accent_index(self, translations):
+        return MatchIndex(((i, normalizer(t)) for i, t in enumerate(translations)), accents=True)
+
+    def test_accents_prefer_translation_with_same_accents(self):
+        index = self.accent_index(["Élève", "eleve"])
+        match, exact, _ = index.grade_accents(normalizer("eleve"))
+        self.assertEqual((match.translation, exact), (1, True))
+        match, exact, spans = index.grade_accents(normalizer("Élève"))
+        self.assertEqual((match.translation, exact), (0, True))
+        self.assertEqual(spans, [Span("Élève", True)])
+
+    def test_accents_missing_is_not_exact(self):
+        match, exact, spans = self.accent_index(["Très bien", "Bien"]).grade_accents(
+            normalizer("Tres bien")
+        )
+        self.assertEqual((match.translation, match.score, exact), (0, 100, False))
+        self.assertIn(Span("e", False), spans)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class GradingCacheTestCase(SimpleTestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = GradingCache(maxsize=2)
+        cache.set((1, "a", "mode"), GradeResult(100, 0, None, None))
+        cache.set((2, "b", "mode"), GradeResult(50, 2, None, None))
+        cache.get((1, "a", "mode"))
+        cache.set((3, "c", "mode"), GradeResult(0, 5, None, None))
+        self.assertIsNone(cache.get((2, "b", "mode")))
+        self.assertEqual(cache.get((1, "a", "mode")).score, 100)
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = GradingCache(ttl=10, clock=clock)
+        cache.set((1, "a", "mode"), GradeResult(100, 0, None, None))
+        clock.now = 9
+        self.assertIsNotNone(cache.get((1, "a", "mode")))
+        clock.now = 10
+        self.assertIsNone(cache.get((1, "a", "mode")))
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_translation(self):
+        cache = GradingCache()
+        cache.set((1, "a", "mode"), GradeResult(100, 0, None, None))
+        cache.set((1, "b", "mode"), GradeResult(50, 2, None, None))
+        cache.set((2, "a", "mode"), GradeResult(0, 5, None, None))
+        cache.invalidate_translation(1)
+        self.assertEqual(len(cache), 1)
+        self.assertIsNotNone(cache.get((2, "a", "mode")))
+
+    def test_stats(self):
+        cache = GradingCache(maxsize=5)
+        cache.get((1, "a", "mode"))
+        cache.set((1, "a", "mode"), GradeResult(100, 0, None, None))
+        cache.get((1, "a", "mode"))
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 5})
+
+    def test_index_grades_from_cache(self):
+        cache = GradingCache()
+        translations = ["the cat is black", "the black cat"]
+        index = MatchIndex(((i, normalizer(t)) for i, t in enumerate(translations)), cache=cache)
+        uncached = MatchIndex((i, normalizer(t)) for i, t in enumerate(translations))
+        for answer in ["The cat is blak", "the cat is blak", "The cat is blak"]:
+            self.assertEqual(index.grade(normalizer(answer)), uncached.grade(normalizer(answer)))
+        self.assertGreater(cache.stats()['hits'], 0)
+
+    def test_each_grade_looks_up_the_cache_once(self):
+        cache = GradingCache(maxsize=5)
+        index = MatchIndex([(1, normalizer("the black cat"))], cache=cache)
+        index.grade(normalizer("the blak cat"))
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 1, 'size': 1, 'maxsize': 5})
+        index.grade(normalizer("the blak cat"))
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 5})
+        # A different case is a new entry, its spans differ
+        index.grade(normalizer("The blak cat"))
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 2, 'size': 2, 'maxsize': 5})
+        # Exact matches skip scoring and look up their spans once
+        index.grade(normalizer("the black cat"))
+        index.grade(normalizer("the black cat"))
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 3, 'size': 3, 'maxsize': 5})
+
+    def test_spans_follow_the_text_entered(self):
+        index = MatchIndex([(1, normalizer("the cat is black"))], cache=GradingCache())
+        _, spans = index.grade(normalizer("The cat is blak"))
+        _, other_spans = index.grade(normalizer("the cat is blak!"))
+        self.assertEqual(spans[0].text, "The cat is ")
+        self.assertEqual(other_spans[0].text, "the cat is ")
+
+
+class BenchmarkTestCase(SimpleTestCase):
+
+    def test_corpus_is_repeatable_and_covers_answer_classes(self):
+        corpus = build_corpus(size=60)
+        self.assertEqual(corpus, build_corpus(size=60))
+        self.assertEqual({case.answer_class for case in corpus}, set(ANSWER_CLASSES))
+        for case in corpus:
+            if case.answer_class == "exact":
+                self.assertEqual(case.answer, case.translation)
+
+    def test_run_and_compare_with_baseline(self):
+        results = run_benchmarks(build_corpus(size=12), rounds=2, names=['eval_tranlation'])
+        self.assertEqual(set(results), {'calibration', 'eval_tranlation'})
+        self.assertEqual(set(results['calibration']), {'start', 'end', 'all'})
+        self.assertIn('all', results['eval_tranlation'])
+        baseline = to_json(results)
+        self.assertEqual(find_regressions(results, baseline), [])
+
+        # A baseline four times as fast on the same machine is a regression, whatever the noise
+        baseline['eval_tranlation']['all']['ops_per_sec'] *= 4
+        self.assertEqual(
+            [regression[:2] for regression in find_regressions(results, baseline)],
+            [('eval_tranlation', 'all')]
+        )
+        # The same baseline saved on a machine four times as fast is not
+        baseline['calibration']['all']['ops_per_sec'] *= 4
+        self.assertEqual(find_regressions(results, baseline), [])
+
+    def test_regressions_compare_aggregates_with_noise(self):
+        def results(start, end, typo, all):
+            return {
+                'calibration': {'start': BenchmarkResult(start, 0, 0), 'end': BenchmarkResult(end, 0, 0),
+                                'all': BenchmarkResult(max(start, end), 0, 0)},
+                'eval_word': {'typo': BenchmarkResult(typo, 0, 0), 'all': BenchmarkResult(all, 0, 0)},
+            }
+        baseline = to_json(results(100, 100, 1000, 1000))
+        # A slow answer class alone only fails when classes are compared
+        self.assertEqual(find_regressions(results(100, 100, 500, 900), baseline), [])
+        regressions = find_regressions(results(100, 100, 500, 900), baseline, answer_classes=None)
+        self.assertEqual([regression[:2] for regression in regressions], [('eval_word', 'typo')])
+        # 30% slower fails on a steady machine but not when the calibration moved 20%
+        self.assertEqual(len(find_regressions(results(100, 100, 700, 700), baseline)), 1)
+        self.assertEqual(find_regressions(results(100, 80, 700, 700), baseline), [])
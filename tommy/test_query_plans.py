@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .distractors import build_distractors
+from .models import Module, Phrase, Profile, Translation, UserPhraseStrength
+
+
+User = get_user_model()
+
+# Tables a view is expected to read in full, because it lists every row
+ALLOWED_SCANS = {
+    'tommy:modules': {'tommy_module'},
+}
+
+
+def query_plan(sql):
+    """Returns the details of each step of SQLite's plan for a query."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    """Returns the tables a query plan reads in full, through the table or an index."""
+    return {
+        step.split()[1] for step in plan
+        if step.startswith("SCAN ") and not step.startswith("SCAN CONSTANT ROW")
+    }
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Runs every exercise view on a seeded database and checks the plan of each query
+    they make. A query that scans a whole table fails, as it would slow down with the
+    size of the catalog or the number of users.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            User.objects.create_user(username=f"user{n}", password="dj39&*d2") for n in range(3)
+        ]
+        for user in users:
+            Profile.objects.create(user=user, name=user.username)
+        for m in range(3):
+            module = Module.objects.create(name=f"Module {m}")
+            for p in range(10):
+                phrase = Phrase.objects.create(language="French", phrase=f"Phrase {m} {p}", module=module)
+                Translation.objects.create(language="English", translation=f"Translation {m} {p}", phrase=phrase)
+                for user in users:
+                    UserPhraseStrength.objects.create(
+                        user=user, phrase=phrase, learned=p % 2 == 0, strength=p * 10
+                    )
+        cls.module = module
+        build_distractors()
+
+    def setUp(self):
+        # Start without cached practice queues so the queries that build them are checked
+        cache.clear()
+        self.client.login(username="user0", password="dj39&*d2")
+
+    def assertNoFullScans(self, view, request):
+        with CaptureQueriesContext(connection) as context:
+            request()
+        for query in context.captured_queries:
+            if not query['sql'].startswith("SELECT"):
+                continue
+            plan = query_plan(query['sql'])
+            scans = full_scans(plan) - ALLOWED_SCANS.get(view, set())
+            self.assertFalse(scans, f"{view} scans {scans}:\n{query['sql']}\n{plan}")
+
+    def test_menu_views(self):
+        for view in ['tommy:home', 'tommy:modules', 'tommy:glossary']:
+            self.assertNoFullScans(view, lambda: self.client.get(reverse(view)))
+
+    def test_learn(self):
+        url = reverse('tommy:learn', args=[self.module.id])
+        self.assertNoFullScans('tommy:learn', lambda: self.client.get(url))
+        self.assertNoFullScans('tommy:learn', lambda: self.client.post(url, {'answer': "Translation"}))
+        self.assertNoFullScans('tommy:feedback', lambda: self.client.get(reverse('tommy:feedback')))
+
+    def test_exercises(self):
+        for view in ['tommy:practice', 'tommy:review', 'tommy:accent']:
+            url = reverse(view)
+            self.assertNoFullScans(view, lambda: self.client.get(url))
+            self.assertNoFullScans(view, lambda: self.client.post(url, {'answer': "Translation"}))
+            self.assertNoFullScans('tommy:feedback', lambda: self.client.get(reverse('tommy:feedback')))
+
+    @override_settings(REVIEW_SCHEDULER='leitner')
+    def test_leitner_review(self):
+        UserPhraseStrength.objects.filter(learned=True).update(due_at=timezone.now())
+        url = reverse('tommy:review')
+        self.assertNoFullScans('tommy:review', lambda: self.client.get(url))
+        self.assertNoFullScans('tommy:review', lambda: self.client.post(url, {'answer': "Translation"}))
+
+    def test_choice(self):
+        url = reverse('tommy:choice')
+        self.assertNoFullScans('tommy:choice', lambda: self.client.get(url))
+        answer = self.client.session['choice_answer_id']
+        self.assertNoFullScans('tommy:choice', lambda: self.client.post(url, {'answer': answer}))
+
+    def test_selection_uses_composite_indexes(self):
+        user = User.objects.get(username="user0")
+        learned = UserPhraseStrength.objects.filter(user=user, learned=True)
+        plan = query_plan(str(learned.order_by('strength').query))
+        self.assertIn("user_learned_strength_idx", " ".join(plan))
+        self.assertNotIn("TEMP B-TREE", " ".join(plan))
+        due = UserPhraseStrength.objects.filter(user=user, due_at__isnull=False).order_by('due_at')
+        self.assertIn("user_phrase_due_idx", " ".join(query_plan(str(due.query))))
@@ -1,8 +1,33 @@
-from django.db import IntegrityError
+from datetime import datetime, time, timedelta
+from io import StringIO
+import tempfile
+
+from django.db import IntegrityError, connection
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-from .models import Module, Phrase, Profile, Translation, UserPhraseStrength
+from .catalog import catalog_version, glossary_page_key, parse_after
+from .decay import decayed_strength, decayed_strength_expression
+from .decks import build_deck
+from .difficulty import closest_difficulty, success_probability, target_difficulty
+from .distractors import build_distractors, rebuild_module_distractors, rebuild_module_distractors_later
+from .grading import MatchIndex, grade_batch, grading_cache
+from .management.commands import fit_difficulty
+from .models import Distractor, Module, Phrase, Profile, Translation, UserPhraseStrength
+from .normalize import normalizer
+from .practice_queue import RECENCY_PENALTY, load_queue, weakest
+from .sampling import remember, sample, sample_ids
+from .search import SEARCH_TABLE, match_expression, search_phrases
+from .scheduling import (
+    answer_quality, box_counts, due_phrases, leitner_due, next_due, schedule, schedule_unscheduled
+)
+from .signals import claim_daily_refresh
+from .typeahead import TYPEAHEAD_MAX_LIMIT, TypeaheadIndex, typeahead_cache, typeahead_index
 
 
 User = get_user_model()
@@ -302,3 +327,854 @@ class UserPhraseStrengthTestCase(TestCase):
         finnish_phrase = Phrase.objects.get(language="Finnish")
         user_phrase_strength = UserPhraseStrength.objects.get(user=bar, phrase=finnish_phrase)
         self.assertFalse(user_phrase_strength.is_valid_user_phrase_strength())
+
+
+class NormalizedFormTestCase(TestCase):
+
+    def setUp(self):
+        module = Module.objects.create(name="Good Module")
+        ca_va = Phrase.objects.create(language="French", phrase="Ça  va, Élodie?", module=module)
+        Translation.objects.create(language="English", translation="How's it going, Élodie?", phrase=ca_va)
+
+    def test_phrase_normalized_on_save(self):
+        phrase = Phrase.objects.get(language="French")
+        self.assertEqual(phrase.normalized, "ca va elodie")
+        self.assertEqual(phrase.normalized_tokens, ["ca", "va", "elodie"])
+
+    def test_translation_normalized_on_save(self):
+        translation = Translation.objects.get(language="English")
+        self.assertEqual(translation.normalized, "hows it going elodie")
+        self.assertEqual(translation.normalized_tokens, ["hows", "it", "going", "elodie"])
+
+    def test_translation_normalized_with_update_fields(self):
+        translation = Translation.objects.get(language="English")
+        translation.translation = "Fine!"
+        translation.save(update_fields=['translation'])
+        translation.refresh_from_db()
+        self.assertEqual(translation.normalized, "fine")
+        self.assertEqual(translation.normalized_tokens, ["fine"])
+
+    def test_normalize_catalog_backfills_stale_rows(self):
+        # Queryset updates skip model save and leave the normalized forms out of date
+        Phrase.objects.update(normalized="", normalized_tokens=[])
+        Translation.objects.update(translation="Très bien")
+        out = StringIO()
+        call_command('normalize_catalog', stdout=out)
+        self.assertIn("Normalized 1 phrases and 1 translations", out.getvalue())
+        self.assertEqual(Phrase.objects.get(language="French").normalized, "ca va elodie")
+        self.assertEqual(Translation.objects.get(language="English").normalized, "tres bien")
+
+
+class GradeBatchTestCase(TestCase):
+
+    def setUp(self):
+        module = Module.objects.create(name="Greetings")
+        self.bien = Phrase.objects.create(language="French", phrase="Très bien", module=module)
+        self.salut = Phrase.objects.create(language="French", phrase="Salut", module=module)
+        self.empty = Phrase.objects.create(language="French", phrase="Rien", module=module)
+        Translation.objects.create(language="English", translation="Very good", phrase=self.bien)
+        Translation.objects.create(language="English", translation="Very well", phrase=self.bien)
+        Translation.objects.create(language="English", translation="Hi", phrase=self.salut)
+        self.pairs = [
+            ("very well", self.bien.id), ("Very goud!", self.bien.id), ("hi", self.salut.id),
+            ("hello", self.salut.id), ("very well", self.bien.id), ("nothing", self.empty.id),
+        ]
+
+    def test_batch_matches_single_answer_grading(self):
+        results = grade_batch(self.pairs)
+        self.assertEqual([(r.answer, r.phrase_id) for r in results], self.pairs)
+        for result, (answer, phrase_id) in zip(results[:5], self.pairs):
+            index = MatchIndex.for_translations(Translation.objects.filter(phrase_id=phrase_id))
+            match = index.best_match(normalizer(answer))
+            self.assertEqual(
+                (result.translation_id, result.score, result.errors),
+                (match.translation.id, match.score, match.errors)
+            )
+        self.assertEqual(results[5][2:], (None, None, None))
+
+    def test_batch_loads_translations_in_one_query(self):
+        with self.assertNumQueries(1):
+            grade_batch(self.pairs)
+
+    def test_batch_across_workers(self):
+        pairs = self.pairs * 4
+        self.assertEqual(
+            grade_batch(pairs, workers=2, pool_min_size=1, chunk_size=5), grade_batch(pairs)
+        )
+
+    def test_grade_answers_command(self):
+        out = StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix=".csv") as file:
+            file.write(f"very well,{self.bien.id}\nhello,{self.salut.id}\n")
+            file.flush()
+            call_command('grade_answers', file.name, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "answer,phrase_id,translation_id,score,errors")
+        self.assertTrue(lines[1].startswith(f"very well,{self.bien.id},"))
+        self.assertEqual(len(lines), 3)
+
+
+class SchedulingTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="foo", password="dj39&*d2", email="foo@cb-bc.gc.ca")
+        module = Module.objects.create(name="Greetings")
+        self.strengths = []
+        for text in ["Bonjour", "Salut", "Merci"]:
+            phrase = Phrase.objects.create(language="French", phrase=text, module=module)
+            self.strengths.append(UserPhraseStrength.objects.create(user=self.user, phrase=phrase))
+        self.now = timezone.now()
+
+    def test_intervals_grow_with_correct_answers(self):
+        strength = self.strengths[0]
+        intervals = []
+        for _ in range(4):
+            schedule(strength, 5, self.now)
+            intervals.append(strength.interval)
+        self.assertEqual(intervals, [1, 6, 16.2, 45.36])
+        self.assertEqual(strength.due_at, self.now + timedelta(days=45.36))
+
+        # A forgotten phrase starts over and is easier to forget next time
+        schedule(strength, 1, self.now)
+        self.assertEqual((strength.interval, strength.repetitions), (1, 0))
+        self.assertEqual(strength.ease, 2.36)
+
+    def test_answer_quality(self):
+        self.assertEqual(answer_quality(True, 100), 5)
+        self.assertEqual(answer_quality(True, 86), 4)
+        self.assertEqual(answer_quality(False, 80), 2)
+        self.assertEqual(answer_quality(False, 0), 0)
+        self.assertEqual(answer_quality(True), 5)
+
+    def test_next_due_skips_unlearned_phrases(self):
+        first, second, unlearned = self.strengths
+        for strength, days in [(first, 3), (second, 1)]:
+            strength.learned, strength.due_at = True, self.now + timedelta(days=days)
+            strength.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(next_due(self.user), second)
+        self.assertIsNone(next_due(User.objects.create_user(username="bar")))
+
+
+    @override_settings(REVIEW_SCHEDULER='leitner')
+    def test_leitner_boxes(self):
+        strength = self.strengths[0]
+        boxes = []
+        for _ in range(6):
+            schedule(strength, 4, self.now)
+            boxes.append(strength.box)
+        self.assertEqual(boxes, [2, 3, 4, 5, 5, 5])
+        self.assertEqual(strength.due_at, self.now + timedelta(days=16))
+        # SM-2 is left alone while the Leitner scheduler is used
+        self.assertEqual(strength.repetitions, 0)
+
+        schedule(strength, 2, self.now)
+        self.assertEqual((strength.box, strength.due_at), (1, self.now + timedelta(days=1)))
+
+    def test_leitner_due_takes_lowest_box_first(self):
+        first, second, third = self.strengths
+        for strength, box, days in [(first, 3, -5), (second, 1, -1), (third, 2, 2)]:
+            strength.learned, strength.box = True, box
+            strength.due_at = self.now + timedelta(days=days)
+            strength.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(leitner_due(self.user, 1, self.now), [second.id])
+        # Every box is looked at, then the next phrase due tops up the list
+        self.assertEqual(leitner_due(self.user, 5, self.now), [second.id, first.id, third.id])
+        self.assertEqual(box_counts(self.user), [(1, 1), (2, 1), (3, 1), (4, 0), (5, 0)])
+
+    def test_boxes_move_with_sm2(self):
+        strength = self.strengths[0]
+        schedule(strength, 5, self.now)
+        schedule(strength, 5, self.now)
+        self.assertEqual((strength.box, strength.interval), (3, 6))
+
+class DecayTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="foo", password="dj39&*d2", email="foo@cb-bc.gc.ca")
+        module = Module.objects.create(name="Greetings")
+        self.now = timezone.now()
+        cases = [(90, 3), (90, 100), (26, 0.5), (20, 40), (50, None)]
+        for n, (strength, days) in enumerate(cases):
+            phrase = Phrase.objects.create(language="French", phrase=f"Phrase {n}", module=module)
+            UserPhraseStrength.objects.create(
+                user=self.user, phrase=phrase, learned=True, strength=strength,
+                strength_updated_at=None if days is None else self.now - timedelta(days=days)
+            )
+
+    def test_decayed_strength(self):
+        self.assertEqual(decayed_strength(90, self.now - timedelta(days=3, hours=23), self.now), 87)
+        self.assertEqual(decayed_strength(30, self.now - timedelta(days=40), self.now), 25)
+        self.assertEqual(decayed_strength(25, self.now - timedelta(days=40), self.now), 25)
+        self.assertEqual(decayed_strength(90, self.now + timedelta(days=1), self.now), 90)
+
+    def test_expression_matches_python(self):
+        rows = UserPhraseStrength.objects.annotate(
+            current=decayed_strength_expression(self.now)
+        ).order_by('id')
+        self.assertEqual(
+            [row.current for row in rows], [row.current_strength(self.now) for row in rows]
+        )
+        self.assertEqual([row.current for row in rows], [87, 25, 26, 20, 50])
+
+    def test_decay_strengths_command_is_idempotent(self):
+        today = timezone.localdate()
+        midnight = timezone.make_aware(datetime.combine(today, time.min))
+        expected = [row.current_strength(midnight) for row in UserPhraseStrength.objects.order_by('id')]
+        out = StringIO()
+        call_command('decay_strengths', batch_size=2, stdout=out)
+        self.assertIn("Decayed 2 of 4 rows", out.getvalue())
+        rows = UserPhraseStrength.objects.order_by('id')
+        self.assertEqual([row.strength for row in rows], expected)
+        # Stored and lazy strength agree after the job
+        self.assertEqual(
+            [row.current_strength(self.now) for row in rows], [87, 25, 26, 20, 50]
+        )
+
+        call_command('decay_strengths', stdout=out)
+        self.assertIn("Decayed 0 of 3 rows", out.getvalue())
+        self.assertEqual([row.strength for row in UserPhraseStrength.objects.order_by('id')], expected)
+
+    def test_decay_strengths_resumes_after_id(self):
+        first = UserPhraseStrength.objects.order_by('id').first()
+        call_command('decay_strengths', after_id=first.id, stdout=StringIO())
+        self.assertEqual(UserPhraseStrength.objects.get(id=first.id).strength, 90)
+
+    def test_login_does_not_rewrite_strength(self):
+        before = list(UserPhraseStrength.objects.values_list('strength', 'updated_at'))
+        response = self.client.post(
+            reverse('accounts:login'), {'username': "foo", 'password': "dj39&*d2"}
+        )
+        self.assertRedirects(response, reverse('tommy:home'), fetch_redirect_response=False)
+        self.assertEqual(list(UserPhraseStrength.objects.values_list('strength', 'updated_at')), before)
+
+
+class LoginRefreshTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="foo", password="dj39&*d2", email="foo@cb-bc.gc.ca")
+        phrase = Phrase.objects.create(language="French", phrase="Salut")
+        self.strength = UserPhraseStrength.objects.create(user=self.user, phrase=phrase, learned=True)
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_refresh_deferred_once_per_day(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.login(username="foo", password="dj39&*d2")
+            self.client.logout()
+            self.client.login(username="foo", password="dj39&*d2")
+        self.assertEqual(len(callbacks), 1)
+        # Nothing ran during the login itself
+        self.strength.refresh_from_db()
+        self.assertIsNone(self.strength.due_at)
+
+    def test_daily_guard(self):
+        today = timezone.localdate()
+        self.assertTrue(claim_daily_refresh(self.user.pk, today))
+        self.assertFalse(claim_daily_refresh(self.user.pk, today))
+        self.assertTrue(claim_daily_refresh(self.user.pk, today + timedelta(days=1)))
+
+    def test_refresh_schedules_unscheduled_phrases(self):
+        self.assertEqual(schedule_unscheduled(self.user.pk), 1)
+        self.assertEqual(schedule_unscheduled(self.user.pk), 0)
+        self.strength.refresh_from_db()
+        self.assertIsNotNone(self.strength.due_at)
+
+    def test_schedule_learned_command_backfills_every_user(self):
+        other = User.objects.create_user(username="bar", password="dj39&*d2", email="bar@cb-bc.gc.ca")
+        phrase = Phrase.objects.create(language="French", phrase="Bonjour")
+        UserPhraseStrength.objects.create(user=other, phrase=phrase, learned=True)
+        UserPhraseStrength.objects.create(user=other, phrase=Phrase.objects.get(phrase="Salut"))
+        out = StringIO()
+        call_command('schedule_learned', batch_size=1, stdout=out)
+        self.assertIn("Scheduled 2 learned phrases", out.getvalue())
+        self.assertEqual(due_phrases(self.user).count(), 1)
+        self.assertEqual(box_counts(other)[0][1], 1)
+        call_command('schedule_learned', stdout=out)
+        self.assertIn("Scheduled 0 learned phrases", out.getvalue())
+
+
+class SamplingTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="foo", password="dj39&*d2", email="foo@cb-bc.gc.ca")
+        module = Module.objects.create(name="Greetings")
+        for n in range(6):
+            phrase = Phrase.objects.create(language="French", phrase=f"Phrase {n}", module=module)
+            UserPhraseStrength.objects.create(user=self.user, phrase=phrase, learned=n < 4)
+        self.learned = UserPhraseStrength.objects.filter(user=self.user, learned=True)
+        self.ids = list(self.learned.order_by('id').values_list('id', flat=True))
+
+    def test_sample_reads_one_row(self):
+        with self.assertNumQueries(2):
+            row = sample(self.learned, randrange=lambda count: count - 1)
+        self.assertEqual(row.id, self.ids[-1])
+        self.assertIsNone(sample(self.learned.filter(strength__gt=100)))
+
+    def test_sample_skips_recent_rows(self):
+        for _ in range(20):
+            self.assertEqual(sample(self.learned, self.ids[1:]).id, self.ids[0])
+        # Everything was seen recently, so any row will do
+        self.assertIn(sample(self.learned, self.ids).id, self.ids)
+
+    def test_sample_ids_draws_different_rows(self):
+        with self.assertNumQueries(1):
+            ids = sample_ids(self.learned, 3, self.ids[:1])
+        self.assertEqual(len(set(ids)), 3)
+        self.assertNotIn(self.ids[0], ids)
+        # Recent rows fill the deck once the others run out
+        self.assertCountEqual(sample_ids(self.learned, 10, self.ids[:1]), self.ids)
+
+    def test_remember_keeps_latest_ids(self):
+        session = {}
+        for row_id in [1, 2, 3, 2, 4, 5, 6, 7]:
+            remember(session, row_id)
+        self.assertEqual(session['recent_phrase_strength_ids'], [2, 4, 5, 6, 7])
+
+
+class PracticeQueueTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="foo", password="dj39&*d2", email="foo@cb-bc.gc.ca")
+        module = Module.objects.create(name="Greetings")
+        self.rows = [
+            UserPhraseStrength.objects.create(
+                user=self.user, learned=n < 4, strength=strength,
+                phrase=Phrase.objects.create(language="French", phrase=f"Phrase {n}", module=module),
+            )
+            for n, strength in enumerate([40, 20, 20, 60, 0])
+        ]
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_weakest_first(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(weakest(self.user.pk, 3), [self.rows[1].id, self.rows[2].id, self.rows[0].id])
+        # The queue is cached and unchanged by reading it
+        with self.assertNumQueries(0):
+            ids = weakest(self.user.pk, 10)
+        self.assertEqual(ids, [row.id for row in [self.rows[1], self.rows[2], self.rows[0], self.rows[3]]])
+
+    def test_grade_updates_queue(self):
+        weakest(self.user.pk, 1)
+        graded = self.rows[1]
+        graded.strength = 30
+        graded.save()
+        # The answered phrase waits behind the others close to its strength
+        self.assertEqual(weakest(self.user.pk, 2), [self.rows[2].id, self.rows[0].id])
+        self.assertEqual(load_queue(self.user.pk)['priorities'][graded.id], 30 + RECENCY_PENALTY)
+
+        # Newly learned phrases join the queue, and stale entries are dropped in time
+        self.rows[4].learned = True
+        self.rows[4].save()
+        for _ in range(10):
+            graded.save()
+        queue = load_queue(self.user.pk)
+        self.assertLessEqual(len(queue['heap']), 2 * len(queue['priorities']))
+        self.assertEqual(weakest(self.user.pk, 1), [self.rows[4].id])
+
+
+class DifficultyTestCase(TestCase):
+
+    def setUp(self):
+        self.module = Module.objects.create(name="Greetings")
+        self.phrases = [
+            Phrase.objects.create(language="French", phrase=text, module=self.module)
+            for text in ["Bonjour", "Ça va", "Enchanté"]
+        ]
+        self.users = []
+        for name, skill in [("foo", 2), ("bar", 0)]:
+            user = User.objects.create_user(username=name, password="dj39&*d2")
+            Profile.objects.create(user=user, name=name)
+            self.users.append(user)
+            # Later phrases are answered right less often, and foo does better than bar
+            for phrase, correct in zip(self.phrases, [9, 5, 1]):
+                UserPhraseStrength.objects.create(
+                    user=user, phrase=phrase, learned=True, views=10, correct=min(10, correct + skill)
+                )
+
+    def test_fit_difficulty(self):
+        out = StringIO()
+        call_command('fit_difficulty', '--batch-size', '2', stdout=out)
+        self.assertIn("Fitted 3 phrases and 2 users from 6 rows", out.getvalue())
+        easy, medium, hard = [Phrase.objects.get(id=phrase.id).difficulty for phrase in self.phrases]
+        self.assertLess(easy, medium)
+        self.assertLess(medium, hard)
+        foo, bar = [Profile.objects.get(user=user).ability for user in self.users]
+        self.assertGreater(foo, bar)
+        # The fit predicts the answers it was fitted on
+        self.assertGreater(success_probability(bar, easy), 0.6)
+        self.assertLess(success_probability(bar, hard), 0.4)
+
+    def test_fit_ignores_rows_added_during_the_fit(self):
+        test = self
+
+        class Command(fit_difficulty.Command):
+            def chunks(self, batch_size):
+                # A user and a phrase created after the fit read its ids, with a row between them
+                if not User.objects.filter(username="baz").exists():
+                    user = User.objects.create_user(username="baz", password="dj39&*d2")
+                    phrase = Phrase.objects.create(language="French", phrase="Salut", module=test.module)
+                    UserPhraseStrength.objects.create(user=user, phrase=phrase, views=10, correct=10)
+                    UserPhraseStrength.objects.create(user=user, phrase=test.phrases[0], views=10, correct=0)
+                    UserPhraseStrength.objects.create(user=test.users[0], phrase=phrase, views=10, correct=0)
+                return super().chunks(batch_size)
+
+        out = StringIO()
+        call_command(Command(), '--batch-size', '2', stdout=out)
+        self.assertIn("Fitted 3 phrases and 2 users from 6 rows", out.getvalue())
+        self.assertEqual(Phrase.objects.get(phrase="Salut").difficulty, 0)
+        easy, medium, hard = [Phrase.objects.get(id=phrase.id).difficulty for phrase in self.phrases]
+        self.assertLess(easy, medium)
+        self.assertLess(medium, hard)
+
+    def test_closest_difficulty(self):
+        for phrase, difficulty in zip(self.phrases, [-1.5, 0, 1.5]):
+            Phrase.objects.filter(id=phrase.id).update(difficulty=difficulty)
+        self.assertAlmostEqual(success_probability(1, target_difficulty(1)), 0.8)
+        strengths = UserPhraseStrength.objects.filter(user=self.users[0], phrase__module=self.module)
+        for difficulty, phrase in [(-3, 0), (-0.5, 1), (-1, 0), (2, 2)]:
+            self.assertEqual(closest_difficulty(strengths, difficulty).phrase, self.phrases[phrase])
+        self.assertIsNone(closest_difficulty(strengths.none(), 0))
+
+
+class ExerciseViewTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="foo", password="dj39&*d2", email="foo@cb-bc.gc.ca")
+        Profile.objects.create(user=self.user, name="Foo")
+        self.module = Module.objects.create(name="Greetings")
+        self.phrase = Phrase.objects.create(language="French", phrase="Très bien", module=self.module)
+        Translation.objects.create(language="English", translation="Very good", phrase=self.phrase)
+        Translation.objects.create(language="English", translation="Very well", phrase=self.phrase)
+        self.strength = UserPhraseStrength.objects.create(user=self.user, phrase=self.phrase)
+        self.client.login(username="foo", password="dj39&*d2")
+
+    def tearDown(self):
+        # Row ids are reused between tests so cached grades and queues must not carry over
+        grading_cache.clear()
+        cache.clear()
+
+    def learn_phrase(self, answer="Very good"):
+        self.client.get(reverse('tommy:learn', args=[self.module.id]))
+        return self.client.post(reverse('tommy:learn', args=[self.module.id]), {'answer': answer})
+
+    def test_learn_correct_answer(self):
+        response = self.learn_phrase("very well!")
+        self.assertRedirects(response, reverse('tommy:feedback'))
+        self.strength.refresh_from_db()
+        self.assertTrue(self.strength.learned)
+        self.assertEqual(self.strength.correct, 1)
+        self.assertTrue(self.client.session['response_accuracy'])
+        self.assertContains(
+            self.client.get(reverse('tommy:feedback')), '<span class="text-success">very well!</span>'
+        )
+        data = self.client.get(reverse('tommy:feedback_data')).json()
+        self.assertEqual(data['spans'], [{'text': "very well!", 'correct': True}])
+
+    def test_learn_wrong_answer(self):
+        self.learn_phrase("Not at all")
+        self.strength.refresh_from_db()
+        self.assertTrue(self.strength.learned)
+        self.assertEqual(self.strength.correct, 0)
+        self.assertFalse(self.client.session['response_accuracy'])
+
+    def test_modules_open_and_closed(self):
+        response = self.client.get(reverse('tommy:modules'))
+        self.assertEqual(response.context['open_modules'], [self.module])
+        self.assertEqual(response.context['modules'][0].phrase_count, 1)
+        self.learn_phrase()
+        response = self.client.get(reverse('tommy:modules'))
+        self.assertEqual(response.context['closed_modules'], [self.module])
+        self.assertEqual(response.context['progress'], 100)
+
+        # The page reads the same number of rows whatever the size of the catalog
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(reverse('tommy:modules'))
+        other = User.objects.create_user(username="bar")
+        for m in range(3):
+            module = Module.objects.create(name=f"Module {m}")
+            for p in range(3):
+                phrase = Phrase.objects.create(language="French", phrase=f"Phrase {m} {p}", module=module)
+                for user in [self.user, other]:
+                    UserPhraseStrength.objects.create(user=user, phrase=phrase)
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(reverse('tommy:modules'))
+        self.assertEqual(len(after), len(before))
+        self.assertEqual(len(response.context['open_modules']), 3)
+        self.assertEqual(response.context['unlearned_phrase_count'], 9)
+
+    def test_modules_without_phrases(self):
+        User.objects.create_user(username="bar", password="dj39&*d2")
+        Profile.objects.create(user=User.objects.get(username="bar"), name="Bar")
+        self.client.login(username="bar", password="dj39&*d2")
+        response = self.client.get(reverse('tommy:modules'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['progress'], 0)
+
+    def test_practice_and_review(self):
+        self.learn_phrase()
+        for view in ['tommy:practice', 'tommy:review']:
+            self.assertEqual(self.client.get(reverse(view)).status_code, 200)
+            response = self.client.post(reverse(view), {'answer': "Very goood"})
+            self.assertRedirects(response, reverse('tommy:feedback'))
+            self.assertTrue(self.client.session['response_accuracy'])
+        self.strength.refresh_from_db()
+        self.assertEqual(self.strength.views, 3)
+        # Each answer moved the next review further out
+        self.assertEqual((self.strength.repetitions, self.strength.interval), (3, 15.6))
+        self.assertGreater(self.strength.due_at, timezone.now() + timedelta(days=15))
+
+    def test_exercise_deck(self):
+        other = Phrase.objects.create(language="French", phrase="Bonjour", module=self.module)
+        Translation.objects.create(language="English", translation="Hello", phrase=other)
+        other_strength = UserPhraseStrength.objects.create(
+            user=self.user, phrase=other, learned=True, strength=50
+        )
+        UserPhraseStrength.objects.filter(id=self.strength.id).update(learned=True, strength=10)
+        learned = UserPhraseStrength.objects.filter(user=self.user, learned=True).order_by('strength')
+
+        # Phrases and translations of the deck are read together
+        with self.assertNumQueries(1):
+            cards = build_deck(learned, 12)
+        self.assertEqual([card.strength_id for card in cards], [self.strength.id, other_strength.id])
+        self.assertEqual(len(cards[0].translations), 2)
+        self.assertEqual(build_deck(learned, 1), cards[:1])
+
+        # Each question comes from the deck dealt at the start, which repeats when it runs out
+        shown = []
+        for answer in ["Very good", "Hello", "Very well"]:
+            shown.append(self.client.get(reverse('tommy:practice')).context['phrase'].phrase)
+            self.client.post(reverse('tommy:practice'), {'answer': answer})
+            self.assertTrue(self.client.session['response_accuracy'])
+        self.assertEqual(shown, ["Très bien", "Bonjour", "Très bien"])
+        other_strength.refresh_from_db()
+        self.assertEqual((other_strength.views, other_strength.correct), (1, 1))
+
+    def test_answer_without_a_card_of_the_exercise(self):
+        self.learn_phrase()
+        # Nothing drawn yet
+        response = self.client.post(reverse('tommy:practice'), {'answer': "Very good"})
+        self.assertRedirects(response, reverse('tommy:practice'))
+        # Another exercise dealt its deck since this one was drawn, as in a second tab
+        self.client.get(reverse('tommy:practice'))
+        self.client.get(reverse('tommy:accent'))
+        response = self.client.post(reverse('tommy:practice'), {'answer': "Very good"})
+        self.assertRedirects(response, reverse('tommy:practice'))
+        self.strength.refresh_from_db()
+        self.assertEqual(self.strength.views, 1)
+
+    def test_accent_deck_dealt_in_two_queries(self):
+        for n in range(20):
+            phrase = Phrase.objects.create(language="French", phrase=f"Phrase {n}", module=self.module)
+            Translation.objects.create(language="English", translation=f"Translation {n}", phrase=phrase)
+            UserPhraseStrength.objects.create(user=self.user, phrase=phrase, learned=True)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('tommy:accent'))
+        # One query for the ids and one for the cards, whatever the number of learned phrases
+        strength_queries = [query for query in context if 'tommy_userphrasestrength' in query['sql']]
+        self.assertEqual(len(strength_queries), 2)
+        self.assertEqual(len(self.client.session['deck']['cards']), 12)
+
+    def test_accent_requires_exact_answer(self):
+        Translation.objects.create(language="English", translation="Très bien", phrase=self.phrase)
+        self.learn_phrase()
+        self.client.get(reverse('tommy:accent'))
+        self.client.post(reverse('tommy:accent'), {'answer': "Tres bien"})
+        self.assertFalse(self.client.session['response_accuracy'])
+        self.client.get(reverse('tommy:accent'))
+        self.client.post(reverse('tommy:accent'), {'answer': "Very good."})
+        self.assertTrue(self.client.session['response_accuracy'])
+
+    def test_choice_with_distractors(self):
+        other = Phrase.objects.create(language="French", phrase="Très bon", module=self.module)
+        Translation.objects.create(language="English", translation="Very nice", phrase=other)
+        self.learn_phrase()
+        build_distractors()
+        response = self.client.get(reverse('tommy:choice'))
+        self.assertContains(response, "Very nice")
+        options = dict(self.client.session['choice_options'])
+        self.assertEqual(len(options), 2)
+        wrong = next(id for id, text in options.items() if text == "Very nice")
+        self.client.post(reverse('tommy:choice'), {'answer': wrong})
+        self.assertFalse(self.client.session['response_accuracy'])
+        self.assertEqual(self.client.session['feedback_spans'], [["Very nice", False]])
+
+        self.client.get(reverse('tommy:choice'))
+        self.client.post(reverse('tommy:choice'), {'answer': self.client.session['choice_answer_id']})
+        self.assertTrue(self.client.session['response_accuracy'])
+        self.strength.refresh_from_db()
+        self.assertEqual((self.strength.views, self.strength.correct), (3, 2))
+
+    def test_choice_skips_phrases_without_distractors(self):
+        other = Phrase.objects.create(language="French", phrase="Très bon", module=self.module)
+        Translation.objects.create(language="English", translation="Very nice", phrase=other)
+        self.learn_phrase()
+        # Before any rebuild there is nothing to ask
+        self.assertRedirects(self.client.get(reverse('tommy:choice')), reverse('tommy:modules'))
+
+        # Phrases added since the last rebuild aren't asked, their only option would be right
+        UserPhraseStrength.objects.create(user=self.user, phrase=other, learned=True)
+        build_distractors(Phrase.objects.filter(id=self.phrase.id))
+        for _ in range(3):
+            response = self.client.get(reverse('tommy:choice'))
+            self.assertEqual(response.context['phrase'], self.phrase)
+            self.assertEqual(len(self.client.session['choice_options']), 2)
+
+
+class GlossaryTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="foo", password="dj39&*d2", email="foo@cb-bc.gc.ca")
+        Profile.objects.create(user=self.user, name="Foo")
+        self.module = Module.objects.create(name="Greetings")
+        self.client.login(username="foo", password="dj39&*d2")
+
+    def tearDown(self):
+        cache.clear()
+
+    def add_phrases(self, count, start=0):
+        for n in range(start, start + count):
+            phrase = Phrase.objects.create(language="French", phrase=f"Phrase {n:03}", module=self.module)
+            Translation.objects.create(language="English", translation=f"Translation {n:03}", phrase=phrase)
+            UserPhraseStrength.objects.create(
+                user=self.user, phrase=phrase, learned=n % 2 == 0, strength=60, views=1, correct=1,
+                strength_updated_at=timezone.now(),
+            )
+
+    def test_pages(self):
+        self.add_phrases(60)
+        response = self.client.get(reverse('tommy:glossary'))
+        data = response.context['phrase_data']
+        self.assertEqual(len(data), 50)
+        self.assertEqual((data[0]['phrase'], data[0]['translations']), ("Phrase 000", ["Translation 000"]))
+        self.assertEqual(response.context['progress'], 50)
+        self.assertEqual(response.context['strength_data']['average'], 60)
+
+        response = self.client.get(reverse('tommy:glossary'), {'after': response.context['next_after']})
+        self.assertEqual([item['phrase'] for item in response.context['phrase_data']][:2], ["Phrase 050", "Phrase 051"])
+        self.assertEqual(len(response.context['phrase_data']), 10)
+        self.assertIsNone(response.context['next_after'])
+
+    def test_queries_dont_grow_with_catalog(self):
+        self.add_phrases(5)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('tommy:glossary'))
+        self.add_phrases(100, start=5)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(reverse('tommy:glossary'))
+        self.assertEqual(len(large), len(small))
+
+    def test_catalog_shared_between_users(self):
+        self.add_phrases(3)
+        self.client.get(reverse('tommy:glossary'))
+        other = User.objects.create_user(username="bar", password="dj39&*d2")
+        Profile.objects.create(user=other, name="Bar")
+        UserPhraseStrength.objects.create(
+            user=other, phrase=Phrase.objects.get(phrase="Phrase 001"), learned=True, strength=95,
+            strength_updated_at=timezone.now(),
+        )
+        self.client.login(username="bar", password="dj39&*d2")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('tommy:glossary'))
+        # Only the user's own rows are read, the catalog page comes from the cache
+        self.assertFalse([query for query in context if 'tommy_translation' in query['sql']])
+        self.assertEqual([item['strength_label'] for item in response.context['phrase_data']],
+            [None, "Excellent", None])
+        self.assertContains(response, "Translation 001")
+
+        # Editing the catalog retires the cached pages
+        Translation.objects.filter(translation="Translation 001").get().delete()
+        self.assertNotContains(self.client.get(reverse('tommy:glossary')), "Translation 001")
+
+    def test_page_keys_ignore_invalid_after(self):
+        self.add_phrases(3)
+        for after in ["", "x" * 300, "1 2"]:
+            self.client.get(reverse('tommy:glossary'), {'after': after})
+        version = catalog_version()
+        self.assertEqual(parse_after("12"), 12)
+        self.assertEqual(
+            [key for key in cache._cache if f"glossary:{version}:" in key],
+            [cache.make_key(glossary_page_key(version, "", None))]
+        )
+
+    def test_search(self):
+        self.add_phrases(3)
+        phrase = Phrase.objects.create(language="French", phrase="Ça va", module=self.module)
+        Translation.objects.create(language="English", translation="How's it going?", phrase=phrase)
+        for search, expected in [("ca va", ["Ça va"]), ("HOW'S", ["Ça va"]), ("001", ["Phrase 001"])]:
+            response = self.client.get(reverse('tommy:glossary'), {'search': search})
+            self.assertEqual([item['phrase'] for item in response.context['phrase_data']], expected)
+        self.assertContains(self.client.get(reverse('tommy:glossary'), {'search': "nothing"}),
+            'Your search found no phrases for "nothing"')
+
+
+class SearchTestCase(TestCase):
+
+    def setUp(self):
+        module = Module.objects.create(name="Greetings")
+        self.phrases = {}
+        for text, translations in [
+            ("Ça va", ["How's it going?"]),
+            ("Ça va bien", ["Doing well"]),
+            ("Bien sûr", ["Of course", "Sure"]),
+            ("Hello", ["Bonjour"]),
+        ]:
+            language = "English" if text == "Hello" else "French"
+            phrase = Phrase.objects.create(language=language, phrase=text, module=module)
+            for translation in translations:
+                Translation.objects.create(language="English", translation=translation, phrase=phrase)
+            self.phrases[text] = phrase.id
+
+    def test_match_expression(self):
+        self.assertEqual(match_expression("Ça  VA!"), '"ca"* "va"*')
+        self.assertIsNone(match_expression("?!"))
+
+    def test_ranked_prefix_search(self):
+        # Closer matches rank first, English phrases are left out
+        self.assertEqual(search_phrases("ca va"), [self.phrases["Ça va"], self.phrases["Ça va bien"]])
+        self.assertCountEqual(search_phrases("bie"), [self.phrases["Bien sûr"], self.phrases["Ça va bien"]])
+        self.assertEqual(search_phrases("SURE"), [self.phrases["Bien sûr"]])
+        self.assertEqual(search_phrases("bonjour"), [])
+        self.assertEqual(search_phrases("hello", language="English"), [self.phrases["Hello"]])
+
+    def test_index_follows_catalog(self):
+        phrase = Phrase.objects.get(id=self.phrases["Bien sûr"])
+        phrase.phrase = "Évidemment"
+        phrase.save()
+        self.assertEqual(search_phrases("evid"), [phrase.id])
+        Translation.objects.create(language="English", translation="Obviously", phrase=phrase)
+        self.assertEqual(search_phrases("obvious"), [phrase.id])
+        Translation.objects.filter(translation="Sure").get().delete()
+        self.assertEqual(search_phrases("sure"), [])
+        phrase.delete()
+        self.assertEqual(search_phrases("evid"), [])
+
+    def test_search_reads_matches_only(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"EXPLAIN QUERY PLAN SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH 'ca*'"
+            )
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("VIRTUAL TABLE INDEX", plan)
+
+    def test_build_search_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        self.assertEqual(search_phrases("ca"), [])
+        out = StringIO()
+        call_command('build_search_index', stdout=out)
+        self.assertIn("Indexed 4 phrases.", out.getvalue())
+        self.assertEqual(len(search_phrases("ca")), 2)
+
+
+class TypeaheadTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="foo", password="dj39&*d2", email="foo@cb-bc.gc.ca")
+        module = Module.objects.create(name="Greetings")
+        self.phrase = Phrase.objects.create(language="French", phrase="Ça va bien", module=module)
+        Translation.objects.create(language="English", translation="I'm doing well", phrase=self.phrase)
+        Phrase.objects.create(language="English", phrase="Call me", module=module)
+
+    def tearDown(self):
+        # A version restarted from the clock can repeat within a second, drop the old index
+        cache.clear()
+        typeahead_cache['version'] = None
+
+    def test_complete(self):
+        index = TypeaheadIndex([
+            ("ca va", "Ça va", 1), ("ca va bien", "Ça va bien", 2), ("cafe", "Café", 3),
+            ("ca va", "Ça va!", 4), ("bien sur", "Bien sûr", 5),
+        ])
+        self.assertEqual([s.text for s in index.complete("ca")], ["Ça va", "Ça va!", "Ça va bien", "Café"])
+        self.assertEqual([s.text for s in index.complete("ca", limit=2)], ["Ça va", "Ça va!"])
+        # Words inside a text match too, each text is suggested once
+        self.assertEqual(index.complete("bien"), [("Ça va bien", 2), ("Bien sûr", 5)])
+        self.assertEqual(index.complete("x"), [])
+        self.assertEqual(index.complete(""), [])
+        self.assertEqual(index.complete("ca", limit=0), [])
+        self.assertEqual(index.complete("ca", limit=-1), [])
+        self.assertEqual(len(TypeaheadIndex([])), 0)
+
+    def test_endpoint(self):
+        self.client.login(username="foo", password="dj39&*d2")
+        url = reverse('tommy:typeahead')
+        data = self.client.get(url, {'q': "ÇA V"}).json()
+        self.assertEqual(data['results'], [{'text': "Ça va bien", 'phrase_id': self.phrase.id}])
+        data = self.client.get(url, {'q': "do"}).json()
+        self.assertEqual(data['results'], [{'text': "I'm doing well", 'phrase_id': self.phrase.id}])
+        # Only the glossary's French phrases are suggested
+        self.assertEqual(self.client.get(url, {'q': "call"}).json()['results'], [])
+
+        # Lookups read nothing from the database until the catalog changes
+        with self.assertNumQueries(0):
+            typeahead_index().complete("ca")
+        Translation.objects.create(language="English", translation="All good", phrase=self.phrase)
+        self.assertEqual(len(self.client.get(url, {'q': "good", 'limit': "x"}).json()['results']), 1)
+
+    def test_endpoint_limit_is_clamped(self):
+        self.client.login(username="foo", password="dj39&*d2")
+        module = Module.objects.get(name="Greetings")
+        for n in range(TYPEAHEAD_MAX_LIMIT + 5):
+            Phrase.objects.create(language="French", phrase=f"Bonjour {n}", module=module)
+        url = reverse('tommy:typeahead')
+        for limit, expected in [("0", 1), ("-1", 1), ("3", 3), ("1000", TYPEAHEAD_MAX_LIMIT)]:
+            results = self.client.get(url, {'q': "bonjour", 'limit': limit}).json()['results']
+            self.assertEqual(len(results), expected, limit)
+
+
+class DistractorTestCase(TestCase):
+
+    def setUp(self):
+        greetings = Module.objects.create(name="Greetings")
+        food = Module.objects.create(name="Food")
+        self.bien = Phrase.objects.create(language="French", phrase="Très bien", module=greetings)
+        phrases = [
+            ("Très bon", "Very nice", greetings), ("Bonjour", "Hello", greetings),
+            ("Du pain", "Very fine", food), ("Je voudrais un verre d'eau", "I would like a glass of water", food),
+            ("Bien", "Very good", food), ("Trop", "Très", food),
+        ]
+        Translation.objects.create(language="English", translation="Very good", phrase=self.bien)
+        for phrase, translation, module in phrases:
+            phrase = Phrase.objects.create(language="French", phrase=phrase, module=module)
+            language = "French" if translation == "Très" else "English"
+            Translation.objects.create(language=language, translation=translation, phrase=phrase)
+
+    def test_distractors_ranked_by_similarity(self):
+        build_distractors()
+        distractors = [d.translation.translation for d in self.bien.distractors.all()]
+        # Same text as the answer, other languages and much longer translations are left out
+        self.assertEqual(distractors, ["Very nice", "Very fine", "Hello"])
+        self.assertEqual(list(self.bien.distractors.values_list('rank', flat=True)), [0, 1, 2])
+
+    def test_rebuild_replaces_distractors(self):
+        build_distractors(Phrase.objects.filter(id=self.bien.id))
+        Translation.objects.filter(translation="Very nice").delete()
+        build_distractors(Phrase.objects.filter(id=self.bien.id))
+        self.assertEqual(
+            [d.translation.translation for d in Distractor.objects.filter(phrase=self.bien)],
+            ["Very fine", "Hello"]
+        )
+
+    def test_rebuild_only_the_changed_modules(self):
+        self.assertEqual(rebuild_module_distractors([self.bien.module_id]), 8)
+        self.assertEqual(
+            set(Distractor.objects.values_list('phrase__module__name', flat=True)), {"Greetings"}
+        )
+
+    def test_rebuild_later_waits_for_the_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            rebuild_module_distractors_later([self.bien.module_id])
+            rebuild_module_distractors_later([])
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(Distractor.objects.exists())
+
+    def test_choice_served_with_one_query(self):
+        build_distractors()
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(self.bien.distractors.select_related('translation')[:3])), 3)
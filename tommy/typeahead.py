@@ -0,0 +1,77 @@
+from bisect import bisect_left
+from collections import namedtuple
+
+from .catalog import catalog_version
+from .models import Phrase, Translation
+
+
+# Suggestions returned by default and at most
+TYPEAHEAD_LIMIT, TYPEAHEAD_MAX_LIMIT = 8, 20
+
+Suggestion = namedtuple('Suggestion', ['text', 'phrase_id'])
+
+
+class TypeaheadIndex:
+    """
+    Sorted array of the normalized forms of the glossary's phrases and translations, and
+    of every word onwards in them, so a prefix finds both whole texts and the words inside
+    them. A lookup is a binary search for the first key with the prefix, then a walk over
+    the keys that follow until enough distinct suggestions are found.
+    """
+
+    def __init__(self, texts):
+        entries = sorted(
+            (key, text, phrase_id)
+            for folded, text, phrase_id in texts
+            for key in self.word_keys(folded)
+        )
+        self.keys, self.texts, self.phrase_ids = (
+            [list(column) for column in zip(*entries)] if entries else ([], [], [])
+        )
+
+    @staticmethod
+    def word_keys(folded):
+        """Returns the keys of a normalized text, from each of its words to the end."""
+        words = folded.split()
+        return [" ".join(words[start:]) for start in range(len(words))]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def complete(self, prefix, limit=TYPEAHEAD_LIMIT):
+        """Returns up to limit Suggestions whose text has a word starting with the prefix."""
+        suggestions, seen = [], set()
+        if not prefix or limit < 1:
+            return suggestions
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and self.keys[position].startswith(prefix):
+            text = self.texts[position]
+            if text not in seen:
+                seen.add(text)
+                suggestions.append(Suggestion(text, self.phrase_ids[position]))
+                if len(suggestions) == limit:
+                    break
+            position += 1
+        return suggestions
+
+
+def build_typeahead_index():
+    """Returns a TypeaheadIndex of the French phrases of the glossary and their translations."""
+    phrases = Phrase.objects.filter(language=Phrase.FRENCH)
+    texts = list(phrases.values_list('normalized', 'phrase', 'id'))
+    texts += Translation.objects.filter(phrase__in=phrases).values_list(
+        'normalized', 'translation', 'phrase_id'
+    )
+    return TypeaheadIndex(texts)
+
+
+# The index of this process and the catalog version it was built from
+typeahead_cache = {'version': None, 'index': None}
+
+
+def typeahead_index():
+    """Returns the process's TypeaheadIndex, built again once the catalog has changed."""
+    version = catalog_version()
+    if typeahead_cache['version'] != version:
+        typeahead_cache['index'], typeahead_cache['version'] = build_typeahead_index(), version
+    return typeahead_cache['index']
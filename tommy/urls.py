@@ -9,12 +9,12 @@ urlpatterns = [
     # Profile creation and edit views
     path('create_profile', views.ProfileCreateView.as_view(), name='create_profile'),
 
-    # Recalculate user phrase strength after each login
-    path('reset/', views.ResetView.as_view(), name='reset'),
-
     # Dictionary view
     path('glossary', views.GlossaryView.as_view(), name='glossary'),
 
+    # Suggestions for the glossary search bar as JSON
+    path('typeahead.json', views.TypeaheadView.as_view(), name='typeahead'),
+
     # Modules view
     path('modules', views.ModulesView.as_view(), name='modules'),
 
@@ -30,6 +30,12 @@ urlpatterns = [
     # Practice correct accent translations
     path('accent', views.AccentView.as_view(), name='accent'),
 
+    # Pick the right translation among wrong answers
+    path('choice', views.ChoiceView.as_view(), name='choice'),
+
     # Feedback page for practice, review and accent practice views
     path('feedback', views.FeedbackView.as_view(), name='feedback'),
+
+    # Feedback on the last answer as JSON
+    path('feedback.json', views.FeedbackDataView.as_view(), name='feedback_data'),
 ]
@@ -1,249 +1,34 @@
-from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Avg, Count, Exists, FilteredRelation, OuterRef, Q
+from django.http import JsonResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
-from django.views.generic import TemplateView, UpdateView, View, CreateView, ListView
+from django.utils import timezone
+from django.views.generic import TemplateView, View, CreateView, ListView
+
+from random import choice, shuffle
+
+from .models import Distractor, Module, Phrase, Translation, Profile, UserPhraseStrength
+from .distractors import DISTRACTOR_COUNT
+from .forms import ChoiceForm, ProfileForm, TestForm
+from .grading import MatchIndex, Span, grading_cache, spans_to_json
+from .difficulty import closest_difficulty, target_difficulty
+from .catalog import glossary_page, strength_overlay
+from .decay import decayed_strength_expression
+from .decks import current_card, deal, deal_ids, draw, has_deck
+from .normalize import normalizer
+from .practice_queue import weakest
+from .sampling import recent_ids, remember, sample, sample_ids
+from .scheduling import answer_quality, box_counts, due_phrases, leitner_due, schedule
+from .typeahead import TYPEAHEAD_LIMIT, TYPEAHEAD_MAX_LIMIT, typeahead_index
 
-from datetime import datetime
-import html
-from random import choice
-from unidecode import unidecode
-import string
-
-from .models import Module, Phrase, Translation, Profile, UserPhraseStrength
-from .forms import ProfileForm, TestForm
 
 # Constants for setting user phrase view counts, evaluating accuracy and errors in testing views.
 INITIATE_COUNT, UNASSESSED_ACCURACY, UNASSESSED_SCORE, MAX_ERRORS = 1, False, -1, 100
 
-
-def eval_word(user_answer_word, correct_word):
-    """
-    Evaluates the test score for a word entered by the user in comparison to correct
-    answer. Supports eval_tranlation function to evaluate translation accuracy.
-    """
-    # Variables to help evaluate word score
-    correct_count, error_count = 0, 0
-    answer_length, actual_length = len(user_answer_word), len(correct_word)
-
-    # Case: user answer word is one char shorter than correct word
-    if answer_length == actual_length - 1:
-        words = []
-        for i in range(actual_length):
-            word = ""
-            for j in range(actual_length):
-                if i == j:
-                    continue
-                else:
-                    word += correct_word[j]
-            words.append(word)
-        if user_answer_word in words:
-            accuracy = ( ( actual_length - 1 ) / actual_length ) * 100
-            return accuracy, 1
-        
-    # Case: user answer word is one char longer than correct word
-    elif answer_length - 1 == actual_length:
-        words = []
-        for i in range(answer_length):
-            word = ""
-            for j in range(answer_length):
-                if i == j:
-                    continue
-                else:
-                    word += user_answer_word[j]
-            words.append(word)
-        if correct_word in words:
-            accuracy = ( ( actual_length - 1 ) / actual_length ) * 100
-            return accuracy, 1
-    
-    # Case: same length or more than one char longer or shorter
-    shorter_word_length = min(actual_length, answer_length)
-    for i in range(shorter_word_length):
-        if correct_word[i] == user_answer_word[i]:
-            correct_count += 1
-        else:
-            error_count += 1
-
-    # Calculate score based on length difference and accuracy
-    length_difference = abs(answer_length - actual_length)
-    error_count += length_difference
-    accuracy = ( correct_count / ( shorter_word_length + length_difference ) ) * 100
-    return accuracy, error_count
-
-
-def eval_tranlation(user_answer, correct_translation):
-    """
-    Evaluates the test score for a translation entered by the user
-    in comparison to correct translation.
-    """
-    # Set variables to help evaluate accuracty of translation
-    answer_str = user_answer.lower().translate(str.maketrans("", "", string.punctuation))
-    correct_str = correct_translation.lower().translate(str.maketrans("", "", string.punctuation))
-    answer_words, correct_words = answer_str.split(), correct_str.split()
-    answer_str, correct_str = answer_str.replace(" ", ""), correct_str.replace(" ", "")
-    actual_word_count, answer_word_count = len(correct_words), len(answer_words)
-    actual_str_len, answer_str_len = len(correct_str), len(answer_str)
-    error_count, total_score, FULL_SCORE, FAIL = 0, 0, 100, 0
-
-    # Case: Exact same string gets fullscore
-    if answer_str == correct_str:
-        return FULL_SCORE, error_count
-    
-    # One word translation is evaluated for spelling errors and superfluous words
-    elif actual_word_count == 1:
-        if answer_word_count == 1:
-            return eval_word(user_answer, correct_translation)
-        else:
-            factor = 1.7 / answer_word_count
-            for word in answer_words:
-                word_accuracy, word_errors = eval_word(word, correct_translation)
-                if word_accuracy == FULL_SCORE:
-                    error_count = word_errors + ( answer_str_len - ( actual_str_len - len(word) ) )
-                    return word_accuracy * factor, error_count
-            return FAIL, answer_str_len
-
-    # Multiple word translation evaluates accuracy of words separately
-    else:
-        # If the number of words is the same compare the words one by one
-        if answer_word_count == actual_word_count:
-            for i in range(actual_word_count):
-                if answer_words[i] == correct_words[i]:
-                    total_score += FULL_SCORE
-                else:
-                    word_score, word_errors = eval_word(answer_words[i], correct_words[i])
-                    total_score += word_score
-                    error_count += word_errors
-            return (total_score / actual_word_count), error_count
-        # Otherwise search for the words in the full string
-        else:
-            if correct_str in answer_str or answer_str in correct_str:
-                accuracy = ( ( actual_str_len - abs( actual_str_len - answer_str_len ) )
-                            / actual_str_len * FULL_SCORE )
-                accuracy = accuracy if accuracy > FAIL else FAIL
-                error_count += abs(actual_str_len - answer_str_len)
-                return accuracy, error_count
-            else:
-                factor = ( ( actual_word_count - abs( answer_word_count - actual_word_count ) )
-                          / actual_word_count )
-                correct_word_count = 0
-                # TODO - This error count is not ideal and can be improved
-                for word in correct_words:
-                    if word in answer_words:
-                        correct_word_count += 1
-                    else:
-                        error_count += int(len(word) / 2)
-                for word in answer_words:
-                    if word not in correct_words:
-                        error_count += int(len(word) / 2)
-                accuracy = (correct_word_count / actual_word_count) * factor * FULL_SCORE
-                return accuracy, error_count
-
-
-def feedback(user_answer, correct_translation, errors, score):
-    """
-    Generates HTML style tags to provide better feedback on translation accuracy.
-    Used for learn, practice and review exercise view classes.
-    """
-    error_limit = len(correct_translation) / 8
-
-    # Case: no errors
-    if not errors or score == 100:
-        return f'<span class="text-success">{user_answer}</span>'
-
-    # Case: too many errors
-    elif errors > error_limit or score < 70:
-        return f'<span class="text-danger">{user_answer}</span>'
-    
-    # Set variables that help identify errors to mark for feedback
-    else:
-        actual_str = correct_translation.lower().translate(str.maketrans("", "", string.punctuation))
-        answer_words, actual_words = user_answer.split(), unidecode(actual_str).split()
-        answer_word_count, actual_word_count = len(answer_words), len(actual_words)
-        user_answer_len = len(user_answer)
-        html = '<span class="text-success">'
-    
-        # Case: one error and user answer same length as correct answer
-        if errors == 1 and user_answer_len == len(correct_translation):
-            for i in range(user_answer_len):
-                if unidecode(user_answer[i].lower()) != unidecode(correct_translation[i].lower()):
-                    html += f'<span class="text-danger">{user_answer[i]}</span>'
-                else:
-                    html += user_answer[i]
-        else:
-            # Case: user answer is longer than correct answer
-            if answer_word_count >= actual_word_count:
-                for word in answer_words:
-                    check_word = unidecode(
-                        word.lower().translate(str.maketrans("", "", string.punctuation))
-                    )
-                    if check_word not in actual_words:
-                        html += f'<span class="text-danger">{word}</span> '
-                    else:
-                        html += f'{word} '
-                        actual_words.remove(check_word)
-            # Case user answer is short or equal in lengh to correct answer
-            else:
-                for i in range(answer_word_count):
-                    if actual_words[i] != unidecode(
-                        answer_words[i].translate(str.maketrans("", "", string.punctuation))
-                    ):
-                        html += f'<span class="text-danger">{answer_words[i]}</span> '
-                    else:
-                        html += f'{answer_words[i]} '
-        return html + '\b</span>'
-
-
-def accent_feedback(user_answer, correct_translation, errors, score):
-    """
-    Generates HTML style tags to provide better feedback on translation
-    accuracy. Used in the accent testing extreme difficulty excercise view.
-    """
-    # Set variables to help identify errors to mark for feedback
-    answer_str = user_answer.translate(str.maketrans("", "", string.punctuation))
-    actual_str = correct_translation.translate(str.maketrans("", "", string.punctuation))
-    error_limit = len(correct_translation) / 8
-
-    # Case: user answer is exact same as correct answer
-    if (not errors or score == 100) and answer_str == actual_str:
-        return f'<span class="text-success">{user_answer}</span>'
-    
-    # Case: too many errors
-    elif errors > error_limit or score < 70:
-        return f'<span class="text-danger">{user_answer}</span>'
-
-    # Remaining variables for checking errors to help generate feedback
-    else:
-        answer_words, actual_words = answer_str.split(), actual_str.split()
-        ans_feedback, html = user_answer.split(), '<span class="text-success">'
-        answer_words = [answer_words] if isinstance(answer_words, str) else answer_words
-        actual_words = [actual_words] if isinstance(actual_words, str) else actual_words
-        answer_word_count, actual_word_count = len(answer_words), len(actual_words)
-
-        # Case: one or no errors and user answer and correct answer are same length
-        if errors <= 1 and len(user_answer) == len(correct_translation):
-            for i in range(len(user_answer)):
-                if user_answer[i].lower() != correct_translation[i].lower():
-                    html += f'<span class="text-danger">{user_answer[i]}</span>'
-                else:
-                    html += user_answer[i]
-        else:
-            # Case: user answer is longer than correct answer
-            if answer_word_count >= actual_word_count:
-                index = 0
-                for word in answer_words:
-                    if word not in actual_words:
-                        html += f'<span class="text-danger">{ans_feedback[index]}</span> '
-                    else:
-                        html += f'{ans_feedback[index]} '
-                    index += 1
-            # Case user answer is short or equal in lengh to correct answer
-            else:
-                for i in range(answer_word_count):
-                    if actual_words[i] != answer_words[i]:
-                        html += f'<span class="text-danger">{ans_feedback[i]}</span> '
-                    else:
-                        html += f'{ans_feedback[i]} '
-        return html + '\b</span>'
+# Phrases tested in each exercise session
+PRACTICE_COUNT, REVIEW_COUNT, ACCENT_COUNT = 12, 15, 12
 
 
 class Home(LoginRequiredMixin, TemplateView):
@@ -274,7 +59,7 @@ class Home(LoginRequiredMixin, TemplateView):
                 del request.session['user_answer']
                 del request.session['response_accuracy']
                 del request.session['phrase_language']
-                del request.session['feedback_html']
+                del request.session['feedback_spans']
             except:
                 pass
         
@@ -293,56 +78,11 @@ class Home(LoginRequiredMixin, TemplateView):
             'unlearned_phrase_count': unlearned_phrase_count,
             'learned_phrase_count': learned_phrase_count,
             'progress': progress,
+            'box_counts': box_counts(request.user),
         }
         return render(request, self.template_name, context)
 
 
-class ResetView(LoginRequiredMixin, UpdateView):
-    """Resets the user's strength for all phrases after each login and redirects home."""
-    # Recalculates user phrase after each login based on time elapsed. Login redirects
-    # here. The form autosubmits, post updates all user scores then redirects home.
-    template_name = 'tommy/reset.html'
-
-    # Login redirects to get and hidden form in template redirects to post.
-    def get(self, request):
-        return render(request, self.template_name)
-
-    # Post view updates user phrase strenght objecs.
-    def post(self, request):
-        learned_phrases = UserPhraseStrength.objects.filter(learned=True, user=request.user)
-
-        # Recalculate phrase strength based on last time seen by user
-        for phrase in learned_phrases:
-            now = datetime.now()
-            day_of_last_reset = datetime(
-                day=phrase.updated_at.day,
-                month=phrase.updated_at.month,
-                year=phrase.updated_at.year,
-                hour=phrase.updated_at.hour,
-                minute=phrase.updated_at.minute
-            )
-            delta = now - day_of_last_reset
-            days_since_reset = delta.days
-            
-            # Function data for review in server log
-            # test_log = f"\nDays since reset for phrase \"{str(phrase.phrase)}\""
-            # test_log += f": {days_since_reset}\n  Now                : {now}"
-            # test_log += f"\n  Time of last reset : {day_of_last_reset}\n"
-            # test_log += f"    strength before recalc : {str(phrase.strength)}"
-            # print(test_log)
-
-            # Weaken strength if phrase wasn't tested for longer than a day
-            if days_since_reset > 0 and phrase.strength > 25:
-                phrase.strength -= days_since_reset
-                phrase.save()
-            
-            # Function data for review in server log - part 2
-            # print(f"    strength after recalc  : {str(phrase.strength)}")
-            
-        success_url = 'tommy:home'
-        return redirect(success_url)
-
-
 class ProfileCreateView(LoginRequiredMixin, CreateView):
     """
     Adds a profile name to greet the user
@@ -385,65 +125,48 @@ class ProfileCreateView(LoginRequiredMixin, CreateView):
 
 class GlossaryView(LoginRequiredMixin, ListView):
     """
-    Searches and list all phrases in the database along with their translations.
-    Displays summary of user progress
+    Searches and list all phrases in the database along with their translations, a page
+    at a time, from a cached catalog shared by all users. Displays summary of user progress
     """
     template_name = 'tommy/glossary.html'
 
     def get(self, request):
         profile = Profile.objects.get(user=request.user)
-        phrases = Phrase.objects.all().order_by('phrase')
-        phrase_count = phrases.count()
-        modules = Module.objects.all()
-        translations = Translation.objects.all()
-        phrase_strength_set = UserPhraseStrength.objects.filter(user=request.user)
-        if phrase_strength_set.count() > 0:
-            unlearned_phrase_count = phrase_strength_set.filter(learned=False).count()
-            learned_phrase_count = phrase_strength_set.filter(learned=True).count()
-        else:
-            unlearned_phrase_count, learned_phrase_count = 1, 0
-        progress = int((learned_phrase_count * 100) / (learned_phrase_count + unlearned_phrase_count))
+        now = timezone.now()
 
-        # Create list of dicts for faster data access and search response on web page load
-        phrase_data = []
-        strength_data = { 'learned': 0, 'total': 0 }
-        for phrase in phrases:
-            item = {}
-            item["phrase"] = phrase.phrase
-            item["id"] = phrase.id
-            item["language"] = phrase.language
-            item["module"] = phrase.module
-            module = modules.get(name=phrase.module)
-            item["module_id"] = module.id
-            item_translations = translations.filter(phrase=phrase)
-            item["translations"] = []
-            for item_translation in item_translations:
-                item["translations"].append(item_translation.translation)
-            user_strength = phrase_strength_set.get(phrase=phrase)
-            item["learned"] = user_strength.learned
-            item["strength"] = user_strength.strength
-            phrase_data.append(item)
-
-            # Calculate overall average user strength
-            if user_strength.learned:
-                strength_data['learned'] += 1
-                strength_data['total'] += user_strength.strength
-        if learned_phrase_count > 0:
-            strength_data['average'] = round(strength_data['total'] / strength_data['learned'])
+        # Progress and average strength of learned phrases, after decay, in one query
+        totals = UserPhraseStrength.objects.filter(user=request.user).aggregate(
+            learned_count=Count('id', filter=Q(learned=True)),
+            unlearned_count=Count('id', filter=Q(learned=False)),
+            average_strength=Avg(decayed_strength_expression(now), filter=Q(learned=True)),
+        )
+        learned_phrase_count = totals['learned_count']
+        unlearned_phrase_count = totals['unlearned_count']
+        if learned_phrase_count + unlearned_phrase_count > 0:
+            progress = int((learned_phrase_count * 100) / (learned_phrase_count + unlearned_phrase_count))
         else:
-            strength_data['average'] = None
+            progress = 0
+        strength_data = {'learned': learned_phrase_count, 'average': None}
+        if totals['average_strength'] is not None:
+            strength_data['average'] = round(totals['average_strength'])
 
-        # Search result implemention for search bar
+        # The page of the catalog is cached for all users. Only the labels of the user's
+        # learned phrases are read per request.
         search = request.GET.get("search", False)
-        if search:
-            phrase_data = [d for d in phrase_data if search.lower() in d["phrase"].lower() or search in " ".join(d["translations"]).lower()]
+        page = glossary_page(search, request.GET.get("after"))
+        overlay = strength_overlay(request.user, [row['id'] for row in page['rows']], now)
+        phrase_data = [
+            dict(row, strength_label=overlay.get(row['id']), learned=row['id'] in overlay)
+            for row in page['rows']
+        ]
 
         context = {
             'phrase_data': phrase_data,
             'profile': profile,
             'progress': progress,
             'search': search,
-            'phrase_count': phrase_count,
+            'is_first_page': page['is_first_page'],
+            'next_after': page['next_after'],
             'strength_data': strength_data,
         }
         return render(request, self.template_name, context)
@@ -456,17 +179,29 @@ class ModulesView(LoginRequiredMixin, ListView):
 
     def get(self, request):
         profile = Profile.objects.get(user = request.user)
-        phrases = Phrase.objects.all()
-        user_phrase_data = UserPhraseStrength.objects.filter(user=request.user)
-        if user_phrase_data.count() > 0:
-            unlearned_phrase_set = user_phrase_data.filter(learned=False)
-            unlearned_phrase_count = unlearned_phrase_set.count()
-            learned_phrase_set= user_phrase_data.filter(learned=True)
-            learned_phrase_count = learned_phrase_set.count()
+
+        # Every module with the user's phrase counts in one query. The user's rows are
+        # joined on the user, so each phrase is counted once whatever the number of users.
+        modules = Module.objects.annotate(
+            user_strength=FilteredRelation(
+                'phrases_in_module__userphrasestrength',
+                condition=Q(phrases_in_module__userphrasestrength__user=request.user),
+            ),
+        ).annotate(
+            phrase_count=Count('phrases_in_module'),
+            learned_count=Count('user_strength', filter=Q(user_strength__learned=True)),
+            unlearned_count=Count('user_strength', filter=Q(user_strength__learned=False)),
+        ).order_by('id')
+
+        # Modules with unlearned phrases are open, the others are complete
+        open_modules = [module for module in modules if module.unlearned_count]
+        closed_modules = [module for module in modules if not module.unlearned_count]
+        learned_phrase_count = sum(module.learned_count for module in modules)
+        unlearned_phrase_count = sum(module.unlearned_count for module in modules)
+        if learned_phrase_count + unlearned_phrase_count > 0:
+            progress = int((learned_phrase_count * 100) / (learned_phrase_count + unlearned_phrase_count))
         else:
-            unlearned_phrase_count, learned_phrase_count = 1, 0
-        progress = int((learned_phrase_count * 100) / (learned_phrase_count + unlearned_phrase_count))
-        modules = Module.objects.all()
+            progress = 0
 
         if msg := request.session.get('module_complete_msg'):
             module_complete_msg = msg
@@ -474,23 +209,6 @@ class ModulesView(LoginRequiredMixin, ListView):
         else:
             module_complete_msg = ""
 
-        # Create lists of modules the user has and has not completed
-        open_modules = []
-        closed_modules = []
-        for module in modules:
-            # Get all phrases in module to compare with learned and unlearned phrases
-            phrase_set = phrases.filter(module=module)
-            # If module includes unlearned phrases add to open modules list...
-            for phrase in phrase_set:
-                for unlearned_phrase in unlearned_phrase_set:
-                    if unlearned_phrase.phrase == phrase:
-                        if not module in open_modules:
-                            open_modules.append(module)
-        # ...else add to closed modules list
-        for module in modules:
-            if not module in open_modules:
-                closed_modules.append(module)
-
         context = {
             'profile': profile,
             'unlearned_phrase_count': unlearned_phrase_count,
@@ -507,7 +225,8 @@ class ModulesView(LoginRequiredMixin, ListView):
 class LearnView(LoginRequiredMixin, View):
     """
     Test form. Prompts user to translate phrases from a learning module. Chooses
-    random phrase one at a time. (Does not test accent and punctuation.)
+    phrases of the right difficulty for the user one at a time. (Does not test accent
+    and punctuation.)
     """
     template_name = 'tommy/learn.html'
 
@@ -520,7 +239,7 @@ class LearnView(LoginRequiredMixin, View):
                 del request.session['user_answer']
                 del request.session['response_accuracy']
                 del request.session['phrase_language']
-                del request.session['feedback_html']
+                del request.session['feedback_spans']
             except:
                 pass
 
@@ -528,14 +247,17 @@ class LearnView(LoginRequiredMixin, View):
         form = TestForm()
         module = Module.objects.get(id=pk)
         phrases = module.phrases_in_module.all()
-        try: # Select random unlearned phrase for testing and save it to session for access in POST
+        try: # Select the unlearned phrase the user is most likely to get right about
+            # TARGET_SUCCESS of the time and save it to session for access in POST
             user_unlearned_phrase_objects = UserPhraseStrength.objects.filter(
                 learned=False,
                 user=request.user,
-                phrase__in=phrases
+                phrase__module=module
+            )
+            user_phrase_strength = closest_difficulty(
+                user_unlearned_phrase_objects, target_difficulty(profile.ability)
             )
-            user_phrase_strength = choice(user_unlearned_phrase_objects)
-            phrase = phrases.get(id=user_phrase_strength.phrase_id)
+            phrase = user_phrase_strength.phrase
             request.session['user_phrase_strength_id'] = user_phrase_strength.id
 
             # Module progress
@@ -584,38 +306,24 @@ class LearnView(LoginRequiredMixin, View):
         translation_langauge = translations[0].language
         phrase_language = "French" if translation_langauge == "English" else "English"
 
-        # Clean user's answer and escape any html entities before testing
-        user_answer = html.escape(form.cleaned_data['answer'].strip())
+        # Clean user's answer. Templates and feedback spans escape it for display.
+        user_answer = form.cleaned_data['answer'].strip()
 
         # Track the phrase as learned by the user and initiate view count.
         user_phrase_strength.learned = True
         user_phrase_strength.views = INITIATE_COUNT
 
-        # Set variables to evaluate score and prepare feedback.
-        response_score = UNASSESSED_SCORE
-        errors = MAX_ERRORS
-        matched_translation = ""
-        feedback_html = ""
-        cleaned_answer = unidecode(user_answer.lower())
-
-        # Find a translation that best matches the user's answer and evaluate score and errors
-        for translation in translations:
-            cleaned_test_phrase = unidecode(translation.translation.lower())
-            translation_score, error_count = eval_tranlation(cleaned_answer, cleaned_test_phrase)
-            if translation_score > response_score:
-                response_score = translation_score
-                errors = error_count
-                matched_translation = cleaned_test_phrase
-        if not matched_translation: # Use a dummy translation if user's answer has no match
-            matched_translation = translations[0].translation
-
-        # Generate feedback to display to user
-        feedback_html = feedback(user_answer, matched_translation, errors, response_score)
+        # Normalize the user's answer once for evaluating score and preparing feedback.
+        answer = normalizer(user_answer)
+
+        # Find a translation that best matches the user's answer, evaluate score and errors
+        # and generate feedback to display to user. Repeated answers come from the cache.
+        index = MatchIndex.for_translations(translations, cache=grading_cache)
+        match, spans = index.grade(answer)
+        response_score, errors, matched_translation = match.score, match.errors, match.form
 
         # If evaluation passes mark, add points to user profile and raise user phrase strength
-        translation_len = len(
-            matched_translation.replace(" ", "").translate(str.maketrans("", "", string.punctuation))
-        )
+        translation_len = len(matched_translation.compact)
         if ((translation_len < 10) and (response_score >= 85)) or response_score >= 90:
             user_phrase_strength.correct += 1
             user_phrase_strength.strength = round(response_score)
@@ -624,8 +332,9 @@ class LearnView(LoginRequiredMixin, View):
             response_accuracy = True
         else:
             response_accuracy = False
-        
-        # Save the user's phrase score
+
+        # Schedule the first review of the phrase and save it with the user's phrase score
+        schedule(user_phrase_strength, answer_quality(response_accuracy, response_score))
         user_phrase_strength.save()
 
         # Prepare data for feedback view
@@ -636,7 +345,7 @@ class LearnView(LoginRequiredMixin, View):
         request.session['testing_view'] = 'tommy:learn'
         request.session['module_id'] = pk
         request.session['phrase_language'] = phrase_language
-        request.session['feedback_html'] = feedback_html
+        request.session['feedback_spans'] = spans
         return redirect(success_url)
 
 
@@ -652,7 +361,7 @@ class PracticeView(LoginRequiredMixin, View):
         # Set or reset the exercise session test count. End exerice after count 15.
         try:
             test_count = request.session.get('test_count')
-            if test_count >= 12:
+            if test_count >= PRACTICE_COUNT:
                 request.session['test_count'] = 0
                 finished_exercise_url = reverse_lazy('tommy:home')
                 return redirect(finished_exercise_url)
@@ -666,27 +375,25 @@ class PracticeView(LoginRequiredMixin, View):
                 del request.session['user_answer']
                 del request.session['response_accuracy']
                 del request.session['phrase_language']
-                del request.session['feedback_html']
+                del request.session['feedback_spans']
             except:
                 pass
 
         profile = Profile.objects.get(user=request.user)
         form = TestForm()
         try:
-            phrase_strength_set = UserPhraseStrength.objects.filter(learned=True, user=request.user)
-            user_phrase_strength = phrase_strength_set.earliest('strength')
-            phrase = Phrase.objects.get(id=user_phrase_strength.phrase_id)
-
-            # Debug info for server log TODO - remove later
-            phr_str = user_phrase_strength
-            print("\nBefore testing:", end=" ")
-            print(phr_str, "updated at:", phr_str.updated_at, "\nviews:", phr_str.views, end=" ")
-            print("correctly answered:", phr_str.correct, "strength:", phr_str.strength)
+            # Deal the weakest phrases once per session, taken from the user's practice queue
+            if request.session['test_count'] == 0 or not has_deck(request.session, 'tommy:practice'):
+                phrase_strength_set = UserPhraseStrength.objects.filter(learned=True, user=request.user)
+                deal_ids(request.session, 'tommy:practice', phrase_strength_set,
+                    weakest(request.user.pk, PRACTICE_COUNT))
+            phrase = draw(request.session, request.session['test_count'])
+            if phrase is None:
+                raise UserPhraseStrength.DoesNotExist
 
             context = {
                 'profile': profile,
                 'form': form,
-                'user_phrase_strength': user_phrase_strength, # Phrase strength object
                 'phrase': phrase,
             }
             # Increment test count for each phrase test before passing to session
@@ -700,52 +407,38 @@ class PracticeView(LoginRequiredMixin, View):
     def post(self, request):
         profile = Profile.objects.get(user=request.user)
         form = TestForm(request.POST)
-        phrase_strength_set = UserPhraseStrength.objects.filter(learned=True, user=request.user)
-        user_phrase_strength = phrase_strength_set.earliest('strength')
-        phrase = Phrase.objects.get(id=user_phrase_strength.phrase_id)
-        module = Module.objects.get(name=phrase.module)
-        translations = phrase.phrase_translations.all()
+        # The phrase and its translations come from the deck dealt in GET. Without one, for
+        # example after another exercise dealt its own deck, start this exercise again.
+        phrase = current_card(request.session, 'tommy:practice')
+        if phrase is None:
+            return redirect(reverse_lazy('tommy:practice'))
+        user_phrase_strength = UserPhraseStrength.objects.get(id=phrase.strength_id)
 
         if not form.is_valid():
             context = {
                 'profile': profile,
                 'form': form,
-                'user_phrase_strength': user_phrase_strength, # Phrase strength object
                 'phrase': phrase,
             }
             return render(request, self.template_name, context)
 
-        # Clean user's answer and escape any html entities before testing
-        user_answer = html.escape(form.cleaned_data['answer'].strip())
+        # Clean user's answer. Templates and feedback spans escape it for display.
+        user_answer = form.cleaned_data['answer'].strip()
 
         # Increment user view of current phrase
         user_phrase_strength.views += 1
 
-        # Set variables to evaluate user's translation of current prhase
-        response_score = UNASSESSED_SCORE
-        errors = MAX_ERRORS
-        matched_translation = ""
-        feedback_html = ""
-        cleaned_answer = unidecode(user_answer.lower())
-
-        # Find a translation that best matches the user's answer and evaluate score and errors
-        for translation in translations:
-            cleaned_test_phrase = unidecode(translation.translation.lower())
-            translation_score, error_count = eval_tranlation(cleaned_answer, cleaned_test_phrase)
-            if translation_score > response_score:
-                response_score = translation_score
-                errors = error_count
-                matched_translation = cleaned_test_phrase
-        if not matched_translation: # Use a dummy translation if user's answer has no match
-            matched_translation =  translations[0].translation
-        
-        # Generate feedback to display to user
-        feedback_html = feedback(user_answer, matched_translation, errors, response_score)
+        # Normalize the user's answer once for evaluating score and preparing feedback.
+        answer = normalizer(user_answer)
 
+        # Find a translation that best matches the user's answer, evaluate score and errors
+        # and generate feedback to display to user. Repeated answers come from the cache.
+        index = MatchIndex(phrase.translation_forms(), cache=grading_cache)
+        match, spans = index.grade(answer)
+        response_score, errors, matched_translation = match.score, match.errors, match.form
+        
         # If evaluation passes mark, add points to user profile and raise user phrase strength
-        translation_len = len(
-            matched_translation.replace(" ", "").translate(str.maketrans("", "", string.punctuation))
-        )
+        translation_len = len(matched_translation.compact)
         if (translation_len < 10 and response_score >= 85) or response_score >= 90:
             user_phrase_strength.correct += 1
             response_accuracy = True
@@ -757,25 +450,26 @@ class PracticeView(LoginRequiredMixin, View):
             user_phrase_strength.views - (user_phrase_strength.views - user_phrase_strength.correct))
                 * 100) / user_phrase_strength.views
         
-        # Save the user's phrase score
+        # Save the user's phrase score and its next review in one write
+        schedule(user_phrase_strength, answer_quality(response_accuracy, response_score))
         user_phrase_strength.save()
 
         # Prepare data for feedback view
         success_url = reverse_lazy('tommy:feedback')
-        request.session['phrase'] = user_phrase_strength.phrase.phrase
-        request.session['module_id'] = module.id
+        request.session['phrase'] = phrase.phrase
+        request.session['module_id'] = phrase.module_id
         request.session['user_answer'] = user_answer # Used as backup in case of error with HTML
         request.session['response_accuracy'] = response_accuracy
         request.session['testing_view'] = 'tommy:practice'
         request.session['phrase_language'] = phrase.language
-        request.session['feedback_html'] = feedback_html
+        request.session['feedback_spans'] = spans
         return redirect(success_url)
 
 
 class ReviewView(LoginRequiredMixin, View):
     """
-    Test form. Prompts user to translate phrases one at a time. Selects phrase not 
-    seen by user in longest time. (Does not test accent and punctuation.)
+    Test form. Prompts user to translate phrases one at a time. Selects phrases due for
+    review first, by SM-2 or Leitner box. (Does not test accent and punctuation.)
     """
     template_name = 'tommy/review.html'
 
@@ -783,7 +477,7 @@ class ReviewView(LoginRequiredMixin, View):
         # Set or reset the exercise session test count. End exerice after count 15.
         try:
             test_count = request.session.get('test_count')
-            if test_count >= 15:
+            if test_count >= REVIEW_COUNT:
                 request.session['test_count'] = 0
                 finished_exercise_url = reverse_lazy('tommy:home')
                 return redirect(finished_exercise_url)
@@ -797,21 +491,28 @@ class ReviewView(LoginRequiredMixin, View):
                 del request.session['user_answer']
                 del request.session['response_accuracy']
                 del request.session['phrase_language']
-                del request.session['feedback_html']
+                del request.session['feedback_spans']
             except:
                 pass
 
         profile = Profile.objects.get(user=request.user)
         form = TestForm()
         try:
-            phrase_strength_set = UserPhraseStrength.objects.filter(learned=True, user=request.user)
-            user_phrase_strength = phrase_strength_set.earliest('updated_at')
-            phrase = Phrase.objects.get(id=user_phrase_strength.phrase_id)
+            # Deal the learned phrases due for review first, once per session
+            if request.session['test_count'] == 0 or not has_deck(request.session, 'tommy:review'):
+                if settings.REVIEW_SCHEDULER == 'leitner':
+                    deal_ids(request.session, 'tommy:review',
+                        UserPhraseStrength.objects.filter(user=request.user),
+                        leitner_due(request.user, REVIEW_COUNT))
+                else:
+                    deal(request.session, 'tommy:review', due_phrases(request.user), REVIEW_COUNT)
+            phrase = draw(request.session, request.session['test_count'])
+            if phrase is None:
+                raise UserPhraseStrength.DoesNotExist
 
             context = {
                 'profile': profile,
                 'form': form,
-                'user_phrase_strength': user_phrase_strength,
                 'phrase': phrase,
             }
             # Increment test count for each phrase test before passing to session
@@ -825,52 +526,38 @@ class ReviewView(LoginRequiredMixin, View):
     def post(self, request):
         profile = Profile.objects.get(user=request.user)
         form = TestForm(request.POST)
-        phrase_strength_set = UserPhraseStrength.objects.filter(learned=True, user=request.user)
-        user_phrase_strength = phrase_strength_set.earliest('updated_at')
-        phrase = Phrase.objects.get(id=user_phrase_strength.phrase_id)
-        module = Module.objects.get(name=phrase.module)
-        translations = phrase.phrase_translations.all()
+        # The phrase and its translations come from the deck dealt in GET. Without one, for
+        # example after another exercise dealt its own deck, start this exercise again.
+        phrase = current_card(request.session, 'tommy:review')
+        if phrase is None:
+            return redirect(reverse_lazy('tommy:review'))
+        user_phrase_strength = UserPhraseStrength.objects.get(id=phrase.strength_id)
 
         if not form.is_valid():
             context = {
                 'profile': profile,
                 'form': form,
-                'user_phrase_strength': user_phrase_strength, # Phrase strength object
                 'phrase': phrase,
             }
             return render(request, self.template_name, context)
 
-        # Clean user's answer and escape any html entities before testing
-        user_answer = html.escape(form.cleaned_data['answer'].strip())
+        # Clean user's answer. Templates and feedback spans escape it for display.
+        user_answer = form.cleaned_data['answer'].strip()
         
         # Increment user view of current phrase
         user_phrase_strength.views += 1
 
-        # Set variables to evaluate score and prepare feedback.
-        response_score = UNASSESSED_SCORE
-        errors = MAX_ERRORS
-        matched_translation = ""
-        feedback_html = ""
-        cleaned_answer = unidecode(user_answer.lower())
-
-        # Find a translation that best matches the user's answer and evaluate score and errors
-        for translation in translations:
-            cleaned_test_phrase = unidecode(translation.translation.lower())
-            translation_score, error_count = eval_tranlation(cleaned_answer, cleaned_test_phrase)
-            if translation_score > response_score:
-                response_score = translation_score
-                errors = error_count
-                matched_translation = cleaned_test_phrase
-        if not matched_translation:
-            matched_translation =  translations[0].translation
-        
-        # Generate feedback to display to user
-        feedback_html = feedback(user_answer, matched_translation, errors, response_score)
+        # Normalize the user's answer once for evaluating score and preparing feedback.
+        answer = normalizer(user_answer)
 
+        # Find a translation that best matches the user's answer, evaluate score and errors
+        # and generate feedback to display to user. Repeated answers come from the cache.
+        index = MatchIndex(phrase.translation_forms(), cache=grading_cache)
+        match, spans = index.grade(answer)
+        response_score, errors, matched_translation = match.score, match.errors, match.form
+        
         # If evaluation passes mark, add points to user profile and raise user phrase strength
-        translation_length = len(
-            matched_translation.replace(" ", "").translate(str.maketrans("", "", string.punctuation))
-        )
+        translation_length = len(matched_translation.compact)
         if ((translation_length < 10) and (response_score >= 85)) or response_score >= 90:
             user_phrase_strength.correct += 1
             profile.xp += 5
@@ -881,17 +568,18 @@ class ReviewView(LoginRequiredMixin, View):
         user_phrase_strength.strength = ((
             user_phrase_strength.views - (user_phrase_strength.views - user_phrase_strength.correct)) 
             * 100) / user_phrase_strength.views
+        schedule(user_phrase_strength, answer_quality(response_accuracy, response_score))
         user_phrase_strength.save()
 
         # Prepare data for feedback view
         success_url = reverse_lazy('tommy:feedback')
-        request.session['phrase'] = user_phrase_strength.phrase.phrase
-        request.session['module_id'] = module.id
+        request.session['phrase'] = phrase.phrase
+        request.session['module_id'] = phrase.module_id
         request.session['user_answer'] = user_answer # Used as backup in csae of error with HTML
         request.session['response_accuracy'] = response_accuracy
         request.session['testing_view'] = 'tommy:review'
         request.session['phrase_language'] = phrase.language
-        request.session['feedback_html'] = feedback_html
+        request.session['feedback_spans'] = spans
         return redirect(success_url)
 
 
@@ -906,7 +594,7 @@ class AccentView(LoginRequiredMixin, View):
         # Set or reset the exercise session test count. End exerice after count 15.
         try:
             test_count = request.session.get('test_count')
-            if test_count >= 12:
+            if test_count >= ACCENT_COUNT:
                 request.session['test_count'] = 0
                 finished_exercise_url = reverse_lazy('tommy:home')
                 return redirect(finished_exercise_url)
@@ -916,11 +604,10 @@ class AccentView(LoginRequiredMixin, View):
         if request.session.get('phrase'):
             try:
                 del request.session['phrase']
-                del request.session['user_phrase_strength_id']
                 del request.session['user_answer']
                 del request.session['response_accuracy']
                 del request.session['phrase_language']
-                del request.session['feedback_html']
+                del request.session['feedback_spans']
             except:
                 pass
 
@@ -929,17 +616,22 @@ class AccentView(LoginRequiredMixin, View):
 
         # Select random unlearned phrase for testing and get its translationstry:
         try: 
-            phrase_strength_set = UserPhraseStrength.objects.filter(learned=True, user=request.user)
-            user_phrase_strength = choice(phrase_strength_set)
-            phrase = Phrase.objects.get(id=user_phrase_strength.phrase_id)
-
-            # Save phrase data to session to be access in POST
-            request.session['user_phrase_strength_id'] = user_phrase_strength.id
+            # Deal random learned phrases once per session with the shared sampler, skipping
+            # the ones tested most recently. Drawing them in turn means a phrase only repeats
+            # once the whole deck has been shown.
+            if request.session['test_count'] == 0 or not has_deck(request.session, 'tommy:accent'):
+                phrase_strength_set = UserPhraseStrength.objects.filter(learned=True, user=request.user)
+                deal_ids(request.session, 'tommy:accent', phrase_strength_set, sample_ids(
+                    phrase_strength_set, ACCENT_COUNT, recent_ids(request.session)
+                ))
+            phrase = draw(request.session, request.session['test_count'])
+            if phrase is None:
+                raise UserPhraseStrength.DoesNotExist
+            remember(request.session, phrase.strength_id)
 
             context = {
                 'profile': profile,
                 'form': form,
-                'user_phrase_strength': user_phrase_strength, # Phrase strength object
                 'phrase': phrase,
             }
             # Increment test count for each phrase test before passing to session
@@ -954,66 +646,167 @@ class AccentView(LoginRequiredMixin, View):
     def post(self, request):
         profile = Profile.objects.get(user=request.user)
         form = TestForm(request.POST)
-        user_phrase_strength = UserPhraseStrength.objects.get(
-                    id=request.session.get('user_phrase_strength_id')
-                )
-        phrase = Phrase.objects.get(id=user_phrase_strength.phrase_id)
-        module = Module.objects.get(name=phrase.module)
-        translations = phrase.phrase_translations.all()
+        # The phrase and its translations come from the deck dealt in GET. Without one, for
+        # example after another exercise dealt its own deck, start this exercise again.
+        phrase = current_card(request.session, 'tommy:accent')
+        if phrase is None:
+            return redirect(reverse_lazy('tommy:accent'))
+        user_phrase_strength = UserPhraseStrength.objects.get(id=phrase.strength_id)
 
         if not form.is_valid():
             context = {
                 'profile': profile,
                 'form': form,
-                'user_phrase_strength': user_phrase_strength, # Phrase strength object
                 'phrase': phrase,
             }
             return render(request, self.template_name, context)
 
-        # Clean user's answer and escape any html entities before testing
-        user_answer = html.escape(form.cleaned_data['answer'].strip())
+        # Clean user's answer. Templates and feedback spans escape it for display.
+        user_answer = form.cleaned_data['answer'].strip()
 
         # Increment user view of current phrase
         user_phrase_strength.views += 1
 
-        # Set variable to help choose best translation for feedback
-        highest_score = UNASSESSED_SCORE
-        
-        # Find a translation that exactly matches the user's answer. If yes, add points. Generate feedback.
-        for translation in translations:
-            test_user_ans = user_answer.translate(str.maketrans("", "", string.punctuation))
-            test_translation = translation.translation.translate(str.maketrans("", "", string.punctuation))
-            response_score, error_count = eval_tranlation(test_user_ans.lower(), test_translation.lower())
-            if test_user_ans == test_translation:
-                user_phrase_strength.correct += 1
-                profile.xp += 5
-                profile.save()
-                response_accuracy = True
-                feedback_html = accent_feedback(
-                    user_answer, translation.translation, error_count, response_score
-                )
-                break
-            elif response_score > highest_score:
-                feedback_html = accent_feedback(
-                    user_answer, translation.translation, error_count, response_score
-                )
-                response_accuracy = False
+        # Grade once against every translation. The answer is correct only if a translation
+        # matches it exactly, accents included. Feedback is built for the best match only.
+        answer = normalizer(user_answer)
+        index = MatchIndex(phrase.translation_forms(), accents=True, cache=grading_cache)
+        match, response_accuracy, spans = index.grade_accents(answer)
+        if response_accuracy:
+            user_phrase_strength.correct += 1
+            profile.xp += 5
+            profile.save()
         
-        # Update the user phrase strength score.
+        # Update the user phrase strength score and its next review.
         user_phrase_strength.strength = ((
             user_phrase_strength.views - (user_phrase_strength.views - user_phrase_strength.correct))
                 * 100) / user_phrase_strength.views
+        schedule(user_phrase_strength, answer_quality(response_accuracy, match.score))
         user_phrase_strength.save()
 
         # Prepare data for feedback view
         success_url = reverse_lazy('tommy:feedback')
-        request.session['phrase'] = user_phrase_strength.phrase.phrase
+        request.session['phrase'] = phrase.phrase
         request.session['user_answer'] = user_answer  # Used as backup in csae of error with HTML
         request.session['response_accuracy'] = response_accuracy
-        request.session['module_id'] = module.id
+        request.session['module_id'] = phrase.module_id
         request.session['testing_view'] = 'tommy:accent'
         request.session['phrase_language'] = phrase.language
-        request.session['feedback_html'] = feedback_html
+        request.session['feedback_spans'] = spans
+        return redirect(success_url)
+
+
+class ChoiceView(LoginRequiredMixin, View):
+    """
+    Multiple choice test form for mobile learners. Prompts user to pick the translation
+    of a phrase among wrong answers from the precomputed distractor index. Selects phrase
+    randomly.
+    """
+    template_name = 'tommy/choice.html'
+
+    def get(self, request):
+        # Set or reset the exercise session test count. End exerice after count 15.
+        try:
+            test_count = request.session.get('test_count')
+            if test_count >= 15:
+                request.session['test_count'] = 0
+                finished_exercise_url = reverse_lazy('tommy:home')
+                return redirect(finished_exercise_url)
+        except:
+            request.session['test_count'] = 0
+        # Delete session data for previous testing phrase if it exists
+        if request.session.get('phrase'):
+            try:
+                del request.session['phrase']
+                del request.session['user_answer']
+                del request.session['response_accuracy']
+                del request.session['phrase_language']
+                del request.session['feedback_spans']
+            except:
+                pass
+
+        profile = Profile.objects.get(user=request.user)
+        try:
+            # Random learned phrase, skipping the ones tested most recently. Phrases without
+            # stored distractors are left out, their only option would always be right.
+            phrase_strength_set = UserPhraseStrength.objects.filter(learned=True, user=request.user).filter(
+                Exists(Distractor.objects.filter(phrase_id=OuterRef('phrase_id')))
+            )
+            user_phrase_strength = sample(phrase_strength_set, recent_ids(request.session))
+            phrase = Phrase.objects.get(id=user_phrase_strength.phrase_id)
+            answer = choice(phrase.phrase_translations.all())
+            remember(request.session, user_phrase_strength.id)
+        except:
+            start_learning_url = reverse_lazy('tommy:modules')
+            return redirect(start_learning_url)
+
+        # Wrong answers come from one indexed lookup
+        distractors = phrase.distractors.select_related('translation')[:DISTRACTOR_COUNT]
+        options = [(answer.id, answer.translation)] + [
+            (distractor.translation_id, distractor.translation.translation)
+            for distractor in distractors
+        ]
+        shuffle(options)
+
+        # Save phrase data to session to be access in POST
+        request.session['user_phrase_strength_id'] = user_phrase_strength.id
+        request.session['choice_options'] = options
+        request.session['choice_answer_id'] = answer.id
+
+        context = {
+            'profile': profile,
+            'form': ChoiceForm(choices=options),
+            'user_phrase_strength': user_phrase_strength, # Phrase strength object
+            'phrase': phrase,
+        }
+        # Increment test count for each phrase test before passing to session
+        request.session['test_count'] += 1
+        return render(request, self.template_name, context)
+
+    def post(self, request):
+        profile = Profile.objects.get(user=request.user)
+        options = request.session.get('choice_options', [])
+        form = ChoiceForm(request.POST, choices=options)
+        user_phrase_strength = UserPhraseStrength.objects.get(
+                    id=request.session.get('user_phrase_strength_id')
+                )
+        phrase = Phrase.objects.get(id=user_phrase_strength.phrase_id)
+
+        if not form.is_valid():
+            context = {
+                'profile': profile,
+                'form': form,
+                'user_phrase_strength': user_phrase_strength, # Phrase strength object
+                'phrase': phrase,
+            }
+            return render(request, self.template_name, context)
+
+        # The chosen option's text is the user's answer
+        chosen_id = form.cleaned_data['answer']
+        user_answer = dict(options)[chosen_id]
+
+        # Increment user view of current phrase. Add points if the translation was chosen.
+        user_phrase_strength.views += 1
+        response_accuracy = chosen_id == request.session.get('choice_answer_id')
+        if response_accuracy:
+            user_phrase_strength.correct += 1
+            profile.xp += 5
+            profile.save()
+        user_phrase_strength.strength = ((
+            user_phrase_strength.views - (user_phrase_strength.views - user_phrase_strength.correct))
+                * 100) / user_phrase_strength.views
+        schedule(user_phrase_strength, answer_quality(response_accuracy))
+        user_phrase_strength.save()
+
+        # Prepare data for feedback view
+        success_url = reverse_lazy('tommy:feedback')
+        request.session['phrase'] = phrase.phrase
+        request.session['user_answer'] = user_answer
+        request.session['response_accuracy'] = response_accuracy
+        request.session['module_id'] = phrase.module_id
+        request.session['testing_view'] = 'tommy:choice'
+        request.session['phrase_language'] = phrase.language
+        request.session['feedback_spans'] = [Span(user_answer, response_accuracy)]
         return redirect(success_url)
 
 
@@ -1036,7 +829,7 @@ class FeedbackView(LoginRequiredMixin, View):
         response_accuracy = request.session.get('response_accuracy')
         translations = Translation.objects.filter(phrase=phrase)
         testing_view = request.session.get('testing_view')
-        feedback_html = request.session.get('feedback_html')
+        spans = request.session.get('feedback_spans')
 
         # Module progress - for LearnView only
         if testing_view == "tommy:learn":
@@ -1078,9 +871,41 @@ class FeedbackView(LoginRequiredMixin, View):
             'testing_view': testing_view,
             'result': result,
             'module_id': module_id,
-            'feedback_html': feedback_html,
+            'feedback_spans': spans,
             'module_progress': module_progress,
             'module_name': module.name
         }
         # Retrieve and pass on test count for the current exercise session
-        return render(request, self.template_name, context)
\ No newline at end of file
+        return render(request, self.template_name, context)
+
+
+class FeedbackDataView(LoginRequiredMixin, View):
+    """Returns the feedback on the user's last answer as JSON for API clients."""
+
+    def get(self, request):
+        spans = request.session.get('feedback_spans')
+        if spans is None:
+            return JsonResponse({'error': "There is no answer to give feedback on."}, status=404)
+        data = {
+            'phrase': request.session.get('phrase'),
+            'user_answer': request.session.get('user_answer'),
+            'response_accuracy': request.session.get('response_accuracy'),
+            'spans': spans_to_json(spans),
+        }
+        return JsonResponse(data)
+
+
+class TypeaheadView(LoginRequiredMixin, View):
+    """Returns suggestions for the glossary search bar as JSON, as the user types."""
+
+    def get(self, request):
+        query = request.GET.get('q', "")
+        try:
+            limit = max(1, min(int(request.GET.get('limit', TYPEAHEAD_LIMIT)), TYPEAHEAD_MAX_LIMIT))
+        except ValueError:
+            limit = TYPEAHEAD_LIMIT
+        suggestions = typeahead_index().complete(normalizer(query).folded, limit)
+        return JsonResponse({
+            'query': query,
+            'results': [suggestion._asdict() for suggestion in suggestions],
+        })